@@ -3,7 +3,6 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_cors import CORS
-from pymongo import MongoClient
 import os
 import logging
 from logging.handlers import RotatingFileHandler
@@ -16,7 +15,6 @@ load_dotenv()
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
-mongo_client = None
 
 def setup_logging(app):
     """Configure detailed logging."""
@@ -63,9 +61,79 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev')
     
+    # Configure the connection pool of each process; connections are opened on
+    # first use, checked before reuse and recycled before server-side timeouts
+    engine_options = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))
+    }
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        engine_options['pool_size'] = int(os.getenv('DB_POOL_SIZE', 5))
+        engine_options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+        engine_options['pool_timeout'] = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    
     # Configure file uploads
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size (larger files use chunked uploads)
+    app.config['UPLOAD_SESSION_TTL'] = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'uploads')
+    app.config['EPOCH_STORE_FOLDER'] = os.getenv('EPOCH_STORE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'epochs'))
+    app.config['PARSED_CACHE_FOLDER'] = os.getenv('PARSED_CACHE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'parsed'))
+    app.config['PARSED_CACHE_MAX_BYTES'] = int(os.getenv('PARSED_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    app.config['RINEX_CACHE_FOLDER'] = os.getenv('RINEX_CACHE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'rinex'))
+    app.config['RINEX_CACHE_MAX_BYTES'] = int(os.getenv('RINEX_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    
+    # Configure background processing
+    app.config['MAX_CONCURRENT_JOBS'] = int(os.getenv('MAX_CONCURRENT_JOBS', os.cpu_count() or 2))
+    app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', 2.0))
+    app.config['JOB_TIMEOUT'] = int(os.getenv('JOB_TIMEOUT', 3600))
+    
+    # Optional epoch filter: fixed epochs below the ambiguity ratio and epochs
+    # with older corrections (seconds) are left out of the metrics
+    app.config['QUALITY_MIN_RATIO'] = float(os.getenv('QUALITY_MIN_RATIO')) if os.getenv('QUALITY_MIN_RATIO') else None
+    app.config['QUALITY_MAX_AGE'] = float(os.getenv('QUALITY_MAX_AGE')) if os.getenv('QUALITY_MAX_AGE') else None
+    
+    # Floating reference estimator (mean, median, sigma_clip or huber) and optional
+    # rejection of epochs beyond OUTLIER_SIGMA robust sigmas from the robust center
+    app.config['REFERENCE_ESTIMATOR'] = os.getenv('REFERENCE_ESTIMATOR', 'median')
+    app.config['OUTLIER_SIGMA'] = float(os.getenv('OUTLIER_SIGMA')) if os.getenv('OUTLIER_SIGMA') else None
+    
+    # Configure base station lookups
+    app.config['BASE_STATION_CACHE_TTL'] = float(os.getenv('BASE_STATION_CACHE_TTL', 300))
+    app.config['BASE_STATION_AUTO_MAX_DISTANCE'] = float(os.getenv('BASE_STATION_AUTO_MAX_DISTANCE', 100000))
+    
+    # Configure live stream ingestion
+    app.config['LIVE_MAX_STREAMS'] = int(os.getenv('LIVE_MAX_STREAMS', 8))
+    app.config['LIVE_BUFFER_CHUNKS'] = int(os.getenv('LIVE_BUFFER_CHUNKS', 64))
+    app.config['LIVE_SUBSCRIBER_QUEUE'] = int(os.getenv('LIVE_SUBSCRIBER_QUEUE', 16))
+    app.config['LIVE_UPDATE_INTERVAL'] = float(os.getenv('LIVE_UPDATE_INTERVAL', 1.0))
+    app.config['LIVE_WINDOW_EPOCHS'] = int(os.getenv('LIVE_WINDOW_EPOCHS', 600))
+    # Every open live update (SSE) connection holds a gunicorn thread; keep the limit well
+    # below GUNICORN_THREADS (half of them by default) so other requests are still served
+    app.config['LIVE_MAX_SUBSCRIBERS'] = int(os.getenv(
+        'LIVE_MAX_SUBSCRIBERS', max(1, int(os.getenv('GUNICORN_THREADS', 16)) // 2)))
+    app.config['LIVE_MAX_SUBSCRIBERS_PER_USER'] = int(os.getenv('LIVE_MAX_SUBSCRIBERS_PER_USER', 3))
+    # Comma separated host names, addresses or networks (e.g. 10.0.0.0/8) live streams may
+    # connect to; unset, any host resolving to public addresses only is accepted
+    allowed_hosts = os.getenv('LIVE_STREAM_ALLOWED_HOSTS', '')
+    app.config['LIVE_STREAM_ALLOWED_HOSTS'] = [host.strip() for host in allowed_hosts.split(',') if host.strip()]
+    
+    # Configure instrumentation: Prometheus metrics at /metrics and opt-in cProfile
+    # dumps of requests sending PROFILE_TOKEN in an X-Profile header (and of all jobs)
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['PROFILE_TOKEN'] = os.getenv('PROFILE_TOKEN')
+    app.config['PROFILE_JOBS'] = os.getenv('PROFILE_JOBS', 'false').lower() == 'true'
+    app.config['PROFILE_FOLDER'] = os.getenv('PROFILE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'profiles'))
+    
+    # Configure the raw data archive: uploads are moved into a zstd compressed
+    # GridFS bucket once their dataset exists and are read back from there
+    app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+    app.config['MONGO_MAX_POOL_SIZE'] = int(os.getenv('MONGO_MAX_POOL_SIZE', 10))
+    app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'] = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    app.config['RAW_ARCHIVE_ENABLED'] = os.getenv('RAW_ARCHIVE_ENABLED', 'true').lower() == 'true'
+    app.config['RAW_ARCHIVE_DATABASE'] = os.getenv('RAW_ARCHIVE_DATABASE', 'gnss')
+    app.config['RAW_ARCHIVE_BUCKET'] = os.getenv('RAW_ARCHIVE_BUCKET', 'raw')
+    app.config['RAW_ARCHIVE_LEVEL'] = int(os.getenv('RAW_ARCHIVE_LEVEL', 3))
     
     # Configure logging
     setup_logging(app)
@@ -76,17 +144,41 @@ def create_app():
     app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
     app.config['JSONIFY_MIMETYPE'] = 'application/json'
     
-    # Initialize MongoDB
-    global mongo_client
-    mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-    mongo_client = MongoClient(mongo_uri)
-    app.logger.info('MongoDB client initialized')
+    # Initialize MongoDB (the client connects on first use in each process)
+    from .mongo import mongo
+    mongo.init_app(app)
+    app.logger.info('MongoDB client configured')
+    
+    # Initialize raw data archive
+    from .raw_archive import raw_archive
+    raw_archive.init_app(app, mongo)
+    app.logger.info('Raw archive initialized')
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     app.logger.info('Database initialized')
     
+    # Initialize background job queue
+    from .jobs import job_queue
+    job_queue.init_app(app)
+    app.logger.info('Job queue initialized')
+    
+    # Initialize base station cache
+    from .base_stations import base_station_cache
+    base_station_cache.init_app(app)
+    app.logger.info('Base station cache initialized')
+    
+    # Initialize live stream ingestion
+    from .live import live_ingest
+    live_ingest.init_app(app)
+    app.logger.info('Live ingest initialized')
+    
+    # Initialize request metrics and profiling
+    from .instrumentation import instrumentation
+    instrumentation.init_app(app)
+    app.logger.info('Instrumentation initialized')
+    
     # Configure login
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -104,10 +196,5 @@ def create_app():
     app.register_blueprint(auth.bp, url_prefix='/auth')
     app.logger.info('Blueprints registered')
     
-    @app.before_first_request
-    def create_tables():
-        db.create_all()
-        app.logger.info('Database tables created')
-    
     app.logger.info('Application initialization complete')
     return app
@@ -0,0 +1,257 @@
+"""In-process cache of base station geometry.
+
+Base stations change rarely but are looked up by every upload, analysis
+and batch, so all of them are loaded with one query and kept in memory
+with their geodetic, ECEF and UTM coordinates precomputed. The cache is
+dropped whenever a BaseStation row is inserted, updated or deleted through
+the ORM in this process, and reloaded after BASE_STATION_CACHE_TTL seconds
+so changes made by other processes are picked up as well.
+
+The nearest station is found from unit vectors on the sphere: the largest
+dot product with the query direction is the smallest great-circle distance,
+so one matrix-vector product over the cached stations answers the query.
+The distance reported is the WGS84 geodesic distance. Together with
+approximate_position this lets an upload pick its closest station without
+a database round trip.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+
+from .processors.projection import get_geod, get_transformer, utm_crs, WGS84, WGS84_3D, ECEF
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the start of a file to estimate where it was recorded
+POSITION_PROBE_BYTES = 1024 * 1024
+
+
+class StationGeometry:
+    """Coordinates of one base station"""
+
+    __slots__ = ('id', 'name', 'is_active', 'latitude', 'longitude', 'altitude',
+                 'ecef', 'utm_crs', 'easting', 'northing')
+
+    def __init__(self, station_id: int, name: str, is_active: bool, latitude: float, longitude: float,
+                 altitude: float, ecef: Tuple[float, float, float], crs: str, easting: float, northing: float):
+        self.id = station_id
+        self.name = name
+        self.is_active = is_active
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.ecef = ecef
+        self.utm_crs = crs
+        self.easting = easting
+        self.northing = northing
+
+    @property
+    def coords(self) -> Tuple[float, float, float]:
+        """(lat, lon, altitude) as used for a fixed reference"""
+        return (self.latitude, self.longitude, self.altitude)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'is_active': self.is_active,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'altitude': self.altitude,
+            'ecef': list(self.ecef),
+            'utm': {'crs': self.utm_crs, 'easting': self.easting, 'northing': self.northing}
+        }
+
+
+def unit_vectors(latitude, longitude) -> np.ndarray:
+    """Directions on the unit sphere, shape (n, 3)"""
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def build_geometry(rows: List[Tuple]) -> List[StationGeometry]:
+    """Precompute coordinates for (id, name, is_active, lat, lon, altitude) rows"""
+    if not rows:
+        return []
+    ids, names, active, lat, lon, alt = zip(*rows)
+    lat = np.array(lat, dtype=np.float64)
+    lon = np.array(lon, dtype=np.float64)
+    alt = np.array(alt, dtype=np.float64)
+    x, y, z = get_transformer(WGS84_3D, ECEF).transform(lon, lat, alt)
+
+    crs = [utm_crs(a, o) for a, o in zip(lat, lon)]
+    easting = np.empty(len(rows))
+    northing = np.empty(len(rows))
+    for code in set(crs):
+        members = np.array([c == code for c in crs])
+        easting[members], northing[members] = get_transformer(WGS84, code).transform(lon[members], lat[members])
+
+    return [
+        StationGeometry(int(ids[i]), names[i], bool(active[i]) if active[i] is not None else True,
+                        float(lat[i]), float(lon[i]), float(alt[i]),
+                        (float(x[i]), float(y[i]), float(z[i])), crs[i], float(easting[i]), float(northing[i]))
+        for i in range(len(rows))
+    ]
+
+
+class BaseStationCache:
+    """All base stations with precomputed coordinates, loaded on first use"""
+
+    def __init__(self, app=None):
+        self.ttl = 300.0
+        self._stations: Optional[Dict[int, StationGeometry]] = None
+        self._active_ids = np.zeros(0, dtype=np.int64)
+        self._active_vectors = np.zeros((0, 3))
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from .models import BaseStation
+
+        self.ttl = app.config.get('BASE_STATION_CACHE_TTL', 300.0)
+        register_invalidation(BaseStation)
+        app.extensions['base_station_cache'] = self
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stations = None
+
+    def _query(self) -> List[Tuple]:
+        from .models import BaseStation, db
+
+        return db.session.query(
+            BaseStation.id,
+            BaseStation.name,
+            BaseStation.is_active,
+            db.func.ST_Y(BaseStation.location),
+            db.func.ST_X(BaseStation.location),
+            BaseStation.altitude
+        ).all()
+
+    def load(self, rows: List[Tuple]) -> None:
+        """Replace the cached stations with the given rows"""
+        stations = {station.id: station for station in build_geometry(rows)}
+        active = [station for station in stations.values() if station.is_active]
+        with self._lock:
+            self._stations = stations
+            self._active_ids = np.array([station.id for station in active], dtype=np.int64)
+            self._active_vectors = unit_vectors([s.latitude for s in active], [s.longitude for s in active])
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(stations)} base stations into the cache")
+
+    def _current(self) -> Dict[int, StationGeometry]:
+        with self._lock:
+            stations = self._stations
+            if stations is not None and (not self.ttl or time.monotonic() - self._loaded_at < self.ttl):
+                return stations
+        self.load(self._query())
+        return self._stations
+
+    def all(self) -> List[StationGeometry]:
+        return sorted(self._current().values(), key=lambda station: station.id)
+
+    def get(self, station_id) -> Optional[StationGeometry]:
+        try:
+            return self._current().get(int(station_id))
+        except (TypeError, ValueError):
+            return None
+
+    def nearest(self, latitude: float, longitude: float,
+                max_distance: Optional[float] = None) -> Tuple[Optional[StationGeometry], Optional[float]]:
+        """Closest active station to a position.
+
+        Args:
+            max_distance: Optional limit in metres
+
+        Returns:
+            Tuple of (station, geodesic distance in metres), or (None, None)
+            if there is no active station within max_distance
+        """
+        stations = self._current()
+        with self._lock:
+            ids, vectors = self._active_ids, self._active_vectors
+        if len(ids) == 0:
+            return None, None
+        index = int(np.argmax(vectors @ unit_vectors([latitude], [longitude])[0]))
+        station = stations[int(ids[index])]
+        distance = float(get_geod().inv(longitude, latitude, station.longitude, station.latitude)[2])
+        if max_distance is not None and distance > max_distance:
+            return None, None
+        return station, distance
+
+
+base_station_cache = BaseStationCache()
+
+
+def _invalidate(mapper, connection, target):
+    base_station_cache.invalidate()
+
+
+def register_invalidation(model) -> None:
+    """Drop the cache whenever a station row changes through the ORM"""
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        if not event.contains(model, name, _invalidate):
+            event.listen(model, name, _invalidate)
+
+
+def _rinex_approx_position(head: bytes) -> Optional[Tuple[float, float]]:
+    """Receiver position from the APPROX POSITION XYZ header record"""
+    for line in head.decode('ascii', errors='replace').splitlines():
+        label = line[60:].strip()
+        if label == 'END OF HEADER':
+            break
+        if label == 'APPROX POSITION XYZ':
+            try:
+                x, y, z = (float(value) for value in line[:42].split())
+            except ValueError:
+                return None
+            if x == 0 and y == 0 and z == 0:
+                return None
+            lon, lat, _ = get_transformer(ECEF, WGS84_3D).transform(x, y, z)
+            return float(lat), float(lon)
+    return None
+
+
+def approximate_position(file_path: str, format_type: str) -> Optional[Tuple[float, float]]:
+    """Rough (lat, lon) of a dataset from the start of its file.
+
+    Only the first POSITION_PROBE_BYTES are read, so this is cheap enough to
+    run while an upload is being stored.
+
+    Returns:
+        Median position of the epochs found, or None if there are none
+    """
+    from .processors.epochs import EpochBatch
+    from .processors.nmea_stream import NmeaEpochParser
+    from .processors.ubx_processor import UBXProcessor
+    from .processors.xyz_processor import XYZProcessor
+
+    with open(file_path, 'rb') as f:
+        head = f.read(POSITION_PROBE_BYTES)
+    if format_type in ('rnx', 'rinex'):
+        return _rinex_approx_position(head)
+
+    complete = head[:head.rfind(b'\n') + 1] if len(head) == POSITION_PROBE_BYTES else head
+    if format_type == 'nmea':
+        lines = complete.decode('ascii', errors='replace').splitlines()
+        data = EpochBatch.concat(NmeaEpochParser().parse(lines))
+        latitude, longitude = data.latitude, data.longitude
+    elif format_type == 'xyz':
+        data, _ = XYZProcessor().parse_xyz_bytes(complete)
+        latitude, longitude = data.latitude, data.longitude
+    elif format_type == 'ubx':
+        columns, _ = UBXProcessor().read_columns(np.frombuffer(head, dtype=np.uint8))
+        latitude, longitude = columns['latitude'], columns['longitude']
+    else:
+        return None
+
+    if len(latitude) == 0:
+        return None
+    return float(np.median(latitude)), float(np.median(longitude))
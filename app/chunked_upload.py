@@ -0,0 +1,295 @@
+"""Resumable chunked uploads.
+
+A client opens an upload session and sends the file as a sequence of
+chunks, each tagged with its byte offset, so an interrupted transfer can
+resume from the offset the server reports. Chunks are appended to a
+partial file, hashed and, for NMEA and XYZ, parsed straight into a
+parsed-epoch cache entry while the upload is in progress. When the upload
+completes the partial file becomes the content-addressed upload and the
+cache entry is published under the content hash, so the processing job
+only has to compute metrics.
+
+Session metadata is a JSON file and the parser state a pickle next to the
+partial data, so any application process can continue a session.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from .epoch_store import EpochStore, parsed_cache_key
+from .processors.incremental import IncrementalParser, INCREMENTAL_FORMATS, sniff_format
+
+logger = logging.getLogger(__name__)
+
+SESSION_FOLDER = 'partial'
+READ_SIZE = 1024 * 1024
+# Bytes needed before the format is sniffed
+SNIFF_BYTES = 4096
+UPLOAD_FORMATS = ('nmea', 'rnx', 'xyz', 'ubx')
+
+# Running hashers per session, valid while the session stays in this process
+_hashers: Dict[str, Tuple[int, 'hashlib._Hash']] = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Invalid upload request; status is the HTTP status to report"""
+
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class UploadSession:
+    """Server side state of one chunked upload"""
+
+    def __init__(self, folder: str, upload_id: str, meta: Dict):
+        self.folder = folder
+        self.id = upload_id
+        self.meta = meta
+
+    @property
+    def offset(self) -> int:
+        return self.meta['offset']
+
+    @property
+    def user_id(self) -> int:
+        return self.meta['user_id']
+
+    @property
+    def format_type(self) -> Optional[str]:
+        return self.meta['format_type']
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.folder, f'{self.id}.{suffix}')
+
+    @classmethod
+    def create(cls, upload_folder: str, user_id: int, filename: str,
+               base_station_id: Optional[int] = None, campaign: Optional[str] = None) -> 'UploadSession':
+        folder = os.path.join(upload_folder, SESSION_FOLDER)
+        os.makedirs(folder, exist_ok=True)
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else None
+        session = cls(folder, uuid.uuid4().hex, {
+            'user_id': user_id,
+            'filename': filename,
+            'extension': extension,
+            'format_type': None,
+            'base_station_id': base_station_id,
+            'campaign': campaign,
+            'offset': 0,
+            'epochs': 0,
+            'parsing': False,
+            'writer_path': None,
+            'created_at': time.time()
+        })
+        open(session._path('part'), 'wb').close()
+        session._save()
+        return session
+
+    @classmethod
+    def load(cls, upload_folder: str, upload_id: str) -> Optional['UploadSession']:
+        folder = os.path.join(upload_folder, SESSION_FOLDER)
+        if not upload_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(folder, f'{upload_id}.json')) as f:
+                return cls(folder, upload_id, json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def _save(self) -> None:
+        tmp_path = self._path(f'json.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path('json'))
+
+    def _load_parser(self) -> Optional[IncrementalParser]:
+        if not self.meta['parsing']:
+            return None
+        with open(self._path('parser'), 'rb') as f:
+            return pickle.load(f)
+
+    def _save_parser(self, parser: Optional[IncrementalParser]) -> None:
+        if parser is None:
+            return
+        tmp_path = self._path(f'parser.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(parser, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path('parser'))
+
+    def _hasher(self):
+        """Hasher positioned at the current offset, rebuilt from disk if needed"""
+        with _hashers_lock:
+            cached = _hashers.get(self.id)
+        if cached and cached[0] == self.offset:
+            # Copy, so a failed request cannot leave the cached hasher ahead of the offset
+            return cached[1].copy()
+        hasher = hashlib.sha256()
+        with open(self._path('part'), 'rb') as f:
+            remaining = self.offset
+            while remaining > 0:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+        return hasher
+
+    def _start_parsing(self, head: bytes, parsed_cache: Optional[EpochStore]) -> Optional[IncrementalParser]:
+        """Sniff the format from the first bytes and set up the incremental parser"""
+        format_type = sniff_format(head)
+        if format_type is None and self.meta['extension'] in ('nmea', 'xyz', 'rnx', 'rinex', 'ubx'):
+            format_type = 'rnx' if self.meta['extension'] == 'rinex' else self.meta['extension']
+        if format_type not in UPLOAD_FORMATS:
+            raise UploadError('Unrecognised file format. Supported formats: NMEA, RINEX, XYZ, UBX', 415)
+        self.meta['format_type'] = format_type
+        logger.info(f"Upload {self.id} detected as {format_type}")
+
+        if parsed_cache is None or format_type not in INCREMENTAL_FORMATS:
+            return None
+        writer = parsed_cache.writer(f'upload-{self.id}')
+        self.meta['parsing'] = True
+        self.meta['writer_path'] = writer.tmp_path
+        return IncrementalParser(format_type, writer)
+
+    def _stop_parsing(self, parser: Optional[IncrementalParser], reason: str) -> None:
+        logger.warning(f"Incremental parsing of upload {self.id} stopped: {reason}")
+        if parser is not None:
+            parser.sink.abort()
+        self.meta['parsing'] = False
+        self.meta['writer_path'] = None
+
+    @contextmanager
+    def _locked(self):
+        """Hold an exclusive lock on the session and reload its metadata"""
+        with open(self._path('part'), 'ab') as out:
+            fcntl.flock(out, fcntl.LOCK_EX)
+            try:
+                with open(self._path('json')) as f:
+                    self.meta = json.load(f)
+                yield out
+            finally:
+                fcntl.flock(out, fcntl.LOCK_UN)
+
+    def append(self, stream, offset: int, parsed_cache: Optional[EpochStore] = None) -> int:
+        """Append a chunk read from stream at the given offset.
+
+        Returns:
+            The new offset
+        """
+        with self._locked() as out:
+            if offset != self.offset:
+                raise UploadError('Offset does not match the received data', 409, self.offset)
+            out.truncate(self.offset)
+
+            hasher = self._hasher()
+            parser = self._load_parser()
+            head = b''
+            for data in iter(lambda: stream.read(READ_SIZE), b''):
+                out.write(data)
+                hasher.update(data)
+                self.meta['offset'] += len(data)
+                if self.format_type is None:
+                    head += data
+                    if len(head) < SNIFF_BYTES:
+                        continue
+                    parser = self._start_parsing(head, parsed_cache)
+                    data = head
+                if parser is not None:
+                    try:
+                        parser.feed(data)
+                    except Exception as e:
+                        self._stop_parsing(parser, str(e))
+                        parser = None
+            if self.format_type is None and head:
+                # Whole upload so far is shorter than SNIFF_BYTES
+                parser = self._start_parsing(head, parsed_cache)
+                if parser is not None:
+                    parser.feed(head)
+
+            out.flush()
+            if parser is not None:
+                self.meta['epochs'] = parser.epochs
+            self._save_parser(parser)
+            self._save()
+            with _hashers_lock:
+                _hashers[self.id] = (self.offset, hasher)
+            return self.offset
+
+    def complete(self, upload_folder: str, parsed_cache: Optional[EpochStore] = None) -> Tuple[str, int, str]:
+        """Finish the upload and move it to its content-addressed location.
+
+        Returns:
+            Tuple of (content hash, size in bytes, stored path)
+        """
+        with self._locked():
+            return self._complete(upload_folder, parsed_cache)
+
+    def _complete(self, upload_folder: str, parsed_cache: Optional[EpochStore]) -> Tuple[str, int, str]:
+        if self.format_type is None:
+            raise UploadError('No data received')
+        content_hash = self._hasher().hexdigest()
+        parser = self._load_parser()
+        if parser is not None:
+            try:
+                parser.finish()
+                if parsed_cache is not None and parsed_cache.exists(parsed_cache_key(content_hash)):
+                    parser.sink.abort()
+                else:
+                    parser.sink.commit(key=parsed_cache_key(content_hash))
+                    logger.info(f"Upload {self.id} parsed {parser.epochs} epochs while receiving")
+            except Exception as e:
+                self._stop_parsing(parser, str(e))
+
+        file_path = os.path.join(upload_folder, f'{content_hash}.{self.format_type}')
+        if os.path.exists(file_path):
+            os.remove(self._path('part'))
+        else:
+            os.replace(self._path('part'), file_path)
+        size = self.offset
+        self.meta['writer_path'] = None
+        self.delete()
+        return content_hash, size, file_path
+
+    def delete(self) -> None:
+        """Remove all files of the session, including a half written cache entry"""
+        if self.meta.get('writer_path'):
+            shutil.rmtree(self.meta['writer_path'], ignore_errors=True)
+        for suffix in ('part', 'parser', 'json'):
+            try:
+                os.remove(self._path(suffix))
+            except FileNotFoundError:
+                pass
+        with _hashers_lock:
+            _hashers.pop(self.id, None)
+
+
+def cleanup_stale_sessions(upload_folder: str, max_age: float) -> None:
+    """Delete sessions that have not received data for max_age seconds"""
+    folder = os.path.join(upload_folder, SESSION_FOLDER)
+    if not os.path.isdir(folder):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(folder):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+        except OSError:
+            continue
+        session = UploadSession.load(upload_folder, name[:-len('.json')])
+        if session is not None:
+            logger.info(f"Removing stale upload session {session.id}")
+            session.delete()
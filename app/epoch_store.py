@@ -0,0 +1,369 @@
+"""Per-epoch position storage.
+
+Each dataset's epochs are stored as a directory of raw little-endian
+column files (one per field) plus a small meta.json describing dtypes and
+row count. Columns are written in bulk with ndarray.tofile and read back
+through np.memmap, so reading a time window only touches the pages that
+hold it: the window bounds are found by binary search on the sorted
+timestamp column.
+"""
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+TIME_COLUMN = 'timestamp'
+# Columns that depend on the reference position rather than the raw data
+ERROR_COLUMNS = ('horizontal_error', 'vertical_error')
+# Bump whenever parsing changes; entries of older versions are no longer
+# opened and are evicted from the parsed cache as least recently used
+PARSER_VERSION = '2'
+
+
+def _to_datetime64(value) -> Optional[np.datetime64]:
+    if value is None:
+        return None
+    return np.datetime64(value, 'ns')
+
+
+def parsed_cache_key(content_hash: str) -> str:
+    """Parsed-cache key of a file's content for the current parser version"""
+    return f'{content_hash}-p{PARSER_VERSION}'
+
+
+class EpochWriter:
+    """Appends columnar epoch batches to a new store entry.
+
+    Data is written to a temporary directory and only becomes visible when
+    commit() renames it into place, so readers never see partial entries.
+    """
+
+    def __init__(self, store: 'EpochStore', key: str, exclude: Iterable[str] = ()):
+        self.store = store
+        self.key = key
+        self.exclude = set(exclude)
+        self.tmp_path = os.path.join(store.root, f'.{key}.{uuid.uuid4().hex}.tmp')
+        os.makedirs(self.tmp_path)
+        self.dtypes: Dict[str, str] = {}
+        self.count = 0
+        self.sorted = True
+        self._last_time = None
+        self._closed = False
+
+    def __setstate__(self, state):
+        """Restore a pickled writer, dropping rows appended after it was pickled"""
+        self.__dict__.update(state)
+        for name, dtype in self.dtypes.items():
+            path = os.path.join(self.tmp_path, f'{name}.bin')
+            size = self.count * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def append(self, columns: Dict[str, np.ndarray]) -> None:
+        """Append a batch of epochs (dict of equally long 1-D arrays)"""
+        if self.exclude:
+            columns = {name: values for name, values in columns.items() if name not in self.exclude}
+        if not columns:
+            return
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("All columns in a batch must have the same length")
+        n = lengths.pop()
+        if n == 0:
+            return
+        if self.count and set(columns) != set(self.dtypes):
+            raise ValueError("Batch columns differ from previously written columns")
+
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if name == TIME_COLUMN:
+                values = values.astype('datetime64[ns]')
+                if self.sorted:
+                    if self._last_time is not None and values[0] < self._last_time:
+                        self.sorted = False
+                    elif n > 1 and np.any(values[1:] < values[:-1]):
+                        self.sorted = False
+                self._last_time = values[-1]
+            dtype = self.dtypes.setdefault(name, values.dtype.newbyteorder('<').str)
+            with open(os.path.join(self.tmp_path, f'{name}.bin'), 'ab') as f:
+                values.astype(dtype, copy=False).tofile(f)
+        self.count += n
+
+    def commit(self, key: Optional[str] = None) -> 'EpochReader':
+        """Publish the written epochs under the writer's key.
+
+        Args:
+            key: Publish under this key instead (e.g. once a content hash is known)
+        """
+        if key is not None:
+            self.key = str(key)
+        meta = {
+            'count': self.count,
+            'columns': self.dtypes,
+            'sorted': self.sorted
+        }
+        with open(os.path.join(self.tmp_path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        final_path = self.store.path(self.key)
+        old_path = None
+        if os.path.exists(final_path):
+            old_path = f'{final_path}.{uuid.uuid4().hex}.old'
+            os.rename(final_path, old_path)
+        os.rename(self.tmp_path, final_path)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+        self._closed = True
+        self.store.evict(keep=self.key)
+        return EpochReader(final_path)
+
+    def abort(self) -> None:
+        """Discard everything written so far"""
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._closed:
+            return False
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+class EpochReader:
+    """Memory-mapped read access to a stored entry"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.count = meta['count']
+        self.dtypes = meta['columns']
+        self.sorted = meta['sorted']
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def columns(self):
+        return list(self.dtypes)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only memory-mapped column"""
+        if name not in self._columns:
+            if name not in self.dtypes:
+                raise KeyError(name)
+            dtype = np.dtype(self.dtypes[name])
+            if self.count == 0:
+                self._columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self._columns[name] = np.memmap(os.path.join(self.path, f'{name}.bin'),
+                                                dtype=dtype, mode='r', shape=(self.count,))
+        return self._columns[name]
+
+    def time_range(self, start=None, end=None):
+        """Return the [begin, end) row range covering a time window.
+
+        For unsorted entries the full range is returned and the window has to
+        be applied with time_mask(). Unparseable bounds raise ValueError.
+        """
+        start, end = _to_datetime64(start), _to_datetime64(end)
+        if not self.sorted or TIME_COLUMN not in self.dtypes:
+            return 0, self.count
+        times = self.column(TIME_COLUMN)
+        begin = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        stop = self.count if end is None else int(np.searchsorted(times, end, side='right'))
+        return begin, max(begin, stop)
+
+    def window_count(self, start=None, end=None) -> int:
+        """Number of epochs in a time window (inclusive bounds)"""
+        begin, stop = self.time_range(start, end)
+        if not self.sorted and (start is not None or end is not None):
+            return int(np.count_nonzero(self.time_mask(self.column(TIME_COLUMN)[begin:stop], start, end)))
+        return stop - begin
+
+    def read(self, columns: Optional[Iterable[str]] = None, start=None, end=None,
+             limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Read columns for a time window (inclusive bounds).
+
+        For sorted entries the result holds memmap views, so only the pages
+        in the window are ever read from disk. With limit only the first
+        limit epochs of the window are read.
+        """
+        columns = list(columns) if columns is not None else self.columns
+        begin, stop = self.time_range(start, end)
+        if not self.sorted and (start is not None or end is not None):
+            rows = np.flatnonzero(self.time_mask(self.column(TIME_COLUMN)[begin:stop], start, end)) + begin
+            if limit is not None:
+                rows = rows[:limit]
+            return {name: self.column(name)[rows] for name in columns}
+        if limit is not None:
+            stop = min(stop, begin + limit)
+        return {name: self.column(name)[begin:stop] for name in columns}
+
+    def iter_batches(self, batch_size: int = 65536, columns: Optional[Iterable[str]] = None,
+                     start=None, end=None, where: Optional[Tuple[Iterable[str], Callable]] = None
+                     ) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield a time window in batches of at most batch_size rows.
+
+        Args:
+            where: Optional (columns, predicate) row filter. The predicate
+                gets those columns of a batch and returns a boolean mask;
+                only the rows it keeps are read from the requested columns,
+                and batches without any are skipped.
+        """
+        columns = list(columns) if columns is not None else self.columns
+        filter_columns, predicate = (list(where[0]), where[1]) if where is not None else ([], None)
+        begin, stop = self.time_range(start, end)
+        for offset in range(begin, stop, batch_size):
+            upper = min(offset + batch_size, stop)
+            mask = None
+            if not self.sorted and (start is not None or end is not None):
+                mask = self.time_mask(self.column(TIME_COLUMN)[offset:upper], start, end)
+            if predicate is not None:
+                keep = np.asarray(predicate({name: self.column(name)[offset:upper] for name in filter_columns}),
+                                  dtype=bool)
+                mask = keep if mask is None else mask & keep
+                if not mask.any():
+                    continue
+            batch = {name: self.column(name)[offset:upper] for name in columns}
+            if mask is not None:
+                batch = {name: values[mask] for name, values in batch.items()}
+            yield batch
+
+    @staticmethod
+    def time_mask(times: np.ndarray, start=None, end=None) -> np.ndarray:
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= _to_datetime64(start)
+        if end is not None:
+            mask &= times <= _to_datetime64(end)
+        return mask
+
+
+class TeeSink:
+    """Epoch sink forwarding every batch to several sinks"""
+
+    def __init__(self, *sinks):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def append(self, columns: Dict[str, np.ndarray]) -> None:
+        for sink in self.sinks:
+            sink.append(columns)
+
+
+class EpochStore:
+    """Directory of per-key epoch entries.
+
+    With max_bytes set the store acts as a cache: opening an entry marks it
+    as recently used and committing a new entry evicts the least recently
+    used ones until the total size fits.
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key) -> str:
+        return os.path.join(self.root, str(key))
+
+    def exists(self, key) -> bool:
+        return os.path.exists(os.path.join(self.path(key), META_FILE))
+
+    def writer(self, key, exclude: Iterable[str] = ()) -> EpochWriter:
+        return EpochWriter(self, str(key), exclude)
+
+    def open(self, key) -> Optional[EpochReader]:
+        if not self.exists(key):
+            return None
+        if self.max_bytes is not None:
+            try:
+                os.utime(os.path.join(self.path(key), META_FILE))
+            except OSError:
+                pass
+        return EpochReader(self.path(key))
+
+    def add_column(self, key, name: str, values: np.ndarray) -> None:
+        """Add a derived column to a committed entry.
+
+        The column file and the updated meta.json are written under temporary
+        names and renamed into place, so readers see either the old or the
+        new entry. Entries shared by copy() keep their own meta.json.
+        """
+        path = self.path(key)
+        reader = EpochReader(path)
+        values = np.asarray(values)
+        if len(values) != reader.count:
+            raise ValueError(f"Column {name} has {len(values)} rows, entry has {reader.count}")
+        dtype = values.dtype.newbyteorder('<').str
+        suffix = uuid.uuid4().hex
+        column_tmp = os.path.join(path, f'.{name}.{suffix}.tmp')
+        values.astype(dtype, copy=False).tofile(column_tmp)
+        os.replace(column_tmp, os.path.join(path, f'{name}.bin'))
+
+        meta = {'count': reader.count, 'columns': {**reader.dtypes, name: dtype}, 'sorted': reader.sorted}
+        meta_tmp = os.path.join(path, f'.{META_FILE}.{suffix}.tmp')
+        with open(meta_tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_tmp, os.path.join(path, META_FILE))
+
+    def delete(self, key) -> None:
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def copy(self, src_key, dst_key) -> Optional[EpochReader]:
+        """Publish an existing entry under another key using hard links (no data copy)"""
+        if not self.exists(src_key):
+            return None
+        writer = self.writer(dst_key)
+        src_path = self.path(src_key)
+        for name in os.listdir(src_path):
+            os.link(os.path.join(src_path, name), os.path.join(writer.tmp_path, name))
+        final_path = self.path(writer.key)
+        self.delete(writer.key)
+        os.rename(writer.tmp_path, final_path)
+        return EpochReader(final_path)
+
+    def entry_size(self, key) -> int:
+        path = self.path(key)
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        except OSError:
+            return 0
+
+    def evict(self, keep=None) -> None:
+        """Remove least recently used entries until the store fits in max_bytes"""
+        if self.max_bytes is None:
+            return
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            try:
+                used = os.stat(os.path.join(entry.path, META_FILE)).st_mtime
+            except OSError:
+                continue
+            entries.append((used, entry.name, self.entry_size(entry.name)))
+
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == str(keep):
+                continue
+            self.delete(key)
+            total -= size
+            logger.info(f"Evicted epoch cache entry {key} ({size} bytes)")
@@ -0,0 +1,311 @@
+"""Streaming export of a dataset's stored epochs.
+
+Epochs are read from the epoch store one batch at a time, and each batch
+is formatted and handed to the response before the next one is read.
+An export of any size therefore starts sending right away and holds a
+single batch in memory.
+
+CSV, GeoJSON and GPX are produced as text chunks. Parquet is written by
+pyarrow with one row group per batch; each row group is flushed to the
+response as soon as it is complete, and the footer follows the last one.
+
+The filters are pushed down to the store:
+
+- The time window is found by binary search on the stored timestamps.
+- The fix filter is evaluated on the quality column alone (EpochReader's
+  where filter), so the other columns of filtered-out rows are never read.
+"""
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from .epoch_store import EpochReader, TIME_COLUMN
+from .processors.downsample import TRACK_LEVEL_COLUMN
+from .processors.fix_quality import FIX_CLASS_NAMES, FIX_NONE, FIX_SINGLE, fix_classes
+
+# Format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'geojson': ('application/geo+json', 'geojson'),
+    'gpx': ('application/gpx+xml', 'gpx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+GEOMETRIES = ('points', 'line')
+
+TEXT_BATCH_SIZE = 65536
+PARQUET_ROW_GROUP_SIZE = 262144
+
+# Stored columns the fix class is derived from, in order of preference
+QUALITY_COLUMNS = ('fix_class', 'quality', 'solution_type')
+FIX_COLUMN = 'fix'
+LEADING_COLUMNS = (TIME_COLUMN, 'latitude', 'longitude', 'altitude', 'horizontal_error', 'vertical_error')
+# Map display levels, not data
+INTERNAL_COLUMNS = (TRACK_LEVEL_COLUMN,)
+
+# Float formats: about 0.1 mm in degrees and in metres
+DEGREE_FORMAT = '%.9f'
+FLOAT_FORMAT = '%.4f'
+DEGREE_COLUMNS = ('latitude', 'longitude')
+
+# GPX only knows none, 2d, 3d, dgps and pps
+GPX_FIX = {FIX_NONE: 'none', FIX_SINGLE: '3d'}
+GPX_CREATOR = 'GNSS Analysis'
+
+_FIX_NAMES = np.array([FIX_CLASS_NAMES[code] for code in sorted(FIX_CLASS_NAMES)])
+
+
+def _strings(name: str, values: np.ndarray, missing: str = '') -> List[str]:
+    """A column as text; non-finite floats become missing"""
+    if name == TIME_COLUMN:
+        return np.datetime_as_string(values.astype('datetime64[ms]'), unit='ms', timezone='UTC').tolist()
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        spec = DEGREE_FORMAT if name in DEGREE_COLUMNS else FLOAT_FORMAT
+        text = [spec % value for value in values.tolist()]
+        for index in np.flatnonzero(~np.isfinite(values)).tolist():
+            text[index] = missing
+        return text
+    if values.dtype.kind == 'b':
+        return ['true' if value else 'false' for value in values.tolist()]
+    return list(map(str, values.tolist()))
+
+
+def _template(text: str) -> str:
+    """Literal text for a %-format template"""
+    return text.replace('%', '%%')
+
+
+class _ChunkSink:
+    """Write-only file collecting what pyarrow writes until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class EpochExport:
+    """Filtered export of one stored dataset in any of EXPORT_FORMATS.
+
+    All arguments are checked on construction, so errors can be reported
+    before a streamed response starts.
+    """
+
+    def __init__(self, reader: EpochReader, columns: Optional[Iterable[str]] = None,
+                 start=None, end=None, fix: Optional[Iterable[str]] = None, name: str = 'dataset'):
+        """
+        Args:
+            reader: Stored epochs of the dataset
+            columns: Columns to export (stored names or 'fix'); all by default
+            start: Optional first time (inclusive)
+            end: Optional last time (inclusive)
+            fix: Optional fix class names to keep (see FIX_CLASS_NAMES)
+            name: Dataset name for the GeoJSON and GPX metadata
+        """
+        self.reader = reader
+        self.start = start
+        self.end = end
+        self.name = name
+        # Raises ValueError for unparseable bounds
+        self.reader.time_range(start, end)
+
+        self.quality_columns = [column for column in QUALITY_COLUMNS if column in reader.dtypes][:1]
+        available = [column for column in reader.columns if column not in INTERNAL_COLUMNS]
+        if self.quality_columns:
+            available.append(FIX_COLUMN)
+        if columns is None:
+            leading = [column for column in LEADING_COLUMNS if column in available]
+            extra = [column for column in available if column not in LEADING_COLUMNS and column != FIX_COLUMN]
+            columns = leading + ([FIX_COLUMN] if FIX_COLUMN in available else []) + extra
+        self.columns = list(columns)
+        unknown = [column for column in self.columns if column not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        self.fix = None
+        if fix is not None:
+            codes = {value: code for code, value in FIX_CLASS_NAMES.items()}
+            unknown = [value for value in fix if value not in codes]
+            if unknown:
+                raise ValueError(f"Unknown fix classes: {', '.join(unknown)} (use {', '.join(codes)})")
+            self.fix = np.array(sorted({codes[value] for value in fix}), dtype=np.int8)
+
+    def batches(self, batch_size: int, columns: Iterable[str]) -> Iterator[Dict[str, np.ndarray]]:
+        """Stored columns in the time window for the epochs passing the fix filter"""
+        columns = list(columns)
+        stored = [column for column in columns if column != FIX_COLUMN]
+        if FIX_COLUMN in columns:
+            stored += [column for column in self.quality_columns if column not in stored]
+
+        where = None
+        if self.fix is not None:
+            if self.quality_columns:
+                where = (self.quality_columns, lambda quality: np.isin(fix_classes(quality), self.fix))
+            elif FIX_SINGLE not in self.fix:
+                # Epochs without quality information count as single fixes
+                return
+        for batch in self.reader.iter_batches(batch_size, stored, self.start, self.end, where):
+            if FIX_COLUMN in columns:
+                batch[FIX_COLUMN] = fix_classes({column: batch[column] for column in self.quality_columns})
+            yield batch
+
+    def stream(self, output_format: str, geometry: str = 'points') -> Iterator:
+        """Chunks of the export in output_format (str for text formats, bytes for Parquet)"""
+        if output_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {output_format} (use {', '.join(EXPORT_FORMATS)})")
+        if geometry not in GEOMETRIES:
+            raise ValueError(f"Unknown geometry {geometry} (use {', '.join(GEOMETRIES)})")
+        if output_format == 'csv':
+            return self.csv()
+        if output_format == 'geojson':
+            return self.geojson_line() if geometry == 'line' else self.geojson_points()
+        if output_format == 'gpx':
+            return self.gpx()
+        return self.parquet()
+
+    def _position_batches(self, columns: Iterable[str]) -> Iterator[Dict[str, np.ndarray]]:
+        """Batches with the position columns, restricted to epochs with a finite horizontal position"""
+        position = ['latitude', 'longitude'] + (['altitude'] if 'altitude' in self.reader.dtypes else [])
+        columns = position + [column for column in columns if column not in position]
+        for batch in self.batches(TEXT_BATCH_SIZE, columns):
+            valid = np.isfinite(batch['latitude']) & np.isfinite(batch['longitude'])
+            if not valid.all():
+                batch = {column: values[valid] for column, values in batch.items()}
+            if len(batch['latitude']):
+                yield batch
+
+    @staticmethod
+    def _coordinates(batch: Dict[str, np.ndarray]) -> List[str]:
+        """GeoJSON positions [lon,lat] or [lon,lat,alt] of a batch"""
+        n = len(batch['latitude'])
+        altitude = [f',{value}' if value else '' for value in _strings('altitude', batch['altitude'])] \
+            if 'altitude' in batch else [''] * n
+        return [f'[{lon},{lat}{alt}]' for lon, lat, alt in zip(_strings('longitude', batch['longitude']),
+                                                               _strings('latitude', batch['latitude']), altitude)]
+
+    @staticmethod
+    def _elements(tag: str, texts: Optional[List[str]], n: int) -> List[str]:
+        """XML elements of a column's values, empty where a value is missing"""
+        if texts is None:
+            return [''] * n
+        return [f'<{tag}>{text}</{tag}>' if text else '' for text in texts]
+
+    def _text(self, column: str, values: np.ndarray, missing: str = '') -> List[str]:
+        return _FIX_NAMES[np.asarray(values, dtype=np.int64)].tolist() if column == FIX_COLUMN \
+            else _strings(column, values, missing)
+
+    def csv(self) -> Iterator[str]:
+        yield ','.join(self.columns) + '\n'
+        for batch in self.batches(TEXT_BATCH_SIZE, self.columns):
+            text = [self._text(column, batch[column]) for column in self.columns]
+            yield '\n'.join(map(','.join, zip(*text))) + '\n'
+
+    def geojson_points(self) -> Iterator[str]:
+        """FeatureCollection with a Point feature per epoch and its other columns as properties"""
+        properties = [column for column in self.columns if column not in ('latitude', 'longitude', 'altitude')]
+        template = (_template('{"type":"Feature","geometry":{"type":"Point","coordinates":') + '%s' +
+                    _template('},"properties":{') +
+                    ','.join(_template(json.dumps(column)) + ':%s' for column in properties) + '}}')
+
+        yield '{"type":"FeatureCollection","features":[\n'
+        separator = ''
+        for batch in self._position_batches(properties):
+            values = [self._coordinates(batch)]
+            for column in properties:
+                if column in (TIME_COLUMN, FIX_COLUMN):
+                    values.append([f'"{text}"' for text in self._text(column, batch[column])])
+                else:
+                    values.append(self._text(column, batch[column], missing='null'))
+            yield separator + ',\n'.join(template % row for row in zip(*values))
+            separator = ',\n'
+        yield '\n]}\n'
+
+    def geojson_line(self) -> Iterator[str]:
+        """FeatureCollection with the track as one LineString feature"""
+        yield ('{"type":"FeatureCollection","features":[{"type":"Feature","properties":' +
+               json.dumps({'name': self.name}) + ',"geometry":{"type":"LineString","coordinates":[\n')
+        separator = ''
+        for batch in self._position_batches([]):
+            yield separator + ',\n'.join(self._coordinates(batch))
+            separator = ',\n'
+        yield '\n]}}]}\n'
+
+    def gpx(self) -> Iterator[str]:
+        """GPX 1.1 track with elevation, time, fix, satellites and HDOP where stored"""
+        optional = [column for column in ('satellites', 'hdop') if column in self.reader.dtypes]
+        if self.quality_columns:
+            optional.append(FIX_COLUMN)
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               f'<gpx version="1.1" creator="{GPX_CREATOR}" xmlns="http://www.topografix.com/GPX/1/1">\n'
+               f'<trk><name>{escape(self.name)}</name><trkseg>\n')
+        for batch in self._position_batches([TIME_COLUMN, *optional]):
+            n = len(batch['latitude'])
+            fix = [GPX_FIX.get(code, 'dgps') for code in batch[FIX_COLUMN].tolist()] \
+                if FIX_COLUMN in batch else None
+            # Child elements in the order of the GPX schema
+            parts = [
+                _strings('latitude', batch['latitude']),
+                _strings('longitude', batch['longitude']),
+                self._elements('ele', _strings('altitude', batch['altitude']) if 'altitude' in batch else None, n),
+                _strings(TIME_COLUMN, batch[TIME_COLUMN]),
+                self._elements('fix', fix, n),
+                self._elements('sat', _strings('satellites', batch['satellites']) if 'satellites' in batch else None, n),
+                self._elements('hdop', _strings('hdop', batch['hdop']) if 'hdop' in batch else None, n)
+            ]
+            yield '\n'.join('<trkpt lat="%s" lon="%s">%s<time>%s</time>%s%s%s</trkpt>' % row
+                             for row in zip(*parts)) + '\n'
+        yield '</trkseg></trk>\n</gpx>\n'
+
+    def parquet(self) -> Iterator[bytes]:
+        """Parquet file with one row group per batch, streamed as row groups complete"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        fix_names = pa.array(_FIX_NAMES.tolist())
+        fields = []
+        for column in self.columns:
+            if column == TIME_COLUMN:
+                fields.append(pa.field(column, pa.timestamp('ns', tz='UTC')))
+            elif column == FIX_COLUMN:
+                fields.append(pa.field(column, pa.dictionary(pa.int8(), pa.string())))
+            else:
+                fields.append(pa.field(column, pa.from_numpy_dtype(np.dtype(self.reader.dtypes[column]))))
+        schema = pa.schema(fields)
+
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        try:
+            for batch in self.batches(PARQUET_ROW_GROUP_SIZE, self.columns):
+                arrays = []
+                for column, field in zip(self.columns, schema):
+                    if column == FIX_COLUMN:
+                        arrays.append(pa.DictionaryArray.from_arrays(pa.array(batch[column]), fix_names))
+                    else:
+                        arrays.append(pa.array(np.asarray(batch[column]), type=field.type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
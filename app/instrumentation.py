@@ -0,0 +1,233 @@
+"""Processing and request instrumentation.
+
+Jobs time their stages with processors.timing.StageTimer in the pool
+worker; the timings, epochs per second and the worker's peak resident set
+size are stored with the analysis result (AnalysisResult.timings) and
+aggregated here into Prometheus metrics when the job completes. Request
+counts and latencies are recorded per URL rule, so label cardinality stays
+bounded. GET /metrics serves all of them in the Prometheus text format.
+
+Metrics live in the memory of each application process; with several web
+workers each one is scraped (or aggregated) separately.
+
+cProfile dumps are opt-in: with PROFILE_TOKEN set, a request carrying the
+same value in an X-Profile header is profiled and its stats written to
+PROFILE_FOLDER (open them with pstats or snakeviz), so hot spots can be
+found in production by sending one request. PROFILE_JOBS profiles every
+processing job in its worker the same way.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+                    600.0, 1800.0)
+PROFILE_HEADER = 'X-Profile'
+
+
+def reset_peak_rss() -> bool:
+    """Restart peak RSS tracking of this process (Linux only).
+
+    Pool workers run many jobs, so without a reset the peak would be the
+    largest of all jobs the worker has run so far.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process since start or the last reset"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def dump_profile(profiler: cProfile.Profile, folder: str, name: str) -> str:
+    """Write profiler stats to folder and return the file path"""
+    os.makedirs(folder, exist_ok=True)
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'profile'
+    path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_name}.prof")
+    profiler.dump_stats(path)
+    logger.info(f"Profile written to {path}")
+    return path
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict] = {}
+
+    def _register(self, name: str, kind: str, description: str, buckets: Sequence[float] = ()) -> None:
+        self._metrics[name] = {'kind': kind, 'help': description, 'buckets': tuple(buckets), 'series': {}}
+
+    def counter(self, name: str, description: str) -> None:
+        self._register(name, 'counter', description)
+
+    def gauge(self, name: str, description: str) -> None:
+        self._register(name, 'gauge', description)
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DURATION_BUCKETS) -> None:
+        self._register(name, 'histogram', description, sorted(buckets))
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._metrics[name]['series']
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._metrics[name]['series'][tuple(sorted(labels.items()))] = float(value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metrics[name]
+            series = metric['series'].get(key)
+            if series is None:
+                series = metric['series'][key] = {'buckets': [0] * len(metric['buckets']), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(metric['buckets']):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['kind']}")
+                for labels, value in sorted(metric['series'].items()):
+                    if metric['kind'] != 'histogram':
+                        lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+                        continue
+                    bounds = [*metric['buckets'], float('inf')]
+                    for bound, count in zip(bounds, [*value['buckets'], value['count']]):
+                        bucket_labels = _label_text(labels + (('le', _number(bound)),))
+                        lines.append(f"{name}_bucket{bucket_labels} {count}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_label_text(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.counter('gnss_jobs_total', 'Processing jobs finished, by format and status')
+metrics.histogram('gnss_job_duration_seconds', 'Wall time of processing jobs in the worker')
+metrics.histogram('gnss_job_stage_seconds', 'Exclusive wall time of processing stages')
+metrics.counter('gnss_job_epochs_total', 'Epochs processed by jobs')
+metrics.gauge('gnss_job_epochs_per_second', 'Throughput of the last finished job')
+metrics.gauge('gnss_job_peak_rss_bytes', 'Peak resident set size of the worker during the last finished job')
+metrics.counter('gnss_http_requests_total', 'HTTP requests, by method, URL rule and status')
+metrics.histogram('gnss_http_request_duration_seconds', 'HTTP request latency until the response is returned')
+
+
+def record_job(format_type: Optional[str], status: str, timings: Optional[Dict] = None) -> None:
+    """Aggregate the outcome and timings of a finished job into the metrics"""
+    format_type = (format_type or 'unknown').lower()
+    metrics.inc('gnss_jobs_total', format=format_type, status=status)
+    if not timings:
+        return
+    metrics.observe('gnss_job_duration_seconds', timings.get('total_seconds', 0.0), format=format_type)
+    for stage, seconds in timings.get('stages', {}).items():
+        metrics.observe('gnss_job_stage_seconds', seconds, stage=stage)
+    metrics.inc('gnss_job_epochs_total', timings.get('rows', 0), format=format_type)
+    if timings.get('rows_per_second') is not None:
+        metrics.set('gnss_job_epochs_per_second', timings['rows_per_second'], format=format_type)
+    if timings.get('peak_rss_bytes') is not None:
+        metrics.set('gnss_job_peak_rss_bytes', timings['peak_rss_bytes'], format=format_type)
+
+
+class Instrumentation:
+    """Request metrics, the /metrics endpoint and opt-in request profiling"""
+
+    def __init__(self, app=None):
+        self.profile_token = None
+        self.profile_folder = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.profile_token = app.config.get('PROFILE_TOKEN')
+        self.profile_folder = app.config.get('PROFILE_FOLDER')
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if app.config.get('METRICS_ENABLED', True):
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.extensions['instrumentation'] = self
+
+    def _profile_requested(self, request) -> bool:
+        value = request.headers.get(PROFILE_HEADER)
+        return bool(self.profile_token and value and hmac.compare_digest(value, self.profile_token))
+
+    def _before_request(self):
+        from flask import g, request
+
+        g.request_started = time.perf_counter()
+        if self._profile_requested(request):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _after_request(self, response):
+        from flask import g, request
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            path = dump_profile(profiler, self.profile_folder, f'{request.method}-{request.path}')
+            response.headers['X-Profile-File'] = os.path.basename(path)
+
+        started = g.pop('request_started', None)
+        rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.inc('gnss_http_requests_total', method=request.method, rule=rule, status=str(response.status_code))
+        if started is not None:
+            metrics.observe('gnss_http_request_duration_seconds', time.perf_counter() - started,
+                            method=request.method, rule=rule)
+        return response
+
+    def metrics_view(self):
+        from flask import make_response
+
+        response = make_response(metrics.render(), 200)
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return response
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,476 @@
+"""Background processing of uploaded datasets.
+
+Jobs are rows in the processing_job table, so no external broker is
+needed. Each application process runs a dispatcher thread that claims
+queued jobs (up to MAX_CONCURRENT_JOBS running across all processes) and
+hands them to a local process pool, so parsing runs on multiple cores
+outside the request threads. Dataset.processing_status follows the job
+through queued -> running -> done/failed.
+"""
+import cProfile
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for the Postgres advisory lock serialising job claims
+CLAIM_LOCK_KEY = 0x474E5353
+
+# Seconds between progress updates of a running job
+PROGRESS_INTERVAL = 1.0
+
+# Per worker-process engine used to report progress
+_progress_engine = None
+
+
+def _init_worker(database_uri: str) -> None:
+    global _progress_engine
+    _progress_engine = create_engine(database_uri, poolclass=NullPool)
+
+
+def _report_progress(job_id: Optional[int], progress: float) -> None:
+    if _progress_engine is None or job_id is None:
+        return
+    try:
+        with _progress_engine.begin() as conn:
+            conn.execute(
+                text("UPDATE processing_job SET progress = :progress WHERE id = :id"),
+                {'progress': progress, 'id': job_id}
+            )
+    except Exception as e:
+        logger.warning(f"Could not report progress for job {job_id}: {str(e)}")
+
+
+class _ProgressReporter:
+    """Processor progress callback writing the parsed fraction into the job's 0.1-0.9 range"""
+
+    __slots__ = ('job_id', '_last')
+
+    def __init__(self, job_id: Optional[int]):
+        self.job_id = job_id
+        self._last = time.monotonic()
+
+    def __call__(self, fraction: float) -> None:
+        now = time.monotonic()
+        if now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        _report_progress(self.job_id, 0.1 + 0.8 * min(max(fraction, 0.0), 1.0))
+
+
+def station_coords(base_station_id: Optional[int]) -> Optional[Tuple[float, float, float]]:
+    """Return (lat, lon, altitude) of a base station, if it exists"""
+    from .base_stations import base_station_cache
+
+    if not base_station_id:
+        return None
+    station = base_station_cache.get(base_station_id)
+    return station.coords if station else None
+
+
+def base_station_coords(dataset) -> Optional[Tuple[float, float, float]]:
+    """Return (lat, lon, altitude) of the dataset's base station, if any"""
+    return station_coords(dataset.base_station_id)
+
+
+def result_cache_key(content_hash: Optional[str],
+                     base_station_coords: Optional[Tuple[float, float, float]],
+                     options: Optional[Dict] = None) -> Optional[str]:
+    """Key identifying an analysis of given content against a given reference.
+
+    options are the GNSSProcessor settings the metrics depend on (epoch
+    filter, reference estimator, outlier rejection); unset ones are left
+    out of the key.
+    """
+    from .processors.gnss_processor import PROCESSOR_VERSION
+
+    if not content_hash:
+        return None
+    reference = [round(float(c), 9) for c in base_station_coords] if base_station_coords else None
+    key = [content_hash, 'fixed' if reference else 'floating', reference, PROCESSOR_VERSION]
+    if options:
+        key.append(sorted((name, value) for name, value in options.items() if value is not None))
+    payload = json.dumps(key)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def run_processing(job_id: int, file_path: str, format_type: str,
+                   base_station_coords: Optional[Tuple[float, float, float]],
+                   dataset_id: int, content_hash: Optional[str], config: Dict,
+                   nav_path: Optional[str] = None) -> Dict:
+    """Parse a dataset file, compute its metrics and store its epochs (runs in a pool worker).
+
+    Parsed epochs are cached by content hash (covering the navigation file
+    for RINEX), so re-uploads of the same file with another reference skip
+    parsing entirely. Stage timings, throughput and the worker's peak RSS
+    are returned in metrics['timings']; with PROFILE_JOBS the whole run is
+    profiled with cProfile.
+    """
+    from .instrumentation import dump_profile, peak_rss_bytes, reset_peak_rss
+    from .processors.timing import StageTimer
+
+    _report_progress(job_id, 0.1)
+    reset_peak_rss()
+    timer = StageTimer()
+    profiler = cProfile.Profile() if config.get('PROFILE_JOBS') else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        metrics = _process(file_path, format_type, base_station_coords, dataset_id, content_hash, config,
+                           nav_path, timer, _ProgressReporter(job_id))
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            dump_profile(profiler, config['PROFILE_FOLDER'], f'job-{job_id}-dataset-{dataset_id}')
+    timings = timer.to_dict()
+    metrics['processing_duration'] = timings['total_seconds']
+    metrics['timings'] = {**timings, 'peak_rss_bytes': peak_rss_bytes()}
+    _report_progress(job_id, 0.9)
+    return metrics
+
+
+def _process(file_path, format_type, base_station_coords, dataset_id, content_hash, config, nav_path, timer,
+             progress=None):
+    """Body of run_processing, timed by timer"""
+    from .epoch_store import EpochStore, TeeSink, ERROR_COLUMNS, parsed_cache_key
+    from .processors.gnss_processor import GNSSProcessor
+    from .raw_archive import worker_archive
+
+    parsed_cache = parsed_key = None
+    if content_hash:
+        parsed_key = parsed_cache_key(content_hash)
+        parsed_cache = EpochStore(config['PARSED_CACHE_FOLDER'], max_bytes=config['PARSED_CACHE_MAX_BYTES'])
+
+    with EpochStore(config['EPOCH_STORE_FOLDER']).writer(dataset_id) as writer:
+        processor = GNSSProcessor(base_station_coords, epoch_sink=writer,
+                                  rinex_cache=config.get('RINEX_CACHE_FOLDER'),
+                                  rinex_cache_max_bytes=config.get('RINEX_CACHE_MAX_BYTES'),
+                                  timer=timer, progress=progress,
+                                  **config.get('METRIC_OPTIONS', {}))
+        cached = parsed_cache.open(parsed_key) if parsed_cache else None
+        if cached is not None:
+            logger.info(f"Using cached epochs for {content_hash}")
+            metrics = processor.process_cached(cached, format_type)
+        else:
+            cache_writer = parsed_cache.writer(parsed_key, exclude=ERROR_COLUMNS) if parsed_cache else None
+            processor.epoch_sink = TeeSink(writer, cache_writer)
+            try:
+                metrics = _process_upload(processor, file_path, format_type, nav_path, worker_archive(config))
+            except Exception:
+                if cache_writer:
+                    cache_writer.abort()
+                raise
+            if cache_writer:
+                if 'error' in metrics:
+                    cache_writer.abort()
+                else:
+                    cache_writer.commit()
+        if 'error' in metrics:
+            writer.abort()
+    if 'error' not in metrics:
+        with timer.stage('store'):
+            _store_track_levels(EpochStore(config['EPOCH_STORE_FOLDER']), dataset_id)
+    return metrics
+
+
+def _process_upload(processor, file_path, format_type, nav_path, archive):
+    """Run the processor on an upload from the upload folder or, once archived, from the raw archive"""
+    from .raw_archive import local_copy, open_upload
+
+    with ExitStack() as stack:
+        if format_type.lower() in ('rnx', 'rinex'):
+            # georinex reads by file name, so archived RINEX files are restored to disk
+            with processor.timer.stage('read'):
+                obs_path = stack.enter_context(local_copy(file_path, archive))
+                nav_copy = stack.enter_context(local_copy(nav_path, archive))
+            return processor.process_file(obs_path, format_type, nav_copy)
+        source = stack.enter_context(open_upload(file_path, archive))
+        return processor.process_file(source, format_type)
+
+
+def _store_track_levels(store, dataset_id: int) -> None:
+    """Precompute map simplification levels for a dataset's stored track"""
+    from .processors.downsample import track_levels, TRACK_LEVEL_COLUMN
+
+    reader = store.open(dataset_id)
+    if reader is None or 'latitude' not in reader.dtypes:
+        return
+    levels = track_levels(reader.column('latitude'), reader.column('longitude'))
+    store.add_column(dataset_id, TRACK_LEVEL_COLUMN, levels)
+
+
+class JobConflictError(Exception):
+    """A dataset already has an active job that cannot be reused or changed"""
+
+
+class JobQueue:
+    """Database-backed job queue executed by a local process pool"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_jobs = 1
+        self.poll_interval = 2.0
+        self.job_timeout = None
+        self.metric_options = {}
+        self._executor = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._active = 0
+        self._owner = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_jobs = app.config.setdefault('MAX_CONCURRENT_JOBS', os.cpu_count() or 2)
+        self.poll_interval = app.config.setdefault('JOB_POLL_INTERVAL', 2.0)
+        self.job_timeout = app.config.setdefault('JOB_TIMEOUT', 3600)
+        self.metric_options = {
+            'min_ratio': app.config.get('QUALITY_MIN_RATIO'),
+            'max_age': app.config.get('QUALITY_MAX_AGE'),
+            'reference_estimator': app.config.get('REFERENCE_ESTIMATOR', 'median'),
+            'outlier_sigma': app.config.get('OUTLIER_SIGMA')
+        }
+        app.extensions['job_queue'] = self
+
+    def enqueue(self, dataset, base_station_id: Optional[int] = None, commit: bool = True):
+        """Queue a dataset for processing and return its job.
+
+        An active job of the dataset is reused when it computes against the
+        same reference; a queued one against another reference is switched
+        to the requested one.
+
+        Args:
+            base_station_id: Optional station to analyse against instead of
+                the dataset's own (the dataset itself is left unchanged)
+            commit: False stages the job in the session for the caller to
+                commit with other changes, then call wake()
+
+        Raises:
+            JobConflictError: If a running job uses another reference
+        """
+        from .models import ProcessingJob, db
+
+        job = ProcessingJob.query.filter(
+            ProcessingJob.dataset_id == dataset.id,
+            ProcessingJob.status.in_(('queued', 'running'))
+        ).first()
+        reference = base_station_id if base_station_id is not None else dataset.base_station_id
+        if job is not None and job.reference_station_id != reference:
+            if job.status == 'running':
+                raise JobConflictError(f"Dataset {dataset.id} is being processed against another reference")
+            job.base_station_id = base_station_id
+            logger.info(f"Switched queued job {job.id} of dataset {dataset.id} to reference {reference}")
+        elif job is None:
+            job = ProcessingJob(dataset_id=dataset.id, status='queued', progress=0.0, base_station_id=base_station_id)
+            db.session.add(job)
+            dataset.processing_status = 'queued'
+            db.session.flush()
+            logger.info(f"Queued job {job.id} for dataset {dataset.id}")
+
+        if commit:
+            db.session.commit()
+            self.wake()
+        return job
+
+    def wake(self):
+        """Have the dispatcher look for queued jobs now"""
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Start the dispatcher thread and worker pool (once per process)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._owner == os.getpid():
+                return
+            self._owner = os.getpid()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_jobs,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.app.config['SQLALCHEMY_DATABASE_URI'],)
+            )
+            self._thread = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+            self._thread.start()
+            logger.info(f"Job dispatcher started with {self.max_jobs} workers")
+
+    def _dispatch_loop(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    for job_args in self._claim_jobs():
+                        self._submit(*job_args)
+            except Exception as e:
+                logger.error(f"Job dispatcher error: {str(e)}")
+                logger.error(traceback.format_exc())
+            self._wakeup.wait(self.poll_interval)
+
+    def _claim_jobs(self):
+        """Move queued jobs to running while respecting the global concurrency cap"""
+        from .models import Dataset, ProcessingJob, db
+
+        with self._lock:
+            local_slots = self.max_jobs - self._active
+        if local_slots <= 0:
+            return []
+
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': CLAIM_LOCK_KEY})
+
+        self._fail_stale_jobs()
+        running = ProcessingJob.query.filter_by(status='running').count()
+        slots = min(local_slots, self.max_jobs - running)
+        if slots <= 0:
+            db.session.commit()
+            return []
+
+        jobs = (ProcessingJob.query
+                .filter_by(status='queued')
+                .order_by(ProcessingJob.created_at, ProcessingJob.id)
+                .limit(slots)
+                .with_for_update(skip_locked=True)
+                .all())
+
+        claimed = []
+        for job in jobs:
+            dataset = db.session.get(Dataset, job.dataset_id)
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            dataset.processing_status = 'running'
+            claimed.append((job.id, dataset.id, dataset.stored_filename, dataset.format_type,
+                            dataset.processing_hash, station_coords(job.reference_station_id),
+                            dataset.nav_filename))
+        db.session.commit()
+        return claimed
+
+    def _fail_stale_jobs(self):
+        """Fail jobs whose worker disappeared (e.g. the process was killed)"""
+        from .models import Dataset, ProcessingJob, db
+
+        if not self.job_timeout:
+            return
+        cutoff = datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        stale = (ProcessingJob.query
+                 .filter(ProcessingJob.status == 'running', ProcessingJob.started_at < cutoff)
+                 .with_entities(ProcessingJob.id, ProcessingJob.dataset_id)
+                 .all())
+        for job_id, dataset_id in stale:
+            # A job completing meanwhile keeps its outcome
+            if self._finish(job_id, {'status': 'failed', 'error': 'Job timed out'}):
+                db.session.get(Dataset, dataset_id).processing_status = 'failed'
+
+    def _worker_config(self) -> Dict:
+        config = {key: self.app.config[key] for key in
+                  ('EPOCH_STORE_FOLDER', 'PARSED_CACHE_FOLDER', 'PARSED_CACHE_MAX_BYTES', 'RINEX_CACHE_FOLDER',
+                   'RINEX_CACHE_MAX_BYTES')}
+        config['PROFILE_JOBS'] = self.app.config.get('PROFILE_JOBS', False)
+        config['PROFILE_FOLDER'] = self.app.config.get('PROFILE_FOLDER')
+        config['METRIC_OPTIONS'] = dict(self.metric_options)
+        for key in ('RAW_ARCHIVE_ENABLED', 'MONGO_URI', 'RAW_ARCHIVE_DATABASE', 'RAW_ARCHIVE_BUCKET'):
+            config[key] = self.app.config.get(key)
+        return config
+
+    def _submit_processing(self, job_id, dataset_id, filename, format_type, content_hash, coords,
+                           nav_filename, config):
+        """Start run_processing on the pool, counting it against the local job slots"""
+        with self._lock:
+            self._active += 1
+        upload_folder = self.app.config['UPLOAD_FOLDER']
+        try:
+            return self._executor.submit(
+                run_processing, job_id, os.path.join(upload_folder, filename),
+                format_type, coords, dataset_id, content_hash, config,
+                os.path.join(upload_folder, nav_filename) if nav_filename else None
+            )
+        except Exception:
+            self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        self._wakeup.set()
+
+    def _submit(self, job_id, dataset_id, filename, format_type, content_hash, coords, nav_filename=None):
+        cache_key = result_cache_key(content_hash, coords, self.metric_options)
+        future = self._submit_processing(job_id, dataset_id, filename, format_type, content_hash, coords,
+                                         nav_filename, self._worker_config())
+        future.add_done_callback(lambda f: self._complete(job_id, dataset_id, format_type, cache_key, f))
+        logger.info(f"Started job {job_id} for dataset {dataset_id}")
+
+    @staticmethod
+    def _finish(job_id: int, values: Dict) -> bool:
+        """Move a running job to its final state; False if it is no longer running.
+        
+        The update is conditional on the job's status, so a job failed as
+        stale is not overwritten by a late completion, and the other way round.
+        """
+        from .models import ProcessingJob
+
+        values = {**values, 'finished_at': datetime.utcnow()}
+        updated = (ProcessingJob.query
+                   .filter(ProcessingJob.id == job_id, ProcessingJob.status == 'running')
+                   .update(values, synchronize_session=False))
+        return updated > 0
+
+    def _complete(self, job_id, dataset_id, format_type, cache_key, future):
+        from .instrumentation import record_job
+        from .models import AnalysisResult, Dataset, db
+
+        try:
+            with self.app.app_context():
+                try:
+                    metrics = future.result()
+                    if 'error' in metrics:
+                        raise ValueError(metrics['error'])
+                    start = time.perf_counter()
+                    result = AnalysisResult.from_metrics(
+                        dataset_id, metrics, processing_duration=metrics.get('processing_duration'))
+                    result.cache_key = cache_key
+                    db.session.add(result)
+                    db.session.flush()
+                    if result.timings:
+                        stages = {**result.timings['stages'], 'db_write': round(time.perf_counter() - start, 6)}
+                        result.timings = {**result.timings, 'stages': stages}
+                    status = 'done'
+                    values = {'status': status, 'result_id': result.id, 'progress': 1.0}
+                except Exception as e:
+                    db.session.rollback()
+                    status = 'failed'
+                    result = None
+                    values = {'status': status, 'error': str(e)}
+                    logger.error(f"Job {job_id} for dataset {dataset_id} failed: {str(e)}")
+
+                if not self._finish(job_id, values):
+                    db.session.rollback()
+                    logger.warning(f"Job {job_id} for dataset {dataset_id} was no longer running "
+                                   f"(failed as stale), outcome {status} discarded")
+                    return
+                db.session.get(Dataset, dataset_id).processing_status = status
+                db.session.commit()
+                if status == 'done':
+                    logger.info(f"Job {job_id} for dataset {dataset_id} finished")
+                record_job(format_type, status, result.timings if result is not None else None)
+        except Exception as e:
+            logger.error(f"Could not record outcome of job {job_id}: {str(e)}")
+            logger.error(traceback.format_exc())
+        finally:
+            self._release()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,705 @@
+"""Live ingestion of receiver streams over TCP.
+
+Each stream is a TCP connection to a receiver, a serial-over-TCP bridge or
+an NTRIP caster mountpoint, handled by an asyncio task on an event loop
+running in a background thread of the application process. Bytes are
+split into NMEA sentences and UBX frames (RTCM3 frames are skipped), GGA
+and UBX NAV-PVT fixes are decoded and folded into constant-memory
+accuracy statistics, and snapshots of those statistics are pushed to
+subscribers (the dashboard's Server-Sent Events connections).
+
+Memory stays bounded at every stage:
+
+* received chunks wait in a per-stream queue of LIVE_BUFFER_CHUNKS; when
+  parsing falls behind the reader stops reading, so TCP flow control slows
+  the sender down instead of data piling up in the server
+* statistics are running moments, a quantile sketch and a fixed-size
+  window of recent epochs
+* every subscriber has a queue of LIVE_SUBSCRIBER_QUEUE snapshots; a
+  subscriber that does not keep up loses its oldest snapshots, never the
+  stream
+
+Every Server-Sent Events connection holds a request thread for as long as
+it is open, so open connections are counted per process and per user and
+refused beyond LIVE_MAX_SUBSCRIBERS and LIVE_MAX_SUBSCRIBERS_PER_USER,
+keeping threads free for the rest of the application.
+
+Streams live in the process that started them, so the application should
+run as a single (threaded) process when live streams are used.
+
+Stream targets are resolved when the stream is added and the connection
+goes to the address that was checked. Targets resolving to private,
+loopback, link-local or other non-public addresses are refused unless
+listed in LIVE_STREAM_ALLOWED_HOSTS (host names, addresses or networks);
+when that list is set, only the targets it covers are accepted.
+
+A file can be replayed as a live source for testing:
+
+    python -m app.live replay data/log.nmea --port 2101 --rate 10
+
+(with LIVE_STREAM_ALLOWED_HOSTS=127.0.0.1 to let the application connect).
+"""
+import argparse
+import asyncio
+import base64
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .processors.epochs import EpochBatch
+from .processors.fix_quality import fix_classes, FIX_CLASS_NAMES
+from .processors.nmea_stream import NmeaEpochParser
+from .processors.projection import get_transformer, utm_crs, WGS84
+from .processors.stats import RunningStats, QuantileSketch
+from .processors.ubx_processor import UBXProcessor
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 10.0
+MAX_RECONNECT_DELAY = 60.0
+# Sentences are at most 82 characters; anything longer without a newline is noise
+MAX_NMEA_LINE = 512
+
+_FRAME_START = re.compile(rb'[$\xb5\xd3]')
+
+
+class StreamTargetError(Exception):
+    """Stream target that cannot or may not be connected to; status is the HTTP status to report"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_allowed_hosts(entries: Iterable[str]) -> Tuple[frozenset, Tuple]:
+    """Split LIVE_STREAM_ALLOWED_HOSTS entries into host names and IP networks"""
+    names, networks = set(), []
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            names.add(entry.lower().rstrip('.'))
+    return frozenset(names), tuple(networks)
+
+
+def _ip_address(address: str):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    # Judge IPv4-mapped IPv6 addresses by the IPv4 address they reach
+    return ip.ipv4_mapped or ip if ip.version == 6 else ip
+
+
+def _ubx_checksum(frame: bytes) -> bool:
+    ck_a = ck_b = 0
+    for byte in frame[2:-2]:
+        ck_a = (ck_a + byte) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return frame[-2] == ck_a and frame[-1] == ck_b
+
+
+class FrameSplitter:
+    """Splits a mixed NMEA/UBX/RTCM3 byte stream into complete messages.
+
+    Frames may be split across chunks in any way; incomplete data is kept
+    for the next chunk. Bytes that do not belong to a recognised frame are
+    skipped up to the next possible frame start.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.skipped_bytes = 0
+        self.rtcm_frames = 0
+
+    def feed(self, data: bytes) -> Tuple[List[str], List[bytes]]:
+        """Add received bytes.
+
+        Returns:
+            Tuple of (NMEA sentences, UBX frames) completed by this chunk
+        """
+        buf = self._buffer
+        buf += data
+        sentences = []
+        ubx_frames = []
+        n = len(buf)
+        i = 0
+        while i < n:
+            start = buf[i]
+            if start == 0x24:  # '$'
+                end = buf.find(b'\n', i, i + MAX_NMEA_LINE)
+                if end >= 0:
+                    sentences.append(bytes(buf[i:end]).decode('ascii', errors='replace').rstrip('\r'))
+                    i = end + 1
+                    continue
+                if n - i < MAX_NMEA_LINE:
+                    break
+            elif start == 0xB5:
+                if n - i < 6:
+                    break
+                if buf[i + 1] == 0x62:
+                    total = 8 + (buf[i + 4] | buf[i + 5] << 8)
+                    if n - i < total:
+                        break
+                    frame = bytes(buf[i:i + total])
+                    if _ubx_checksum(frame):
+                        ubx_frames.append(frame)
+                        i += total
+                        continue
+            elif start == 0xD3:
+                if n - i < 3:
+                    break
+                # Six reserved bits after the preamble are zero in RTCM3
+                if buf[i + 1] & 0xFC == 0:
+                    total = 6 + ((buf[i + 1] & 0x03) << 8 | buf[i + 2])
+                    if n - i < total:
+                        break
+                    self.rtcm_frames += 1
+                    i += total
+                    continue
+
+            match = _FRAME_START.search(buf, i + 1)
+            next_start = match.start() if match else n
+            self.skipped_bytes += next_start - i
+            i = next_start
+        del buf[:i]
+        return sentences, ubx_frames
+
+
+def decode_ubx_fixes(frames: List[bytes]) -> Optional[EpochBatch]:
+    """Decode NAV-PVT (and NAV-HPPOSLLH) frames into an epoch batch; other messages are ignored"""
+    columns, _ = UBXProcessor().read_columns(np.frombuffer(b''.join(frames), dtype=np.uint8))
+    return EpochBatch.from_columns(columns) if len(columns['timestamp']) else None
+
+
+class StreamStats:
+    """Accuracy statistics of a live stream with constant memory.
+
+    Positions are projected to the UTM zone of the reference (or of the
+    first fix when floating). Against a fixed reference the errors are the
+    offsets themselves; with a floating reference horizontal RMSE and
+    vertical std are taken about the running mean, which the running
+    moments give exactly. Percentiles come from a quantile sketch; with a
+    floating reference they measure the distance to the mean as known when
+    each epoch arrived.
+    """
+
+    def __init__(self, reference: Optional[Tuple[float, float, float]] = None,
+                 window_epochs: int = 600, relative_accuracy: float = 0.005):
+        self.reference = reference
+        self.east = RunningStats()
+        self.north = RunningStats()
+        self.up = RunningStats()
+        self.horizontal = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.fix_counts = np.zeros(len(FIX_CLASS_NAMES), dtype=np.int64)
+        self.epochs = 0
+        self.last_fix = None
+        self._origin = None
+        self._transformer = None
+        # Ring buffer of the most recent east/north/up offsets
+        self._window = np.full((window_epochs, 3), np.nan)
+        self._window_next = 0
+
+    def update(self, columns: Union[EpochBatch, Dict[str, np.ndarray]]) -> None:
+        latitude = columns['latitude']
+        longitude = columns['longitude']
+        altitude = columns['altitude']
+        if len(latitude) == 0:
+            return
+        if self._transformer is None:
+            origin = self.reference or (latitude[0], longitude[0], altitude[0])
+            self._transformer = get_transformer(WGS84, utm_crs(origin[0], origin[1]))
+            east, north = self._transformer.transform(origin[1], origin[0])
+            self._origin = (east, north, origin[2])
+
+        east, north = self._transformer.transform(longitude, latitude)
+        offsets = np.column_stack((np.asarray(east) - self._origin[0],
+                                   np.asarray(north) - self._origin[1],
+                                   np.asarray(altitude) - self._origin[2]))
+        self.east.update(offsets[:, 0])
+        self.north.update(offsets[:, 1])
+        self.up.update(offsets[:, 2])
+        if self.reference:
+            horizontal = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            horizontal = np.hypot(offsets[:, 0] - self.east.mean, offsets[:, 1] - self.north.mean)
+        self.horizontal.update(horizontal)
+        self.sketch.update(horizontal)
+
+        size = len(self._window)
+        recent = offsets[-size:]
+        slots = (self._window_next + np.arange(len(recent))) % size
+        self._window[slots] = recent
+        self._window_next = (self._window_next + len(recent)) % size
+
+        classes = fix_classes(columns)
+        self.fix_counts += np.bincount(classes, minlength=len(self.fix_counts))[:len(self.fix_counts)]
+        self.epochs += len(latitude)
+        self.last_fix = {
+            'timestamp': str(columns['timestamp'][-1]) if 'timestamp' in columns else None,
+            'latitude': float(latitude[-1]),
+            'longitude': float(longitude[-1]),
+            'altitude': float(altitude[-1]),
+            'fix_class': FIX_CLASS_NAMES.get(int(classes[-1]))
+        }
+
+    def _window_rmse(self) -> Tuple[float, float, int]:
+        recent = self._window[~np.isnan(self._window[:, 0])]
+        if len(recent) == 0:
+            return float('nan'), float('nan'), 0
+        if not self.reference:
+            recent = recent - recent.mean(axis=0)
+        horizontal = float(np.sqrt(np.mean(recent[:, 0] ** 2 + recent[:, 1] ** 2)))
+        vertical = float(np.sqrt(np.mean(recent[:, 2] ** 2)))
+        return horizontal, vertical, len(recent)
+
+    def snapshot(self) -> Dict:
+        if self.reference:
+            horizontal_rmse = np.sqrt((self.east.sum_sq + self.north.sum_sq) / self.epochs) if self.epochs else np.nan
+            vertical_rmse = self.up.rmse
+        else:
+            horizontal_rmse = np.hypot(self.east.std, self.north.std)
+            vertical_rmse = self.up.std
+        window_horizontal, window_vertical, window_epochs = self._window_rmse()
+        return {
+            'epochs': self.epochs,
+            'reference_mode': 'fixed' if self.reference else 'floating',
+            'horizontal': {
+                'rmse': float(horizontal_rmse),
+                'mean': self.horizontal.mean if self.horizontal.count else float('nan'),
+                'max': self.horizontal.max if self.horizontal.count else float('nan'),
+                'cep50': self.sketch.quantile(0.5),
+                'cep95': self.sketch.quantile(0.95)
+            },
+            'vertical': {
+                'rmse': float(vertical_rmse),
+                'std': self.up.std
+            },
+            'rolling': {
+                'epochs': window_epochs,
+                'horizontal_rmse': window_horizontal,
+                'vertical_rmse': window_vertical
+            },
+            'fix_counts': {FIX_CLASS_NAMES[i]: int(count) for i, count in enumerate(self.fix_counts)},
+            'last_fix': self.last_fix
+        }
+
+
+class LiveStream:
+    """One live source: its connection settings, parser state and statistics"""
+
+    def __init__(self, stream_id: int, user_id: int, name: str, host: str, port: int,
+                 mountpoint: Optional[str] = None, username: Optional[str] = None,
+                 password: Optional[str] = None, reference: Optional[Tuple[float, float, float]] = None,
+                 window_epochs: int = 600, address: Optional[str] = None):
+        self.id = stream_id
+        self.user_id = user_id
+        self.name = name
+        self.host = host
+        self.port = port
+        # Resolved (and checked) address connected to; the host itself if unset
+        self.address = address or host
+        self.mountpoint = mountpoint
+        self.username = username
+        self.password = password
+        self.status = 'connecting'
+        self.error = None
+        self.started_at = time.time()
+        self.bytes_received = 0
+        self.dropped_updates = 0
+        self.stats = StreamStats(reference, window_epochs)
+        self._splitter = FrameSplitter()
+        self._nmea = NmeaEpochParser()
+        self._subscribers: List[queue.Queue] = []
+        self._subscribers_lock = threading.Lock()
+        # Held while parsing so snapshots never see half-updated statistics
+        self._lock = threading.Lock()
+        self._task = None
+
+    def process(self, data: bytes) -> None:
+        """Parse a received chunk and update the statistics (runs in an executor thread)"""
+        with self._lock:
+            self.bytes_received += len(data)
+            sentences, ubx_frames = self._splitter.feed(data)
+            try:
+                if sentences:
+                    # close() only flushes buffered fixes; the date state carries over
+                    for batch in itertools.chain(self._nmea.feed(sentences), self._nmea.close()):
+                        self.stats.update(batch)
+                if ubx_frames:
+                    columns = decode_ubx_fixes(ubx_frames)
+                    if columns is not None:
+                        self.stats.update(columns)
+            except Exception as e:
+                logger.error(f"Live stream {self.id} parse error: {str(e)}")
+                self.error = str(e)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'host': self.host,
+            'port': self.port,
+            'mountpoint': self.mountpoint,
+            'status': self.status,
+            'error': self.error,
+            'started_at': self.started_at,
+            'bytes_received': self.bytes_received,
+            'skipped_bytes': self._splitter.skipped_bytes,
+            'rtcm_frames': self._splitter.rtcm_frames,
+            'invalid_sentences': self._nmea.skipped,
+            'dropped_updates': self.dropped_updates,
+            'stats': self.stats.snapshot()
+        }
+
+    def subscribe(self, max_updates: int) -> queue.Queue:
+        updates = queue.Queue(maxsize=max_updates)
+        with self._subscribers_lock:
+            self._subscribers.append(updates)
+        return updates
+
+    def unsubscribe(self, updates: queue.Queue) -> None:
+        with self._subscribers_lock:
+            if updates in self._subscribers:
+                self._subscribers.remove(updates)
+
+    def publish(self, message: Optional[str]) -> None:
+        """Send a message to every subscriber, dropping their oldest if they are behind.
+
+        None tells subscribers that the stream has ended.
+        """
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for updates in subscribers:
+            while True:
+                try:
+                    updates.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        updates.get_nowait()
+                        self.dropped_updates += 1
+                    except queue.Empty:
+                        pass
+
+
+class LiveIngestService:
+    """Runs live streams on an asyncio event loop in a background thread"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_streams = 8
+        self.buffer_chunks = 64
+        self.subscriber_queue = 16
+        self.update_interval = 1.0
+        self.window_epochs = 600
+        self.max_subscribers = 8
+        self.max_subscribers_per_user = 3
+        self.allowed_names = frozenset()
+        self.allowed_networks = ()
+        self._streams: Dict[int, LiveStream] = {}
+        self._subscribers: Counter = Counter()
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._thread = None
+        self._owner = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_streams = app.config.setdefault('LIVE_MAX_STREAMS', 8)
+        self.buffer_chunks = app.config.setdefault('LIVE_BUFFER_CHUNKS', 64)
+        self.subscriber_queue = app.config.setdefault('LIVE_SUBSCRIBER_QUEUE', 16)
+        self.update_interval = app.config.setdefault('LIVE_UPDATE_INTERVAL', 1.0)
+        self.window_epochs = app.config.setdefault('LIVE_WINDOW_EPOCHS', 600)
+        self.max_subscribers = app.config.setdefault('LIVE_MAX_SUBSCRIBERS', 8)
+        self.max_subscribers_per_user = app.config.setdefault('LIVE_MAX_SUBSCRIBERS_PER_USER', 3)
+        self.allowed_names, self.allowed_networks = parse_allowed_hosts(
+            app.config.setdefault('LIVE_STREAM_ALLOWED_HOSTS', []))
+        app.extensions['live_ingest'] = self
+
+    def start(self):
+        """Start the event loop thread (once per process)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._owner == os.getpid():
+                return
+            self._owner = os.getpid()
+            self._streams = {}
+            self._subscribers = Counter()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='live-ingest', daemon=True)
+            self._thread.start()
+            logger.info("Live ingest loop started")
+
+    def streams(self, user_id: int) -> List[LiveStream]:
+        return [stream for stream in self._streams.values() if stream.user_id == user_id]
+
+    def get(self, stream_id: int) -> Optional[LiveStream]:
+        return self._streams.get(stream_id)
+
+    def add_subscriber(self, user_id: int) -> None:
+        """Count an open update connection of a user.
+
+        Raises:
+            ValueError: If the process or the user has reached the subscriber limit
+        """
+        with self._lock:
+            if sum(self._subscribers.values()) >= self.max_subscribers:
+                raise ValueError(f'At most {self.max_subscribers} live update connections can be open at once')
+            if self._subscribers[user_id] >= self.max_subscribers_per_user:
+                raise ValueError(f'At most {self.max_subscribers_per_user} live update connections '
+                                 f'can be open per user')
+            self._subscribers[user_id] += 1
+
+    def remove_subscriber(self, user_id: int) -> None:
+        with self._lock:
+            self._subscribers[user_id] -= 1
+            if self._subscribers[user_id] <= 0:
+                del self._subscribers[user_id]
+
+    def resolve_target(self, host: str, port: int) -> str:
+        """Resolve a stream target and check that it may be connected to.
+
+        Every address the host resolves to must be allowed, so a name that
+        also points into the local network is refused as a whole.
+
+        Returns:
+            The address to connect to
+
+        Raises:
+            StreamTargetError: If the host does not resolve (400) or is not allowed (403)
+        """
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError) as e:
+            raise StreamTargetError(f'Cannot resolve {host}: {str(e)}', 400)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise StreamTargetError(f'Cannot resolve {host}', 400)
+
+        listed = host.lower().rstrip('.') in self.allowed_names
+        for address in addresses:
+            ip = _ip_address(address)
+            in_network = any(ip in network for network in self.allowed_networks)
+            if self.allowed_names or self.allowed_networks:
+                allowed = listed or in_network
+            else:
+                allowed = ip.is_global and not ip.is_multicast
+            if not allowed:
+                logger.warning(f"Refused live stream target {host}:{port} ({address})")
+                raise StreamTargetError(f'Connections to {host} are not allowed', 403)
+        return addresses[0]
+
+    def add_stream(self, user_id: int, name: str, host: str, port: int, **options) -> LiveStream:
+        """Start ingesting a new stream.
+
+        Args:
+            options: mountpoint, username, password and reference (lat, lon, altitude)
+
+        Raises:
+            StreamTargetError: If the target does not resolve or is not allowed
+            ValueError: If the stream limit is reached
+        """
+        address = self.resolve_target(host, port)
+        self.start()
+        with self._lock:
+            if len(self._streams) >= self.max_streams:
+                raise ValueError(f'At most {self.max_streams} live streams can run at once')
+            stream = LiveStream(next(self._ids), user_id, name, host, port,
+                                window_epochs=self.window_epochs, address=address, **options)
+            self._streams[stream.id] = stream
+        asyncio.run_coroutine_threadsafe(self._start(stream), self._loop).result(timeout=5)
+        logger.info(f"Live stream {stream.id} started for {host}:{port}")
+        return stream
+
+    def remove_stream(self, stream_id: int) -> None:
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._stop(stream), self._loop).result(timeout=5)
+        stream.publish(None)
+        logger.info(f"Live stream {stream_id} stopped")
+
+    async def _start(self, stream: LiveStream) -> None:
+        stream._task = asyncio.get_running_loop().create_task(self._run(stream))
+
+    async def _stop(self, stream: LiveStream) -> None:
+        if stream._task is not None:
+            stream._task.cancel()
+
+    async def _connect(self, stream: LiveStream):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(stream.address, stream.port, limit=READ_SIZE), CONNECT_TIMEOUT)
+        if stream.mountpoint is None:
+            return reader, writer
+
+        request = [f'GET /{stream.mountpoint} HTTP/1.0', 'User-Agent: NTRIP gnss-analysis',
+                   'Ntrip-Version: Ntrip/1.0']
+        if stream.username:
+            credentials = base64.b64encode(f'{stream.username}:{stream.password or ""}'.encode()).decode()
+            request.append(f'Authorization: Basic {credentials}')
+        writer.write(('\r\n'.join(request) + '\r\n\r\n').encode())
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), CONNECT_TIMEOUT)
+        if not (status.startswith(b'ICY 200') or status.startswith(b'HTTP/1.') and b' 200 ' in status):
+            writer.close()
+            raise ConnectionError(f'Caster refused mountpoint: {status.decode(errors="replace").strip()}')
+        if status.startswith(b'HTTP/'):
+            # Skip the response headers
+            while (await reader.readline()).strip():
+                pass
+        return reader, writer
+
+    async def _run(self, stream: LiveStream) -> None:
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    reader, writer = await self._connect(stream)
+                except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+                    stream.status = 'reconnecting'
+                    stream.error = str(e) or type(e).__name__
+                    logger.warning(f"Live stream {stream.id} connection failed: {stream.error}")
+                else:
+                    stream.status = 'connected'
+                    stream.error = None
+                    delay = 1.0
+                    try:
+                        await self._ingest(stream, reader)
+                    finally:
+                        writer.close()
+                    stream.status = 'reconnecting'
+                    stream.error = 'Connection closed by source'
+                self._publish(stream)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        except asyncio.CancelledError:
+            stream.status = 'stopped'
+
+    async def _ingest(self, stream: LiveStream, reader: asyncio.StreamReader) -> None:
+        chunks = asyncio.Queue(maxsize=self.buffer_chunks)
+        parser = asyncio.get_running_loop().create_task(self._parse(stream, chunks))
+        try:
+            while True:
+                try:
+                    data = await reader.read(READ_SIZE)
+                except OSError:
+                    break
+                if not data or parser.done():
+                    break
+                # Waits while the buffer is full, so TCP flow control throttles the source
+                await chunks.put(data)
+            await chunks.put(None)
+            await parser
+        finally:
+            parser.cancel()
+
+    async def _parse(self, stream: LiveStream, chunks: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        last_update = 0.0
+        while True:
+            data = await chunks.get()
+            if data is None:
+                break
+            try:
+                # Parsing runs off the loop thread so other streams keep being read
+                await loop.run_in_executor(None, stream.process, data)
+            except RuntimeError:
+                # The executor is shut down when the interpreter exits
+                break
+            if time.monotonic() - last_update >= self.update_interval:
+                self._publish(stream)
+                last_update = time.monotonic()
+        self._publish(stream)
+
+    def _publish(self, stream: LiveStream) -> None:
+        from .models import json_safe
+
+        stream.publish(json.dumps(json_safe(stream.to_dict())))
+
+
+live_ingest = LiveIngestService()
+
+
+async def replay_server(path: str, host: str = '127.0.0.1', port: int = 2101, rate: float = 1.0) -> None:
+    """Serve a recorded file as a live stream to every client that connects.
+
+    NMEA files are paced by GGA sentence (rate epochs per second); binary
+    files are sent in 1 KiB chunks at rate chunks per second.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    is_nmea = data[:1] == b'$'
+
+    def pieces() -> Iterator[bytes]:
+        if not is_nmea:
+            for offset in range(0, len(data), 1024):
+                yield data[offset:offset + 1024]
+            return
+        epoch = []
+        for line in data.splitlines(keepends=True):
+            epoch.append(line)
+            if line[3:6] == b'GGA':
+                yield b''.join(epoch)
+                epoch = []
+        if epoch:
+            yield b''.join(epoch)
+
+    async def handle(reader, writer):
+        peer = writer.get_extra_info('peername')
+        logger.info(f"Replaying {path} to {peer}")
+        try:
+            for piece in pieces():
+                writer.write(piece)
+                await writer.drain()
+                await asyncio.sleep(1.0 / rate)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Replay server listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live stream utilities')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay = subparsers.add_parser('replay', help='Serve a recorded NMEA/UBX file over TCP')
+    replay.add_argument('path')
+    replay.add_argument('--host', default='127.0.0.1')
+    replay.add_argument('--port', type=int, default=2101)
+    replay.add_argument('--rate', type=float, default=1.0, help='Epochs (or 1 KiB chunks) per second')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(replay_server(args.path, args.host, args.port, args.rate))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,29 @@
 from . import db
 from flask_login import UserMixin
-from datetime import datetime
+from datetime import datetime, date
+import hashlib
 from geoalchemy2 import Geometry
+import math
+import numpy as np
+
+def json_safe(value):
+    """Convert processor output (NumPy scalars, timestamps, NaN) into JSON-safe values"""
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return json_safe(value.tolist())
+    if isinstance(value, np.datetime64):
+        # item() on nanosecond datetime64 returns an int, so go through microseconds
+        value = value.astype('datetime64[us]').item()
+    elif isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -12,12 +34,38 @@ class User(UserMixin, db.Model):
 class Dataset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    format_type = db.Column(db.String(20), nullable=False)  # NMEA, RINEX, XYZ
+    format_type = db.Column(db.String(20), nullable=False)  # NMEA, RINEX, XYZ, UBX
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     processing_status = db.Column(db.String(20), default='pending')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     base_station_id = db.Column(db.Integer, db.ForeignKey('base_station.id'))
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the uploaded file
+    file_size = db.Column(db.BigInteger)
+    nav_hash = db.Column(db.String(64))  # SHA-256 of the RINEX navigation file, if any
+    campaign = db.Column(db.String(100), index=True)  # Optional tag grouping datasets for batch comparison
     analysis_results = db.relationship('AnalysisResult', backref='dataset', lazy=True)
+    jobs = db.relationship('ProcessingJob', backref='dataset', lazy=True)
+    # Keyset pagination of the results listing: a user's datasets by (upload_date, id)
+    __table_args__ = (db.Index('ix_dataset_user_upload_date_id', 'user_id', 'upload_date', 'id'),)
+
+    @property
+    def stored_filename(self):
+        """Name of the uploaded file in the upload folder (content addressed when hashed)"""
+        if self.content_hash:
+            return f'{self.content_hash}.{self.format_type}'
+        return self.name
+
+    @property
+    def nav_filename(self):
+        """Name of the uploaded navigation file in the upload folder"""
+        return f'{self.nav_hash}.nav' if self.nav_hash else None
+
+    @property
+    def processing_hash(self):
+        """Hash of all inputs to processing (observation and navigation content)"""
+        if not self.content_hash or not self.nav_hash:
+            return self.content_hash
+        return hashlib.sha256(f'{self.content_hash}:{self.nav_hash}'.encode()).hexdigest()
 
 class BaseStation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -39,6 +87,9 @@ class AnalysisResult(db.Model):
     horizontal_mean = db.Column(db.Float)
     horizontal_max = db.Column(db.Float)
     horizontal_min = db.Column(db.Float)
+    horizontal_cep50 = db.Column(db.Float)
+    horizontal_cep95 = db.Column(db.Float)
+    horizontal_2drms = db.Column(db.Float)
     
     # Vertical accuracy metrics
     vertical_rmse = db.Column(db.Float)
@@ -46,6 +97,10 @@ class AnalysisResult(db.Model):
     vertical_mean = db.Column(db.Float)
     vertical_max = db.Column(db.Float)
     vertical_min = db.Column(db.Float)
+    vertical_le95 = db.Column(db.Float)
+    
+    # 95th percentile of the 3D error
+    r95 = db.Column(db.Float)
     
     # Reference position
     reference_latitude = db.Column(db.Float)
@@ -57,9 +112,67 @@ class AnalysisResult(db.Model):
     processing_duration = db.Column(db.Float)  # in seconds
     
     # XYZ-specific quality metrics
-    solution_quality = db.Column(db.JSON)  # Stores std_dev_x, std_dev_y, std_dev_z
+    solution_quality = db.Column(db.JSON)  # Stores std_dev_x, std_dev_y, std_dev_z (UBX: h_acc, v_acc)
     xyz_stats = db.Column(db.JSON)  # Stores additional XYZ statistics
     
+    # Metrics per fix class, fix availability and fix-loss events
+    fix_stats = db.Column(db.JSON)
+    
+    # Robust reference estimator, per-axis scale and rejected outliers
+    reference_estimation = db.Column(db.JSON)
+    
+    # Seconds per processing stage, epochs per second and peak worker RSS
+    timings = db.Column(db.JSON)
+    
+    # Hash of (content hash, reference, processor version) for reusing results
+    cache_key = db.Column(db.String(64), index=True)
+    
+    # Latest result per dataset for the results listing
+    __table_args__ = (db.Index('ix_analysis_result_dataset_id_id', 'dataset_id', 'id'),)
+    
+    @classmethod
+    def from_metrics(cls, dataset_id, metrics, processing_duration=None):
+        """Create an analysis result from GNSSProcessor metrics"""
+        horizontal = metrics['horizontal']
+        vertical = metrics['vertical']
+        reference = metrics['reference_position']
+        return cls(
+            dataset_id=dataset_id,
+            reference_mode=metrics['reference_mode'],
+            horizontal_rmse=json_safe(horizontal['rmse']),
+            horizontal_std=json_safe(horizontal['std']),
+            horizontal_mean=json_safe(horizontal['mean']),
+            horizontal_max=json_safe(horizontal['max']),
+            horizontal_min=json_safe(horizontal['min']),
+            horizontal_cep50=json_safe(horizontal.get('cep50')),
+            horizontal_cep95=json_safe(horizontal.get('cep95')),
+            horizontal_2drms=json_safe(horizontal.get('2drms')),
+            vertical_rmse=json_safe(vertical['rmse']),
+            vertical_std=json_safe(vertical['std']),
+            vertical_mean=json_safe(vertical['mean']),
+            vertical_max=json_safe(vertical['max']),
+            vertical_min=json_safe(vertical['min']),
+            vertical_le95=json_safe(vertical.get('le95')),
+            r95=json_safe(metrics.get('r95')),
+            reference_latitude=json_safe(reference['latitude']),
+            reference_longitude=json_safe(reference['longitude']),
+            reference_altitude=json_safe(reference['altitude']),
+            num_points=int(metrics['num_points']),
+            processing_duration=processing_duration,
+            solution_quality=json_safe(metrics.get('solution_quality')),
+            xyz_stats=json_safe(metrics.get('xyz_stats')),
+            fix_stats=json_safe(metrics.get('fix_stats')),
+            reference_estimation=json_safe(metrics.get('reference_estimation')),
+            timings=json_safe(metrics.get('timings'))
+        )
+
+    def copy_for(self, dataset_id):
+        """Copy this result for another dataset with identical content and reference"""
+        excluded = {'id', 'dataset_id', 'analysis_date'}
+        values = {column.key: getattr(self, column.key)
+                  for column in self.__table__.columns if column.key not in excluded}
+        return AnalysisResult(dataset_id=dataset_id, **values)
+
     def to_dict(self):
         """Convert analysis results to dictionary format"""
         result = {
@@ -72,15 +185,20 @@ class AnalysisResult(db.Model):
                 'std': self.horizontal_std,
                 'mean': self.horizontal_mean,
                 'max': self.horizontal_max,
-                'min': self.horizontal_min
+                'min': self.horizontal_min,
+                'cep50': self.horizontal_cep50,
+                'cep95': self.horizontal_cep95,
+                '2drms': self.horizontal_2drms
             },
             'vertical': {
                 'rmse': self.vertical_rmse,
                 'std': self.vertical_std,
                 'mean': self.vertical_mean,
                 'max': self.vertical_max,
-                'min': self.vertical_min
+                'min': self.vertical_min,
+                'le95': self.vertical_le95
             },
+            'r95': self.r95,
             'reference_position': {
                 'latitude': self.reference_latitude,
                 'longitude': self.reference_longitude,
@@ -95,5 +213,44 @@ class AnalysisResult(db.Model):
             result['solution_quality'] = self.solution_quality
         if self.xyz_stats:
             result['xyz_stats'] = self.xyz_stats
+        if self.fix_stats:
+            result['fix_stats'] = self.fix_stats
+        if self.reference_estimation:
+            result['reference_estimation'] = self.reference_estimation
+        if self.timings:
+            result['timings'] = self.timings
             
         return result
+
+class ProcessingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    progress = db.Column(db.Float, nullable=False, default=0.0)  # 0.0 - 1.0
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    result_id = db.Column(db.Integer, db.ForeignKey('analysis_result.id'))
+    # Station analysed against instead of the dataset's own (batch comparisons)
+    base_station_id = db.Column(db.Integer)
+
+    @property
+    def reference_station_id(self):
+        """Station the job's metrics are computed against (None: floating reference)"""
+        return self.base_station_id if self.base_station_id is not None else self.dataset.base_station_id
+
+    def to_dict(self):
+        """Convert job state to dictionary format"""
+        return {
+            'id': self.id,
+            'dataset_id': self.dataset_id,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'result_id': self.result_id,
+            'base_station_id': self.reference_station_id
+        }
@@ -0,0 +1,60 @@
+"""MongoDB client created on first use.
+
+Constructing a pymongo client imports pymongo, starts its monitor threads
+and resolves the servers, and a client must not be carried across fork().
+The client is therefore created lazily, once per process: application
+startup (and the gunicorn master, with preload_app) never connects, and
+each worker opens its own connection pool on the first archive access.
+"""
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+
+class Mongo:
+    """Per-process pooled MongoClient for the configured MONGO_URI"""
+
+    def __init__(self, app=None):
+        self.uri = None
+        self.options = {}
+        self._client: Optional['MongoClient'] = None
+        self._owner = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.uri = app.config['MONGO_URI']
+        self.options = {
+            'maxPoolSize': app.config.get('MONGO_MAX_POOL_SIZE', 10),
+            'serverSelectionTimeoutMS': app.config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)
+        }
+        app.extensions['mongo'] = self
+
+    @property
+    def client(self) -> 'MongoClient':
+        """The client of this process, created on first access"""
+        with self._lock:
+            if self._client is None or self._owner != os.getpid():
+                from pymongo import MongoClient
+
+                # connect=False defers the first connection to the first operation
+                self._client = MongoClient(self.uri, connect=False, **self.options)
+                self._owner = os.getpid()
+                logger.info(f"MongoDB client created in process {self._owner}")
+            return self._client
+
+    def reset(self) -> None:
+        """Forget a client inherited from the parent process (call after fork)"""
+        with self._lock:
+            self._client = None
+            self._owner = None
+
+
+mongo = Mongo()
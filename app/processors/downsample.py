@@ -0,0 +1,123 @@
+"""Trajectory simplification for map display.
+
+Douglas-Peucker is run once per dataset with a near-zero tolerance and the
+tolerance at which each point would be dropped is recorded as its
+significance. A point is kept by Douglas-Peucker at tolerance eps exactly
+when its significance exceeds eps, so every simplification level can be
+read back with a single comparison. Significances are mapped to the first
+web-map zoom level at which a point matters (one pixel tolerance) and
+stored with the dataset's epochs.
+
+The recursion is evaluated breadth-first: all open segments of one depth
+are processed together with flat NumPy arrays, so the number of Python
+iterations is the depth of the split tree rather than the number of points.
+"""
+import math
+import numpy as np
+from .projection import get_transformer, utm_crs, WGS84
+
+# Web Mercator ground resolution at zoom 0 on the equator (m/pixel)
+EQUATOR_METRES_PER_PIXEL = 156543.03392
+MAX_ZOOM = 22
+TOLERANCE_PIXELS = 1.0
+# Below this, differences are noise even for RTK (m)
+MIN_TOLERANCE = 0.001
+
+# Epoch column holding each point's first visible zoom level
+TRACK_LEVEL_COLUMN = 'track_level'
+
+
+def douglas_peucker_significance(x: np.ndarray, y: np.ndarray, min_tolerance: float = 0.0) -> np.ndarray:
+    """Douglas-Peucker drop tolerance of every point of a polyline.
+
+    Args:
+        x, y: Planar coordinates (e.g. UTM metres)
+        min_tolerance: Segments whose farthest point is within this distance
+            are not split further (their inner points get significance 0)
+
+    Returns:
+        float64 array; end points are inf
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    significance = np.zeros(n)
+    if n == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+
+    starts = np.array([0], dtype=np.int64)
+    ends = np.array([n - 1], dtype=np.int64)
+    parents = np.array([np.inf])
+    while len(starts):
+        open_segments = ends - starts > 1
+        starts, ends, parents = starts[open_segments], ends[open_segments], parents[open_segments]
+        if not len(starts):
+            break
+
+        # Flatten the inner points of all open segments
+        counts = ends - starts - 1
+        segment = np.repeat(np.arange(len(starts)), counts)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        points = starts[segment] + 1 + (np.arange(counts.sum()) - offsets[segment])
+
+        ax, ay = x[starts][segment], y[starts][segment]
+        dx, dy = x[ends][segment] - ax, y[ends][segment] - ay
+        length = np.hypot(dx, dy)
+        px, py = x[points] - ax, y[points] - ay
+        with np.errstate(invalid='ignore', divide='ignore'):
+            distance = np.where(length > 0, np.abs(dx * py - dy * px) / length, np.hypot(px, py))
+
+        farthest = np.maximum.reduceat(distance, offsets)
+        is_max = distance == farthest[segment]
+        first = np.unique(segment[is_max], return_index=True)[1]
+        split = points[np.flatnonzero(is_max)[first]]
+
+        keep = farthest > min_tolerance
+        split, starts, ends = split[keep], starts[keep], ends[keep]
+        values = np.minimum(farthest[keep], parents[keep])
+        significance[split] = values
+
+        starts, ends = np.concatenate((starts, split)), np.concatenate((split, ends))
+        parents = np.concatenate((values, values))
+    return significance
+
+
+def zoom_levels(significance: np.ndarray, latitude: float) -> np.ndarray:
+    """First zoom level at which each point exceeds one pixel of tolerance"""
+    metres_per_pixel = EQUATOR_METRES_PER_PIXEL * math.cos(math.radians(latitude)) * TOLERANCE_PIXELS
+    with np.errstate(divide='ignore'):
+        levels = np.floor(np.log2(metres_per_pixel / significance)) + 1
+    levels = np.where(np.isnan(levels), MAX_ZOOM, levels)
+    return np.clip(levels, 0, MAX_ZOOM).astype(np.int8)
+
+
+def track_levels(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """Zoom level of every epoch of a track, simplified in the UTM zone of its first point"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    if len(latitude) == 0:
+        return np.zeros(0, dtype=np.int8)
+    transformer = get_transformer(WGS84, utm_crs(latitude[0], longitude[0]))
+    east, north = transformer.transform(longitude, latitude)
+    significance = douglas_peucker_significance(east, north, MIN_TOLERANCE)
+    return zoom_levels(significance, float(np.median(latitude)))
+
+
+def encode_polyline(latitude: np.ndarray, longitude: np.ndarray, precision: int = 5) -> str:
+    """Encode coordinates in the Google encoded polyline format, vectorised"""
+    factor = 10 ** precision
+    coords = np.column_stack((np.round(np.asarray(latitude) * factor),
+                              np.round(np.asarray(longitude) * factor))).astype(np.int64)
+    if len(coords) == 0:
+        return ''
+    deltas = np.diff(coords, axis=0, prepend=0).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Split every value into 5-bit chunks, least significant first
+    chunks = (values[:, None] >> (5 * np.arange(13))) & 0x1F
+    nonzero = (values[:, None] >> (5 * np.arange(13))) > 0
+    used = np.maximum(nonzero.sum(axis=1), 1)
+    continuation = np.arange(13) < (used - 1)[:, None]
+    chars = (chunks | (continuation * 0x20)) + 63
+    return chars[np.arange(13) < used[:, None]].astype(np.uint8).tobytes().decode('ascii')
@@ -0,0 +1,121 @@
+"""Columnar epoch batches shared by the parsers, the metrics and the epoch store."""
+import sys
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+CORE_COLUMNS = ('timestamp', 'latitude', 'longitude', 'altitude')
+
+# Epoch columns renamed when handed to the epoch sink, so all formats share names
+EPOCH_COLUMN_NAMES = {'num_satellites': 'satellites'}
+
+
+class EpochBatch:
+    """Epochs as equally long 1-D NumPy columns (struct of arrays).
+
+    timestamp (datetime64[ns]) and latitude, longitude, altitude (float64)
+    are always present; format specific columns (quality, fix_class,
+    solution_type, ratio, age, std_dev_x, ...) are kept in extra. Columns
+    are held by reference, so building a batch from parsed arrays, renaming
+    or adding columns and handing it to the metrics or the epoch store
+    copies no data.
+
+    A batch reads like a dict of columns (batch['ratio'], 'age' in batch,
+    batch.items()), so it can be passed wherever column dicts are taken;
+    len() is the number of epochs.
+    """
+
+    __slots__ = ('timestamp', 'latitude', 'longitude', 'altitude', 'extra')
+
+    def __init__(self, timestamp, latitude, longitude, altitude, **extra):
+        self.timestamp = np.asarray(timestamp, dtype='datetime64[ns]')
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.altitude = np.asarray(altitude, dtype=np.float64)
+        self.extra: Dict[str, np.ndarray] = {name: np.asarray(values) for name, values in extra.items()}
+        n = len(self.timestamp)
+        if any(len(values) != n for values in self.values()):
+            raise ValueError("All columns in a batch must have the same length")
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, np.ndarray]) -> 'EpochBatch':
+        """Batch over a mapping of column arrays (e.g. an EpochReader batch)"""
+        extra = {name: values for name, values in columns.items() if name not in CORE_COLUMNS}
+        return cls(*(columns[name] for name in CORE_COLUMNS), **extra)
+
+    @classmethod
+    def from_frame(cls, df: 'pd.DataFrame') -> 'EpochBatch':
+        return cls.from_columns({name: df[name].to_numpy() for name in df.columns})
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'EpochBatch':
+        """Batch from per-epoch dicts that all have the keys of the first one"""
+        if not records:
+            return cls.empty()
+        return cls.from_columns({name: np.array([record[name] for record in records]) for name in records[0]})
+
+    @classmethod
+    def coerce(cls, data: Union['EpochBatch', 'pd.DataFrame', Mapping, List[Dict]]) -> 'EpochBatch':
+        """Batch from any of the epoch containers the processors accept"""
+        if isinstance(data, cls):
+            return data
+        # pandas is only loaded by the XYZ parser; without it there are no frames to convert
+        pd = sys.modules.get('pandas')
+        if pd is not None and isinstance(data, pd.DataFrame):
+            return cls.from_frame(data)
+        if isinstance(data, Mapping):
+            return cls.from_columns(data)
+        return cls.from_records(data)
+
+    @classmethod
+    def empty(cls) -> 'EpochBatch':
+        return cls(np.zeros(0, dtype='datetime64[ns]'), np.zeros(0), np.zeros(0), np.zeros(0))
+
+    @classmethod
+    def concat(cls, batches: Iterable['EpochBatch']) -> 'EpochBatch':
+        """Join batches with the same columns end to end"""
+        batches = list(batches)
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        return cls.from_columns({name: np.concatenate([batch[name] for batch in batches])
+                                 for name in batches[0].keys()})
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in CORE_COLUMNS:
+            return getattr(self, name)
+        return self.extra[name]
+
+    def __contains__(self, name) -> bool:
+        return name in CORE_COLUMNS or name in self.extra
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        return [*CORE_COLUMNS, *self.extra]
+
+    def values(self) -> List[np.ndarray]:
+        return [self.timestamp, self.latitude, self.longitude, self.altitude, *self.extra.values()]
+
+    def items(self) -> List[Tuple[str, np.ndarray]]:
+        return list(zip(self.keys(), self.values()))
+
+    def get(self, name: str, default=None):
+        return self[name] if name in self else default
+
+    def with_columns(self, **columns) -> 'EpochBatch':
+        """New batch sharing this batch's columns plus (or replacing) the given ones"""
+        return EpochBatch.from_columns({**dict(self.items()), **columns})
+
+    def rename(self, names: Mapping[str, str]) -> 'EpochBatch':
+        """New batch sharing this batch's columns, with extra columns renamed"""
+        extra = {names.get(name, name): values for name, values in self.extra.items()}
+        return EpochBatch(self.timestamp, self.latitude, self.longitude, self.altitude, **extra)
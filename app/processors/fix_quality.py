@@ -0,0 +1,216 @@
+import math
+import numpy as np
+from typing import Dict, Optional
+
+from .stats import RunningStats
+
+# Fix classes shared by all formats
+FIX_NONE = 0
+FIX_SINGLE = 1
+FIX_DGPS = 2
+FIX_FLOAT = 3
+FIX_FIXED = 4
+
+FIX_CLASS_NAMES = {
+    FIX_NONE: 'none',
+    FIX_SINGLE: 'single',
+    FIX_DGPS: 'dgps',
+    FIX_FLOAT: 'float',
+    FIX_FIXED: 'fixed'
+}
+
+# NMEA GGA quality indicator -> fix class
+_NMEA_QUALITY = np.full(10, FIX_SINGLE, dtype=np.int8)
+_NMEA_QUALITY[0] = FIX_NONE
+_NMEA_QUALITY[2] = FIX_DGPS
+_NMEA_QUALITY[4] = FIX_FIXED
+_NMEA_QUALITY[5] = FIX_FLOAT
+
+# RTKLIB solution status (Q) -> fix class: 1 fix, 2 float, 3 SBAS, 4 DGPS, 5 single, 6 PPP
+_RTKLIB_QUALITY = np.array([FIX_NONE, FIX_FIXED, FIX_FLOAT, FIX_DGPS, FIX_DGPS, FIX_SINGLE, FIX_FLOAT],
+                           dtype=np.int8)
+
+
+def _lookup(table: np.ndarray, codes: np.ndarray, default: int) -> np.ndarray:
+    codes = np.asarray(codes, dtype=np.int64)
+    inside = (codes >= 0) & (codes < len(table))
+    return np.where(inside, table[np.clip(codes, 0, len(table) - 1)], default).astype(np.int8)
+
+
+def fix_classes(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Map a format's quality column to shared fix classes.
+
+    Args:
+        columns: Epoch columns with either 'fix_class', 'quality' (NMEA GGA)
+            or 'solution_type' (RTKLIB XYZ)
+
+    Returns:
+        int8 array of FIX_* values (FIX_SINGLE when no quality is known)
+    """
+    if 'fix_class' in columns:
+        return np.asarray(columns['fix_class'], dtype=np.int8)
+    if 'quality' in columns:
+        return _lookup(_NMEA_QUALITY, columns['quality'], FIX_SINGLE)
+    if 'solution_type' in columns:
+        return _lookup(_RTKLIB_QUALITY, columns['solution_type'], FIX_SINGLE)
+    n = len(next(iter(columns.values()))) if columns else 0
+    return np.full(n, FIX_SINGLE, dtype=np.int8)
+
+
+# A time step longer than this many nominal epoch intervals counts as a loss of fix
+GAP_FACTOR = 2.5
+
+
+def quality_mask(columns: Dict[str, np.ndarray], classes: np.ndarray,
+                 min_ratio: Optional[float] = None, max_age: Optional[float] = None) -> np.ndarray:
+    """Epochs passing the ambiguity ratio and correction age thresholds.
+
+    The ratio test only applies to fixed epochs; the age limit applies to all
+    epochs. Epochs without a ratio or age value pass, and a ratio of 0 is
+    taken as not reported (RTKLIB writes 0 when no ratio test was done).
+
+    Returns:
+        bool array, True for epochs to keep
+    """
+    keep = np.ones(len(classes), dtype=bool)
+    if min_ratio is not None and 'ratio' in columns:
+        ratio = np.asarray(columns['ratio'], dtype=np.float64)
+        keep &= ~((classes == FIX_FIXED) & (ratio > 0) & (ratio < min_ratio))
+    if max_age is not None and 'age' in columns:
+        keep &= ~(np.asarray(columns['age'], dtype=np.float64) > max_age)
+    return keep
+
+
+class FixClassStats:
+    """Accuracy statistics per fix class, fix availability and fix-loss events.
+
+    Each batch is reduced with np.bincount keyed by fix class, so all classes
+    are accumulated in one pass. A fix-loss event starts at the last fixed
+    epoch before a non-fixed epoch or a time gap (epochs without a fix are
+    usually not logged with a position) and ends at the next fixed epoch; an
+    event still open at the end of the data runs to the last epoch. The state
+    carried between batches is the last epoch and the start of an open loss.
+    """
+
+    __slots__ = ('counts', 'sums', 'sums_sq', 'maxima', 'filtered', 'max_gap', 'losses',
+                 '_first_time', '_first_fixed_time', '_last_time', '_last_fixed', '_loss_start')
+
+    def __init__(self, max_gap: Optional[float] = None):
+        """
+        Args:
+            max_gap: Seconds between epochs treated as a loss of fix; by default
+                GAP_FACTOR times the median epoch interval at the start of the data
+        """
+        n = len(FIX_CLASS_NAMES)
+        self.counts = np.zeros(n, dtype=np.int64)
+        # Rows: horizontal, vertical
+        self.sums = np.zeros((2, n))
+        self.sums_sq = np.zeros((2, n))
+        self.maxima = np.full((2, n), -np.inf)
+        self.filtered = 0
+        self.max_gap = int(max_gap * 1e9) if max_gap else None
+        self.losses = RunningStats()
+        self._first_time = None
+        self._first_fixed_time = None
+        self._last_time = None
+        self._last_fixed = False
+        self._loss_start = None
+
+    def update(self, classes: np.ndarray, horizontal_errors: np.ndarray, vertical_errors: np.ndarray,
+               timestamps: np.ndarray) -> None:
+        """Add a batch of epochs in time order"""
+        classes = np.asarray(classes, dtype=np.int64)
+        if len(classes) == 0:
+            return
+        n = len(FIX_CLASS_NAMES)
+        self.counts += np.bincount(classes, minlength=n)
+        for row, errors in enumerate((horizontal_errors, vertical_errors)):
+            errors = np.asarray(errors, dtype=np.float64)
+            self.sums[row] += np.bincount(classes, weights=errors, minlength=n)
+            self.sums_sq[row] += np.bincount(classes, weights=errors * errors, minlength=n)
+            np.maximum.at(self.maxima[row], classes, errors)
+        self._update_losses(np.asarray(timestamps).astype('datetime64[ns]').astype(np.int64),
+                            classes == FIX_FIXED)
+
+    def _update_losses(self, times: np.ndarray, fixed: np.ndarray) -> None:
+        if self._first_time is None:
+            self._first_time = int(times[0])
+        if self._first_fixed_time is None and fixed.any():
+            self._first_fixed_time = int(times[np.argmax(fixed)])
+        if self._last_time is not None:
+            times = np.concatenate(([self._last_time], times))
+            fixed = np.concatenate(([self._last_fixed], fixed))
+        self._last_time = int(times[-1])
+        self._last_fixed = bool(fixed[-1])
+        if len(times) < 2:
+            return
+        if self.max_gap is None:
+            interval = float(np.median(np.diff(times)))
+            if interval > 0:
+                self.max_gap = int(GAP_FACTOR * interval)
+
+        # Starts and ends alternate: a gap between two fixed epochs is both at once
+        gap = np.diff(times) > self.max_gap if self.max_gap else np.zeros(len(times) - 1, dtype=bool)
+        before, after = fixed[:-1], fixed[1:]
+        starts = np.flatnonzero(before & (~after | gap))
+        ends = np.flatnonzero(after & (~before | gap))
+        start_times = times[starts]
+        if self._loss_start is not None:
+            start_times = np.concatenate(([self._loss_start], start_times))
+        elif len(ends) and (len(starts) == 0 or ends[0] < starts[0]):
+            # First fix of the data, not a re-acquisition
+            ends = ends[1:]
+        end_times = times[ends + 1]
+        closed = len(end_times)
+        self.losses.update((end_times - start_times[:closed]) / 1e9)
+        self._loss_start = int(start_times[closed]) if len(start_times) > closed else None
+
+    def to_dict(self) -> Dict:
+        """Per-class statistics, availability and fix-loss summary"""
+        total = int(self.counts.sum())
+        classes = {}
+        for code, name in FIX_CLASS_NAMES.items():
+            count = int(self.counts[code])
+            if count == 0:
+                continue
+            entry = {'epochs': count, 'percentage': 100.0 * count / total}
+            for row, key in enumerate(('horizontal', 'vertical')):
+                mean = float(self.sums[row, code]) / count
+                mean_sq = float(self.sums_sq[row, code]) / count
+                entry[key] = {
+                    'rmse': math.sqrt(mean_sq),
+                    'mean': mean,
+                    'std': math.sqrt(max(mean_sq - mean * mean, 0.0)),
+                    'max': float(self.maxima[row, code])
+                }
+            classes[name] = entry
+
+        losses = RunningStats()
+        losses.merge(self.losses)
+        if self._loss_start is not None:
+            losses.update([(self._last_time - self._loss_start) / 1e9])
+        duration = (self._last_time - self._first_time) / 1e9 if total else 0.0
+        fixed_time = None
+        if duration > 0:
+            acquired = ((self._first_fixed_time - self._first_time) / 1e9
+                        if self._first_fixed_time is not None else duration)
+            lost = losses.mean * losses.count if losses.count else 0.0
+            fixed_time = 100.0 * max(duration - acquired - lost, 0.0) / duration
+
+        return {
+            'classes': classes,
+            'availability': {
+                name: 100.0 * int(self.counts[code]) / total if total else 0.0
+                for code, name in FIX_CLASS_NAMES.items() if code != FIX_NONE
+            },
+            'fixed_time_percentage': fixed_time,
+            'fix_loss': {
+                'events': losses.count,
+                'total_duration': losses.mean * losses.count if losses.count else 0.0,
+                'mean_duration': losses.mean if losses.count else None,
+                'max_duration': losses.max if losses.count else None,
+                'ongoing_at_end': self._loss_start is not None
+            },
+            'gap_threshold': self.max_gap / 1e9 if self.max_gap else None,
+            'filtered_epochs': self.filtered
+        }
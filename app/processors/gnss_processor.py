@@ -1,162 +1,604 @@
-import pynmea2
-import georinex as gr
+import os
+import tempfile
 import numpy as np
-from pyproj import Transformer
-from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 from .xyz_processor import XYZProcessor
+from .ubx_processor import UBXProcessor
+from .projection import get_transformer, utm_crs, WGS84, ECEF, WGS84_3D
+from .stats import RunningStats, QuantileSketch, accuracy_percentiles
+from .fix_quality import FixClassStats, fix_classes, quality_mask
+from .robust import PositionSample, robust_center, robust_scale, outlier_mask
+from .timing import StageTimer
+from .epochs import EpochBatch, EPOCH_COLUMN_NAMES
+from . import rinex_reader, rinex_spp
+from .nmea_stream import NmeaEpochParser, iter_lines, DEFAULT_CHUNK_SIZE, DEFAULT_BATCH_SIZE
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Bump whenever parsing or metrics change, so cached results are recomputed
+PROCESSOR_VERSION = '7'
+
+# Positions sampled in the first streaming pass to estimate a robust reference
+REFERENCE_SAMPLE_SIZE = 1000000
+
+
+def _source_size(source) -> Optional[int]:
+    """Size in bytes of a file object being read, if it can be told"""
+    if not hasattr(source, 'tell'):
+        return None
+    size = getattr(source, 'size', None)
+    if size is None and hasattr(source, 'fileno'):
+        try:
+            size = os.fstat(source.fileno()).st_size
+        except (OSError, ValueError):
+            return None
+    return size
+
 
 class GNSSProcessor:
-    def __init__(self, base_station_coords: Optional[Tuple[float, float, float]] = None):
+    def __init__(self, base_station_coords: Optional[Tuple[float, float, float]] = None,
+                 epoch_sink=None, quantile_accuracy: Optional[float] = 0.005,
+                 rinex_cache: Optional[str] = None, rinex_cache_max_bytes: Optional[int] = None,
+                 rinex_block_seconds: float = rinex_reader.DEFAULT_BLOCK_SECONDS,
+                 min_ratio: Optional[float] = None, max_age: Optional[float] = None,
+                 reference_estimator: str = 'median', outlier_sigma: Optional[float] = None,
+                 timer: Optional[StageTimer] = None, progress: Optional[Callable[[float], None]] = None):
         """
         Initialize GNSS processor with optional base station coordinates
         
         Args:
             base_station_coords: Optional tuple of (lat, lon, height) for fixed base station
+            epoch_sink: Optional object with append(columns) receiving per-epoch
+                positions and errors as batches of NumPy columns (e.g. an EpochWriter)
+            quantile_accuracy: Relative accuracy of the quantile sketches used for
+                percentiles in streaming mode; None skips percentiles there
+            rinex_cache: Optional folder for decoded RINEX observation blocks
+            rinex_cache_max_bytes: Optional size above which the least recently
+                used files are evicted from rinex_cache
+            rinex_block_seconds: Time span of RINEX observations decoded at once
+            min_ratio: Optional ambiguity ratio below which fixed epochs are
+                left out of the metrics
+            max_age: Optional correction age in seconds above which epochs are
+                left out of the metrics
+            reference_estimator: How the floating reference is estimated from
+                projected positions: 'mean', 'median', 'sigma_clip' or 'huber'
+            outlier_sigma: Optional threshold in robust sigmas (from the MAD about
+                the robust center) beyond which epochs are rejected from the metrics
+            timer: Optional StageTimer collecting the time spent per processing
+                stage and the number of epochs processed
+            progress: Optional callable receiving the fraction of the input
+                processed (0-1) as NMEA chunks are read and RINEX blocks decoded
         """
         self.base_station_coords = base_station_coords
-        self.transformer = Transformer.from_crs("EPSG:4326", "EPSG:32633", always_xy=True)
+        self.epoch_sink = epoch_sink
+        self.quantile_accuracy = quantile_accuracy
+        self.rinex_cache = rinex_cache
+        self.rinex_cache_max_bytes = rinex_cache_max_bytes
+        self.rinex_block_seconds = rinex_block_seconds
+        self.min_ratio = min_ratio
+        self.max_age = max_age
+        self.reference_estimator = reference_estimator
+        self.outlier_sigma = outlier_sigma
+        self.timer = timer if timer is not None else StageTimer()
+        self.progress = progress
         self.xyz_processor = XYZProcessor()
+        self.ubx_processor = UBXProcessor()
+        self.ecef_to_lla = get_transformer(ECEF, WGS84_3D)
+        
+    def process_file(self, source: Union[str, BinaryIO], format_type: str, nav_file: Optional[str] = None) -> Dict:
+        """Process a stored file according to its format type (nmea, rnx/rinex, xyz, ubx)
         
+        Args:
+            source: Data file path, or for NMEA, XYZ and UBX a binary file
+                object (e.g. an archived upload being decompressed)
+            format_type: File format
+            nav_file: Navigation file for RINEX observations
+        """
+        format_type = format_type.lower()
+        if format_type == 'nmea':
+            return self.process_nmea_stream(source)
+        if format_type in ('rnx', 'rinex'):
+            return self.process_rinex(source, nav_file)
+        if format_type == 'xyz':
+            return self.process_xyz(source)
+        if format_type == 'ubx':
+            return self.process_ubx(source)
+        raise ValueError(f"Unsupported format: {format_type}")
+
     def process_nmea(self, nmea_data: str) -> Dict:
-        """Process NMEA data and return parsed results"""
+        """Process NMEA text held in memory and return parsed results
+        
+        Fixes are parsed and dated (from RMC/ZDA sentences) as in
+        process_nmea_stream, but all epochs are kept, so percentiles are exact.
+        """
         try:
-            parsed_data = []
-            for line in nmea_data.split('\n'):
-                try:
-                    if line.startswith('$GNGGA') or line.startswith('$GPGGA'):
-                        msg = pynmea2.parse(line)
-                        if msg.gps_qual > 0:  # Only process if we have a GPS fix
-                            parsed_data.append({
-                                'timestamp': datetime.combine(msg.datestamp or datetime.now().date(), 
-                                                           msg.timestamp),
-                                'latitude': msg.latitude,
-                                'longitude': msg.longitude,
-                                'altitude': msg.altitude,
-                                'hdop': msg.horizontal_dil,
-                                'satellites': msg.num_sats,
-                                'quality': msg.gps_qual
-                            })
-                except pynmea2.ParseError:
-                    continue
-                    
-            return self._compute_accuracy_metrics(parsed_data)
+            parser = NmeaEpochParser()
+            with self.timer.stage('parse'):
+                batch = EpochBatch.concat(parser.parse(iter_lines([nmea_data])))
+            if len(batch) == 0:
+                return {'error': 'No valid data points found'}
+            with self.timer.stage('stats'):
+                results = self._compute_accuracy_metrics(batch)
+            if 'error' not in results:
+                results['skipped_sentences'] = parser.skipped
+            return results
         except Exception as e:
             raise ValueError(f"Error processing NMEA data: {str(e)}")
 
-    def process_rinex(self, rinex_file: str) -> Dict:
-        """Process RINEX observation file and return parsed results"""
+    def process_nmea_stream(self, source, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+        """Process an NMEA log with bounded memory.
+        
+        The log is read in chunks and GGA fixes are reduced batch by batch into
+        online accumulators, so memory does not grow with the file length.
+        The log is parsed once: when the reference has to be estimated first
+        (floating reference, outlier rejection) the parsed epochs are spooled
+        to disk and the error pass reads them back (see _compute_spooled_metrics).
+        
+        Args:
+            source: Path, file object (text or binary) or iterable of chunks
+            chunk_size: Read size in bytes
+            batch_size: Number of fixes reduced at a time
+        """
         try:
-            # Read RINEX file
-            obs = gr.load(rinex_file)
-            
-            parsed_data = []
-            for time, data in obs.items():
-                if 'C1' in data and 'L1' in data:  # Basic check for required observables
-                    position = self._compute_position_from_rinex(data)
-                    if position:
-                        parsed_data.append({
-                            'timestamp': time,
-                            'latitude': position[0],
-                            'longitude': position[1],
-                            'altitude': position[2],
-                            'satellites': len(data)
-                        })
-            
-            return self._compute_accuracy_metrics(parsed_data)
+            if isinstance(source, str):
+                with open(source, 'rb') as f:
+                    return self.process_nmea_stream(f, chunk_size, batch_size)
+
+            parser = NmeaEpochParser(batch_size)
+            if self.progress is not None and hasattr(source, 'read'):
+                source = self._read_chunks(source, chunk_size)
+            lines = self.timer.iterate(iter_lines(source, chunk_size), 'read')
+            batches = self.timer.iterate(parser.parse(lines), 'parse')
+            if self._needs_first_pass:
+                results = self._compute_spooled_metrics(batches, batch_size)
+            else:
+                results = self._compute_streaming_metrics(lambda: batches)
+            if 'error' not in results:
+                results['skipped_sentences'] = parser.skipped
+            return results
+        except Exception as e:
+            raise ValueError(f"Error processing NMEA data: {str(e)}")
+
+    def process_epochs(self, reader, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+        """Compute accuracy metrics from previously parsed epochs (e.g. an EpochReader)"""
+        return self._compute_streaming_metrics(lambda: self.timer.iterate(reader.iter_batches(batch_size), 'read'))
+
+    def process_cached(self, reader, format_type: str) -> Dict:
+        """Compute metrics and format-specific statistics from cached parsed epochs
+        
+        Metrics are computed the way a fresh run of the format computes them:
+        NMEA with the streaming accumulators (approximate percentiles), the
+        other formats on all epochs at once (exact percentiles), read through
+        the entry's memory maps. Results therefore do not depend on whether
+        the parsed cache was hit.
+        """
+        format_type = format_type.lower()
+        if format_type == 'nmea':
+            return self.process_epochs(reader)
+
+        with self.timer.stage('read'):
+            data = EpochBatch.from_columns(reader.read())
+        with self.timer.stage('stats'):
+            results = self._compute_accuracy_metrics(data)
+        if 'error' in results or format_type != 'xyz':
+            return results
+
+        data = data.rename({v: k for k, v in EPOCH_COLUMN_NAMES.items()})
+        return {**results, **self._xyz_statistics(self.xyz_processor._compute_statistics(data))}
+
+    def _compute_spooled_metrics(self, batches: Iterator[EpochBatch], batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+        """Streaming metrics over a single pass of batches that need a reference estimate first.
+        
+        While the reference sample is drawn, the batches are appended to a
+        temporary epoch store entry; the error pass then reads that entry back
+        through memory maps instead of parsing the source again.
+        """
+        from ..epoch_store import EpochStore
+
+        with tempfile.TemporaryDirectory(prefix='gnss-spool-') as folder:
+            writer = EpochStore(folder).writer('parsed')
+
+            def spooled():
+                for batch in batches:
+                    with self.timer.stage('store'):
+                        writer.append(batch)
+                    yield batch
+
+            estimate = self._sample_reference(spooled())
+            if estimate is None:
+                writer.abort()
+                return {'error': 'No valid data points found'}
+            reader = writer.commit()
+            return self._compute_streaming_metrics(
+                lambda: self.timer.iterate(reader.iter_batches(batch_size), 'read'), estimate)
+
+    def _sample_reference(self, batches: Iterable[Union[EpochBatch, Dict[str, np.ndarray]]]) -> Optional[Dict]:
+        """Robust reference estimate from a bounded sample of the epochs passing the quality filter"""
+        sample = PositionSample(REFERENCE_SAMPLE_SIZE)
+        for batch in batches:
+            with self.timer.stage('stats'):
+                keep = quality_mask(batch, fix_classes(batch), self.min_ratio, self.max_age)
+                sample.add(np.column_stack((batch['latitude'][keep], batch['longitude'][keep],
+                                            batch['altitude'][keep])))
+        if len(sample) == 0:
+            return None
+        with self.timer.stage('stats'):
+            estimate = self._estimate_reference(sample.array())
+        estimate['info']['sampled_epochs'] = len(sample)
+        return estimate
+
+    def _compute_streaming_metrics(self,
+                                   batches: Callable[[], Iterator[Union[EpochBatch, Dict[str, np.ndarray]]]],
+                                   estimate: Optional[Dict] = None) -> Dict:
+        """Compute accuracy metrics batch by batch with online accumulators.
+        
+        Args:
+            batches: Callable returning a fresh iterator over epoch batches (or
+                dicts of columns, as an EpochReader yields); in floating
+                reference mode or with outlier rejection it is called twice
+                (robust reference from a bounded sample first, then errors)
+                unless estimate is given
+            estimate: Reference estimate from _sample_reference, if already made
+        """
+        if estimate is None and self._needs_first_pass:
+            estimate = self._sample_reference(batches())
+            if estimate is None:
+                return {'error': 'No valid data points found'}
+        if self.base_station_coords:
+            reference = np.array(self.base_station_coords, dtype=np.float64)
+        else:
+            reference = estimate['reference']
+
+        projection = utm_crs(reference[0], reference[1])
+        transformer = get_transformer(WGS84, projection)
+        ref_east, ref_north = transformer.transform(reference[1], reference[0])
+        center = self._projected_center(estimate, transformer)
+        rejected = 0
+
+        horizontal = RunningStats()
+        vertical = RunningStats()
+        sketches = None
+        if self.quantile_accuracy:
+            sketches = [QuantileSketch(self.quantile_accuracy) for _ in range(3)]
+        fix_stats = FixClassStats()
+        start_time = end_time = None
+        for batch in batches():
+            batch = EpochBatch.coerce(batch)
+            if len(batch) == 0:
+                continue
+            self.timer.rows += len(batch)
+            with self.timer.stage('project'):
+                east, north = transformer.transform(batch.longitude, batch.latitude)
+            horizontal_errors = np.hypot(east - ref_east, north - ref_north)
+            vertical_errors = np.abs(batch.altitude - reference[2])
+            # All epochs are stored; filtered ones are left out of the metrics
+            if self.epoch_sink is not None:
+                with self.timer.stage('store'):
+                    self.epoch_sink.append(batch.with_columns(horizontal_error=horizontal_errors,
+                                                              vertical_error=vertical_errors))
+            with self.timer.stage('stats'):
+                classes = fix_classes(batch)
+                keep = quality_mask(batch, classes, self.min_ratio, self.max_age)
+                fix_stats.filtered += int((~keep).sum())
+                if center is not None:
+                    outliers = keep & outlier_mask(np.column_stack((east, north, batch.altitude)),
+                                                   center, estimate['scale'], self.outlier_sigma)
+                    rejected += int(outliers.sum())
+                    keep &= ~outliers
+                if not keep.all():
+                    classes = classes[keep]
+                    horizontal_errors = horizontal_errors[keep]
+                    vertical_errors = vertical_errors[keep]
+                if len(classes) == 0:
+                    continue
+                timestamps = batch.timestamp[keep]
+                horizontal.update(horizontal_errors)
+                vertical.update(vertical_errors)
+                if sketches:
+                    sketches[0].update(horizontal_errors)
+                    sketches[1].update(vertical_errors)
+                    sketches[2].update(np.hypot(horizontal_errors, vertical_errors))
+                fix_stats.update(classes, horizontal_errors, vertical_errors, timestamps)
+                if start_time is None:
+                    start_time = timestamps[0]
+                end_time = timestamps[-1]
+
+        if horizontal.count == 0:
+            return {'error': 'No valid data points found'}
+
+        results = {
+            'horizontal': horizontal.to_dict(),
+            'vertical': vertical.to_dict(),
+            'num_points': horizontal.count,
+            'reference_mode': 'fixed' if self.base_station_coords else 'floating',
+            'projection': projection,
+            'reference_position': {
+                'latitude': reference[0],
+                'longitude': reference[1],
+                'altitude': reference[2]
+            },
+            'start_time': np.datetime64(start_time, 'ms').item(),
+            'end_time': np.datetime64(end_time, 'ms').item(),
+            'fix_stats': fix_stats.to_dict(),
+            'reference_estimation': self._estimation_summary(estimate, rejected)
+        }
+        if sketches:
+            # Approximate percentiles; 2DRMS is exact from the running RMSE
+            results['horizontal'].update({
+                'cep50': sketches[0].quantile(0.5),
+                'cep95': sketches[0].quantile(0.95),
+                '2drms': 2 * horizontal.rmse
+            })
+            results['vertical']['le95'] = sketches[1].quantile(0.95)
+            results['r95'] = sketches[2].quantile(0.95)
+            results['percentile_method'] = 'sketch'
+        return results
+
+    def process_rinex(self, rinex_file: str, nav_file: Optional[str] = None) -> Dict:
+        """Process a RINEX observation file by GPS single point positioning
+        
+        Observations are decoded and solved one time block at a time, so only
+        the block and the per-epoch solutions are held in memory. With a
+        rinex_cache folder set, decoded blocks are cached as NetCDF.
+        
+        Args:
+            rinex_file: RINEX observation file
+            nav_file: RINEX GPS navigation file with the broadcast ephemerides
+        """
+        try:
+            if not nav_file:
+                raise ValueError("A navigation file is required to compute positions")
+
+            import georinex as gr
+
+            with self.timer.stage('parse'):
+                ephemerides = rinex_spp.Ephemerides.from_dataset(gr.load(nav_file, use='G'))
+            cache_dir = None
+            if self.rinex_cache:
+                cache_dir = os.path.join(self.rinex_cache, os.path.splitext(os.path.basename(rinex_file))[0])
+
+            blocks = []
+            approx_position = None
+            iono_free = False
+            unsolved = 0
+            observation_blocks = rinex_reader.iter_observation_blocks(rinex_file, self.rinex_block_seconds,
+                                                                      cache_dir, self.progress,
+                                                                      self.rinex_cache_max_bytes)
+            for obs in self.timer.iterate(observation_blocks, 'parse'):
+                with self.timer.stage('solve'):
+                    times, satellites, pseudoranges, block_iono_free = rinex_spp.observation_arrays(obs)
+                    if approx_position is None:
+                        approx_position = obs.attrs.get('position')
+                    solution = rinex_spp.solve_positions(
+                        times, satellites, pseudoranges, ephemerides,
+                        approx_position=approx_position,
+                        iono_free=block_iono_free
+                    )
+                valid = solution['valid']
+                iono_free |= block_iono_free
+                unsolved += int((~valid).sum())
+                if not valid.any():
+                    continue
+                # Start the next block from the last solved position
+                last = np.flatnonzero(valid)[-1]
+                approx_position = (solution['x'][last], solution['y'][last], solution['z'][last])
+
+                with self.timer.stage('project'):
+                    lon, lat, alt = self.ecef_to_lla.transform(solution['x'][valid], solution['y'][valid],
+                                                               solution['z'][valid])
+                blocks.append(EpochBatch(
+                    solution['timestamp'][valid], lat, lon, alt,
+                    num_satellites=solution['num_satellites'][valid],
+                    pdop=solution['pdop'][valid]
+                ))
+
+            if not blocks:
+                return {'error': 'No valid data points found'}
+            with self.timer.stage('stats'):
+                results = self._compute_accuracy_metrics(EpochBatch.concat(blocks))
+            if 'error' not in results:
+                results['unsolved_epochs'] = unsolved
+                results['iono_free'] = iono_free
+            return results
         except Exception as e:
             raise ValueError(f"Error processing RINEX data: {str(e)}")
 
-    def process_xyz(self, xyz_file: str) -> Dict:
+    def process_xyz(self, xyz_file: Union[str, BinaryIO]) -> Dict:
         """Process XYZ format file and return parsed results"""
         try:
-            # Process XYZ file using dedicated processor
-            xyz_data = self.xyz_processor.process_xyz_file(xyz_file)
+            # Process XYZ file in columnar mode using dedicated processor
+            with self.timer.stage('parse'):
+                xyz_data = self.xyz_processor.process_xyz_file_bulk(xyz_file)
             
-            # Extract position data for accuracy metrics
-            parsed_data = [{
-                'timestamp': point['timestamp'],
-                'latitude': point['latitude'],
-                'longitude': point['longitude'],
-                'altitude': point['altitude'],
-                'satellites': point['num_satellites']
-            } for point in xyz_data['data']]
-            
-            # Compute accuracy metrics
-            accuracy_metrics = self._compute_accuracy_metrics(parsed_data)
+            # Compute accuracy metrics directly on the parsed columns
+            with self.timer.stage('stats'):
+                accuracy_metrics = self._compute_accuracy_metrics(xyz_data['data'])
             
             # Combine with XYZ-specific statistics
             return {
                 **accuracy_metrics,
-                'xyz_stats': xyz_data['statistics'],
-                'solution_quality': {
-                    'std_dev_x': xyz_data['statistics']['mean_accuracy']['x'],
-                    'std_dev_y': xyz_data['statistics']['mean_accuracy']['y'],
-                    'std_dev_z': xyz_data['statistics']['mean_accuracy']['z']
-                }
+                'invalid_lines': xyz_data['invalid_lines'],
+                **self._xyz_statistics(xyz_data['statistics'])
             }
         except Exception as e:
             raise ValueError(f"Error processing XYZ data: {str(e)}")
 
-    def _compute_position_from_rinex(self, data: Dict) -> Optional[Tuple[float, float, float]]:
-        """Compute approximate position from RINEX observables"""
-        # This is a placeholder for actual RINEX position computation
-        # In a real implementation, this would use proper algorithms for position determination
-        return None
+    def process_ubx(self, ubx_file: Union[str, BinaryIO]) -> Dict:
+        """Process a UBX binary log (NAV-PVT, optionally NAV-HPPOSLLH) and return parsed results"""
+        try:
+            with self.timer.stage('parse'):
+                ubx_data = self.ubx_processor.process_ubx_file_bulk(ubx_file)
+            with self.timer.stage('stats'):
+                accuracy_metrics = self._compute_accuracy_metrics(ubx_data['data'])
+            if 'error' in accuracy_metrics:
+                return accuracy_metrics
+
+            statistics = ubx_data['statistics']
+            results = {**accuracy_metrics, 'ubx_stats': statistics}
+            if 'mean_accuracy' in statistics:
+                results['solution_quality'] = {
+                    'h_acc': statistics['mean_accuracy']['horizontal'],
+                    'v_acc': statistics['mean_accuracy']['vertical']
+                }
+            return results
+        except Exception as e:
+            raise ValueError(f"Error processing UBX data: {str(e)}")
+
+    def _xyz_statistics(self, statistics: Dict) -> Dict:
+        """Shape XYZProcessor statistics into result fields"""
+        return {
+            'xyz_stats': statistics,
+            'solution_quality': {
+                'std_dev_x': statistics['mean_accuracy']['x'],
+                'std_dev_y': statistics['mean_accuracy']['y'],
+                'std_dev_z': statistics['mean_accuracy']['z']
+            }
+        }
+
+    def _emit_epochs(self, batch: EpochBatch, horizontal_errors: np.ndarray, vertical_errors: np.ndarray) -> None:
+        """Hand per-epoch data and errors to the epoch sink (the batch's columns are not copied)"""
+        self.epoch_sink.append(batch.rename(EPOCH_COLUMN_NAMES).with_columns(horizontal_error=horizontal_errors,
+                                                                             vertical_error=vertical_errors))
+
+    def _read_chunks(self, source, chunk_size: int) -> Iterator[Union[bytes, str]]:
+        """Read a file object in chunks, reporting how far into it each chunk ends"""
+        size = _source_size(source)
+        for chunk in iter(lambda: source.read(chunk_size), source.read(0)):
+            if size:
+                self.progress(min(source.tell() / size, 1.0))
+            yield chunk
+
+    @property
+    def _needs_first_pass(self) -> bool:
+        """Whether positions must be seen once before errors can be computed"""
+        return not self.base_station_coords or bool(self.outlier_sigma)
+
+    def _estimate_reference(self, positions: np.ndarray) -> Dict:
+        """Robust center and per-axis scale of (lat, lon, alt) positions, estimated in metres.
+        
+        Positions are projected to the UTM zone of their median, so the
+        estimator works on east/north/up metres rather than degrees.
+        """
+        projection = utm_crs(float(np.median(positions[:, 0])), float(np.median(positions[:, 1])))
+        east, north = get_transformer(WGS84, projection).transform(positions[:, 1], positions[:, 0])
+        points = np.column_stack((east, north, positions[:, 2]))
+        center, info = robust_center(points, self.reference_estimator)
+        lon, lat = get_transformer(projection, WGS84).transform(center[0], center[1])
+        return {
+            'reference': np.array([lat, lon, center[2]]),
+            'scale': robust_scale(points, center),
+            'info': info
+        }
+
+    def _projected_center(self, estimate: Optional[Dict], transformer) -> Optional[np.ndarray]:
+        """Robust center in the metrics projection, if outliers are to be rejected"""
+        if estimate is None or not self.outlier_sigma:
+            return None
+        lat, lon, alt = estimate['reference']
+        east, north = transformer.transform(lon, lat)
+        return np.array([east, north, alt])
 
-    def _compute_accuracy_metrics(self, data: List[Dict]) -> Dict:
-        """Compute accuracy metrics from parsed GNSS data"""
-        if not data:
+    def _estimation_summary(self, estimate: Optional[Dict], rejected: int) -> Optional[Dict]:
+        if estimate is None:
+            return None
+        return {
+            **estimate['info'],
+            'scale': dict(zip(('east', 'north', 'up'), estimate['scale'])),
+            'outlier_sigma': self.outlier_sigma,
+            'rejected_outliers': rejected
+        }
+
+    def _compute_accuracy_metrics(self, data: Union[EpochBatch, 'pd.DataFrame', List[Dict]]) -> Dict:
+        """Compute accuracy metrics from parsed GNSS data (EpochBatch; DataFrames and lists of dicts are converted)"""
+        if len(data) == 0:
             return {'error': 'No valid data points found'}
 
-        # Convert to numpy arrays for efficient computation
-        positions = np.array([[d['latitude'], d['longitude'], d['altitude']] for d in data])
+        batch = EpochBatch.coerce(data)
+        self.timer.rows += len(batch)
+        classes = fix_classes(batch)
+        keep = quality_mask(batch, classes, self.min_ratio, self.max_age)
+        if not keep.any():
+            return {'error': 'No valid data points found'}
+        filtered = int((~keep).sum())
         
         # Compute reference position
+        estimate = None
+        if self._needs_first_pass:
+            estimate = self._estimate_reference(np.column_stack((batch.latitude[keep], batch.longitude[keep],
+                                                                 batch.altitude[keep])))
         if self.base_station_coords:
             reference = np.array(self.base_station_coords)
         else:
-            # Floating reference mode - use mean position
-            reference = np.mean(positions, axis=0)
+            # Floating reference mode - robust center of the projected positions
+            reference = estimate['reference']
 
-        # Convert to UTM for accurate distance calculations
-        utm_coords = []
-        for pos in positions:
-            east, north = self.transformer.transform(pos[1], pos[0])
-            utm_coords.append([east, north, pos[2]])
-        utm_coords = np.array(utm_coords)
-
-        ref_east, ref_north = self.transformer.transform(reference[1], reference[0])
-        ref_utm = np.array([ref_east, ref_north, reference[2]])
+        # Convert to the UTM zone of the reference for accurate distance calculations,
+        # projecting all positions with a single array call
+        projection = utm_crs(reference[0], reference[1])
+        transformer = get_transformer(WGS84, projection)
+        with self.timer.stage('project'):
+            east, north = transformer.transform(batch.longitude, batch.latitude)
+        ref_east, ref_north = transformer.transform(reference[1], reference[0])
 
         # Compute errors
-        errors = utm_coords - ref_utm
-        horizontal_errors = np.sqrt(errors[:, 0]**2 + errors[:, 1]**2)
-        vertical_errors = np.abs(errors[:, 2])
+        horizontal_errors = np.hypot(east - ref_east, north - ref_north)
+        vertical_errors = np.abs(batch.altitude - reference[2])
+
+        # All epochs are stored; filtered ones are left out of the metrics
+        if self.epoch_sink is not None:
+            with self.timer.stage('store'):
+                self._emit_epochs(batch, horizontal_errors, vertical_errors)
+
+        rejected = 0
+        center = self._projected_center(estimate, transformer)
+        if center is not None:
+            outliers = keep & outlier_mask(np.column_stack((east, north, batch.altitude)),
+                                           center, estimate['scale'], self.outlier_sigma)
+            rejected = int(outliers.sum())
+            keep &= ~outliers
+            if not keep.any():
+                return {'error': 'No valid data points found'}
 
-        # Compute statistics
+        fix_stats = FixClassStats()
+        fix_stats.filtered = filtered
+        horizontal_errors = horizontal_errors[keep]
+        vertical_errors = vertical_errors[keep]
+        fix_stats.update(classes[keep], horizontal_errors, vertical_errors,
+                         batch.timestamp[keep])
+
+        # Compute statistics (percentiles by linear-time selection, not sorting)
+        percentile_metrics = accuracy_percentiles(horizontal_errors, vertical_errors)
         results = {
             'horizontal': {
                 'rmse': np.sqrt(np.mean(horizontal_errors**2)),
                 'std': np.std(horizontal_errors),
                 'mean': np.mean(horizontal_errors),
                 'max': np.max(horizontal_errors),
-                'min': np.min(horizontal_errors)
+                'min': np.min(horizontal_errors),
+                **percentile_metrics['horizontal']
             },
             'vertical': {
                 'rmse': np.sqrt(np.mean(vertical_errors**2)),
                 'std': np.std(vertical_errors),
                 'mean': np.mean(vertical_errors),
                 'max': np.max(vertical_errors),
-                'min': np.min(vertical_errors)
+                'min': np.min(vertical_errors),
+                **percentile_metrics['vertical']
             },
-            'num_points': len(data),
+            'r95': percentile_metrics['r95'],
+            'percentile_method': 'exact',
+            'num_points': len(horizontal_errors),
             'reference_mode': 'fixed' if self.base_station_coords else 'floating',
+            'projection': projection,
             'reference_position': {
                 'latitude': reference[0],
                 'longitude': reference[1],
                 'altitude': reference[2]
-            }
+            },
+            'fix_stats': fix_stats.to_dict(),
+            'reference_estimation': self._estimation_summary(estimate, rejected)
         }
 
         return results
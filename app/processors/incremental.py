@@ -0,0 +1,113 @@
+"""Format detection and chunk-by-chunk parsing of uploads.
+
+IncrementalParser consumes an upload as it arrives, so the epochs are
+already parsed when the last chunk is received. Its state (line remainder,
+NMEA date tracking, buffered fixes and the epoch writer) is picklable, so
+it can be saved between upload requests and resumed by another process.
+"""
+import re
+from typing import Optional
+
+from .epochs import EpochBatch, EPOCH_COLUMN_NAMES
+from .nmea_stream import NmeaEpochParser
+
+# Formats parsed while uploading; RINEX needs the complete file
+INCREMENTAL_FORMATS = ('nmea', 'xyz')
+
+_NMEA_SENTENCE = re.compile(r'^\$[A-Z]{2}[A-Z]{3},')
+_XYZ_LINE = re.compile(r'^\d{4}[/-]\d{2}[/-]\d{2}\s+\d{2}:\d{2}:\d{2}(\.\d+)?(\s+-?\d+(\.\d+)?){3}')
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Detect the format of a GNSS file from its first bytes.
+
+    Returns:
+        'nmea', 'xyz', 'ubx', 'rnx' (RINEX observations), 'nav' (RINEX
+        navigation) or None if not recognised
+    """
+    if head[:2] == b'\xb5\x62':
+        return 'ubx'
+    text = head.decode('ascii', errors='replace')
+    lines = text.splitlines()
+    if lines and 'RINEX VERSION / TYPE' in lines[0]:
+        file_type = lines[0][20:21].upper()
+        if file_type == 'O':
+            return 'rnx'
+        if file_type in ('N', 'G'):
+            return 'nav'
+        return None
+
+    for line in lines[:50]:
+        line = line.strip()
+        if not line or line[0] in '#%':
+            continue
+        if _NMEA_SENTENCE.match(line):
+            return 'nmea'
+        if _XYZ_LINE.match(line):
+            return 'xyz'
+    return None
+
+
+class IncrementalParser:
+    """Parses NMEA or XYZ content fed in arbitrary chunks into an epoch sink"""
+
+    def __init__(self, format_type: str, sink):
+        """
+        Args:
+            format_type: 'nmea' or 'xyz'
+            sink: Object with append(columns), e.g. an EpochWriter
+        """
+        if format_type not in INCREMENTAL_FORMATS:
+            raise ValueError(f"Format {format_type} cannot be parsed incrementally")
+        self.format_type = format_type
+        self.sink = sink
+        self.epochs = 0
+        self.invalid_lines = 0
+        self._remainder = b''
+        self._nmea = NmeaEpochParser() if format_type == 'nmea' else None
+        self._xyz = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # XYZProcessor holds a pyproj transformer; it is recreated on demand
+        state['_xyz'] = None
+        return state
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse all complete lines of the data received so far"""
+        data = self._remainder + chunk
+        end = data.rfind(b'\n') + 1
+        self._remainder = data[end:]
+        if end:
+            self._parse(data[:end])
+
+    def finish(self) -> None:
+        """Parse the trailing partial line and flush buffered epochs"""
+        if self._remainder:
+            self._parse(self._remainder + b'\n')
+            self._remainder = b''
+        if self._nmea is not None:
+            for batch in self._nmea.close():
+                self._append(batch)
+            self.invalid_lines = self._nmea.skipped
+
+    def _parse(self, block: bytes) -> None:
+        if self._nmea is not None:
+            lines = block.decode('ascii', errors='replace').splitlines()
+            for batch in self._nmea.feed(lines):
+                self._append(batch)
+            self.invalid_lines = self._nmea.skipped
+            return
+
+        if self._xyz is None:
+            from .xyz_processor import XYZProcessor
+
+            self._xyz = XYZProcessor()
+        data, invalid_lines = self._xyz.parse_xyz_bytes(block)
+        self.invalid_lines += invalid_lines
+        if len(data):
+            self._append(data.rename(EPOCH_COLUMN_NAMES))
+
+    def _append(self, batch: EpochBatch) -> None:
+        self.sink.append(batch)
+        self.epochs += len(batch)
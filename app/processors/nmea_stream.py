@@ -0,0 +1,225 @@
+import datetime
+import logging
+import numpy as np
+import pynmea2
+from typing import Iterable, Iterator, List, Optional, Union
+from .epochs import EpochBatch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB
+DEFAULT_BATCH_SIZE = 65536    # epochs per emitted batch
+
+
+def iter_lines(source: Union[Iterable, object], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Yield complete text lines from a file object or an iterator of chunks.
+
+    Args:
+        source: Binary or text file object with read(), or an iterable of
+            str/bytes chunks (which need not end on line boundaries)
+        chunk_size: Number of bytes/characters requested per read()
+
+    Yields:
+        Lines without trailing newline characters
+    """
+    if hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = iter(source)
+
+    remainder = ''
+    for chunk in chunks:
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = bytes(chunk).decode('ascii', errors='replace')
+        if not chunk:
+            continue
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    if remainder:
+        yield remainder.rstrip('\r')
+
+
+def checksums_ok(lines: List[str]) -> np.ndarray:
+    """Validate NMEA checksums for a batch of sentences in one vectorised pass.
+
+    Sentences without a checksum field are accepted, as pynmea2 does.
+
+    Returns:
+        Boolean mask, True where the checksum matches or is absent
+    """
+    mask = np.ones(len(lines), dtype=bool)
+    bodies = []
+    expected = []
+    index = []
+    for i, line in enumerate(lines):
+        star = line.rfind('*')
+        if star < 0:
+            continue
+        try:
+            expected.append(int(line[star + 1:star + 3], 16))
+        except ValueError:
+            mask[i] = False
+            continue
+        bodies.append(line[1:star])
+        index.append(i)
+
+    if bodies:
+        lengths = np.fromiter((len(b) for b in bodies), dtype=np.int64, count=len(bodies))
+        buf = np.frombuffer(''.join(bodies).encode('ascii', errors='replace'), dtype=np.uint8)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        # reduceat returns the element at the offset for empty segments, so mask those
+        nonempty = lengths > 0
+        actual = np.zeros(len(bodies), dtype=np.uint8)
+        if nonempty.any():
+            actual[nonempty] = np.bitwise_xor.reduceat(buf, offsets[nonempty])
+        mask[np.asarray(index)] = actual == np.asarray(expected, dtype=np.uint8)
+    return mask
+
+
+class NmeaEpochParser:
+    """Incremental NMEA parser producing columnar batches of GGA fixes.
+
+    GGA sentences are selected by sentence type (any talker: GP, GN, GL, ...)
+    and checksum before being handed to pynmea2. The UTC date is recovered
+    from RMC and ZDA sentences; GGA only carries the time of day, so day
+    rollovers between date sentences are detected from the time going
+    backwards. Fixes logged before the first date sentence are dated once it
+    arrives, falling back to the current UTC date if none is found within a
+    batch.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.date: Optional[datetime.date] = None
+        self.last_seconds: Optional[float] = None
+        self.skipped = 0
+        self._fallback_warned = False
+        # GGA, RMC and ZDA sentences awaiting checksum validation, in input order
+        self._pending: List[str] = []
+        self._rows: List[tuple] = []
+
+    def parse(self, lines: Iterable[str]) -> Iterator[EpochBatch]:
+        """Parse lines and yield batches of epochs.
+
+        Memory is bounded by batch_size regardless of the input length.
+        """
+        yield from self.feed(lines)
+        yield from self.close()
+
+    def feed(self, lines: Iterable[str]) -> Iterator[EpochBatch]:
+        """Parse more lines, yielding only full batches (state is kept for the next call)"""
+        for line in lines:
+            if len(line) < 6 or line[0] != '$':
+                continue
+            sentence = line[3:6]
+            if sentence == 'GGA' or sentence == 'RMC' or sentence == 'ZDA':
+                self._pending.append(line)
+                if len(self._pending) >= self.batch_size:
+                    yield from self._drain()
+
+    def close(self) -> Iterator[EpochBatch]:
+        """Yield the fixes still buffered at the end of the input"""
+        if self._pending:
+            yield from self._drain()
+        if self._rows:
+            yield self._flush()
+
+    def _update_date(self, line: str) -> None:
+        fields = line.split('*', 1)[0].split(',')
+        try:
+            if line[3:6] == 'RMC':
+                ddmmyy = fields[9]
+                date = datetime.date(2000 + int(ddmmyy[4:6]), int(ddmmyy[2:4]), int(ddmmyy[0:2]))
+            else:
+                date = datetime.date(int(fields[4]), int(fields[3]), int(fields[2]))
+            hhmmss = fields[1]
+            seconds = int(hhmmss[0:2]) * 3600 + int(hhmmss[2:4]) * 60 + float(hhmmss[4:])
+        except (IndexError, ValueError):
+            return
+
+        if self.date is None and self._rows:
+            # Fixes seen before the first date sentence; a time of day well after
+            # this sentence means the fix was logged before midnight
+            for i, row in enumerate(self._rows):
+                if row[0] is None:
+                    offset = -1 if row[1] - seconds > 43200 else 0
+                    self._rows[i] = (date + datetime.timedelta(days=offset),) + row[1:]
+        self.date = date
+        # The date holds at this sentence's time of day, so a later fix more than
+        # 12 h earlier in the day is after midnight (GGA often precedes RMC)
+        self.last_seconds = seconds
+
+    def _drain(self) -> Iterator[EpochBatch]:
+        lines = self._pending
+        self._pending = []
+        valid = checksums_ok(lines)
+
+        for line, ok in zip(lines, valid):
+            if not ok:
+                self.skipped += 1
+                continue
+            if line[3:6] != 'GGA':
+                self._update_date(line)
+                continue
+            try:
+                msg = pynmea2.parse(line)
+            except pynmea2.ParseError:
+                self.skipped += 1
+                continue
+            # pynmea2 computes fields on attribute access, so read each one once
+            quality = msg.gps_qual
+            timestamp = msg.timestamp
+            altitude = msg.altitude
+            if not quality or timestamp is None or altitude is None:
+                continue
+            seconds = timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second + timestamp.microsecond * 1e-6
+
+            if self.date is not None and self.last_seconds is not None and seconds < self.last_seconds - 43200:
+                # Midnight passed without a new date sentence
+                self.date += datetime.timedelta(days=1)
+            self.last_seconds = seconds
+
+            hdop = msg.horizontal_dil
+            num_sats = msg.num_sats
+            age = msg.age_gps_data
+            self._rows.append((
+                self.date,
+                seconds,
+                msg.latitude,
+                msg.longitude,
+                altitude,
+                float(hdop) if hdop else np.nan,
+                int(num_sats) if num_sats else 0,
+                quality,
+                float(age) if age else np.nan
+            ))
+            if len(self._rows) >= self.batch_size:
+                yield self._flush()
+
+    def _flush(self) -> EpochBatch:
+        dates, seconds, lat, lon, alt, hdop, sats, quality, age = zip(*self._rows)
+        self._rows = []
+
+        if dates[0] is None or dates[-1] is None:
+            if not self._fallback_warned:
+                logger.warning("No RMC/ZDA date found for GGA fixes, using current UTC date")
+                self._fallback_warned = True
+            today = datetime.datetime.utcnow().date()
+            dates = [today if date is None else date for date in dates]
+            if self.date is None:
+                self.date = today
+
+        timestamps = (np.array(dates, dtype='datetime64[D]').astype('datetime64[ns]')
+                      + (np.array(seconds) * 1e9).round().astype('timedelta64[ns]'))
+        return EpochBatch(
+            timestamps,
+            np.array(lat, dtype=np.float64),
+            np.array(lon, dtype=np.float64),
+            np.array(alt, dtype=np.float64),
+            hdop=np.array(hdop, dtype=np.float64),
+            satellites=np.array(sats, dtype=np.int16),
+            quality=np.array(quality, dtype=np.int8),
+            age=np.array(age, dtype=np.float64)
+        )
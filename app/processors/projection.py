@@ -0,0 +1,87 @@
+import threading
+from typing import TYPE_CHECKING, Dict, Tuple
+
+if TYPE_CHECKING:
+    from pyproj import Geod, Transformer
+
+# Common coordinate reference systems
+WGS84 = "EPSG:4326"
+WGS84_3D = "EPSG:4979"
+ECEF = "EPSG:4978"
+
+_transformers: Dict[Tuple[str, str], 'Transformer'] = {}
+_transformers_lock = threading.Lock()
+_geod = None
+
+
+def get_transformer(crs_from: str, crs_to: str) -> 'Transformer':
+    """Return a cached pyproj Transformer for a CRS pair.
+
+    Transformers are expensive to build, so they are created once per
+    process and shared by all its threads (pyproj transformers are thread
+    safe since 3.1), which also makes the ones built by the preloading
+    master available to every worker thread. pyproj itself is imported on
+    first use, which keeps it out of application startup.
+
+    Args:
+        crs_from: Source CRS (e.g. "EPSG:4326")
+        crs_to: Target CRS
+
+    Returns:
+        Transformer with always_xy axis order
+    """
+    key = (crs_from, crs_to)
+    transformer = _transformers.get(key)
+    if transformer is None:
+        with _transformers_lock:
+            transformer = _transformers.get(key)
+            if transformer is None:
+                from pyproj import Transformer
+
+                transformer = _transformers[key] = Transformer.from_crs(crs_from, crs_to, always_xy=True)
+    return transformer
+
+
+def get_geod() -> 'Geod':
+    """Return the shared WGS84 ellipsoid for geodesic distances"""
+    global _geod
+    if _geod is None:
+        from pyproj import Geod
+
+        _geod = Geod(ellps='WGS84')
+    return _geod
+
+
+def utm_zone(latitude: float, longitude: float) -> Tuple[int, bool]:
+    """Return the UTM zone number and hemisphere for a position.
+
+    Args:
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+
+    Returns:
+        Tuple of (zone number, True if northern hemisphere)
+    """
+    longitude = (longitude + 180.0) % 360.0 - 180.0
+    zone = int((longitude + 180.0) // 6.0) + 1
+
+    # Norway and Svalbard exceptions
+    if 56.0 <= latitude < 64.0 and 3.0 <= longitude < 12.0:
+        zone = 32
+    elif 72.0 <= latitude < 84.0 and longitude >= 0.0:
+        if longitude < 9.0:
+            zone = 31
+        elif longitude < 21.0:
+            zone = 33
+        elif longitude < 33.0:
+            zone = 35
+        elif longitude < 42.0:
+            zone = 37
+
+    return min(max(zone, 1), 60), latitude >= 0.0
+
+
+def utm_crs(latitude: float, longitude: float) -> str:
+    """Return the WGS84 UTM CRS code covering a position (e.g. "EPSG:32633")"""
+    zone, north = utm_zone(latitude, longitude)
+    return f"EPSG:{(32600 if north else 32700) + zone}"
@@ -0,0 +1,323 @@
+"""Block-wise loading of RINEX observation files.
+
+Loading a whole high-rate observation file with georinex decodes every
+observable of every constellation into one in-memory xarray Dataset.
+Positioning only needs GPS pseudoranges, so the file is split into time
+blocks in one sequential pass: epoch records are copied, under the
+original header, into a temporary file per block, and georinex decodes
+each block file with its use/meas selectors. Memory stays bounded by the
+block length and the text is read once, whereas loading each block with
+georinex's tlim re-reads every earlier epoch. Compressed (gzip, Hatanaka)
+files, which cannot be split as text, are decoded once and sliced by time.
+
+Decoded blocks can be cached as NetCDF files in a directory per source
+file, so a second analysis of the same file skips the text parse. With a
+size limit the least recently used directories are evicted, as for the
+parsed epoch cache.
+
+georinex and xarray are imported on first use; they are only needed by
+jobs that process RINEX.
+"""
+import logging
+import math
+import os
+import shutil
+import tempfile
+import uuid
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .rinex_spp import L1_CODES, L2_CODES
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SECONDS = 3600
+
+# Observables decoded for positioning; georinex drops codes absent from the file
+PSEUDORANGE_CODES = list(L1_CODES + L2_CODES)
+
+# Epoch flags of records holding observations (0 ok, 1 power failure, 6 cycle slips)
+_OBSERVATION_FLAGS = (0, 1, 6)
+
+
+def read_header(f: BinaryIO) -> Tuple[List[bytes], float, int]:
+    """Read a plain text observation header.
+
+    Returns:
+        Tuple of (header lines, RINEX version, number of observation types
+        per satellite, used to count RINEX 2 observation lines)
+
+    Raises:
+        ValueError: If the file is not a plain text RINEX observation file
+    """
+    lines = []
+    version = None
+    n_types = 0
+    for line in f:
+        lines.append(line)
+        label = line[60:80].decode('ascii', 'replace').strip()
+        if label == 'RINEX VERSION / TYPE':
+            if line[20:21] != b'O':
+                raise ValueError('Not a RINEX observation file')
+            version = float(line[:9])
+        elif label == '# / TYPES OF OBSERV' and line[:6].strip():
+            n_types = int(line[:6])
+        elif label == 'END OF HEADER':
+            break
+        if version is None:
+            raise ValueError('Not a plain text RINEX file')
+    if version is None or lines[-1][60:73] != b'END OF HEADER':
+        raise ValueError('Incomplete RINEX header')
+    return lines, version, n_types
+
+
+def _epoch_time(line: bytes, version: float) -> Optional[np.datetime64]:
+    """Time of an epoch record header line; None if left blank (event records)"""
+    if version >= 3:
+        fields = line[2:29].split()
+    else:
+        fields = line[1:26].split()
+    if len(fields) < 6:
+        return None
+    year, month, day, hour, minute = (int(value) for value in fields[:5])
+    if version < 3:
+        year += 2000 if year < 80 else 1900
+    seconds = float(fields[5])
+    return (np.datetime64(f'{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}', 'ns')
+            + np.timedelta64(int(round(seconds * 1e9)), 'ns'))
+
+
+def iter_epoch_records(f: BinaryIO, version: float,
+                       n_types: int) -> Iterator[Tuple[Optional[np.datetime64], List[bytes]]]:
+    """Yield (epoch time, record lines) for the records following the header"""
+    lines_per_satellite = math.ceil(n_types / 5) if version < 3 else 1
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            if version >= 3:
+                if line[:1] != b'>':
+                    raise ValueError(f'Expected an epoch record: {line[:40]!r}')
+                flag, count = int(line[31:32]), int(line[32:35])
+            else:
+                flag, count = int(line[28:29]), int(line[29:32])
+            time = _epoch_time(line, version)
+        except ValueError as e:
+            raise ValueError(f'Invalid RINEX epoch record: {str(e)}')
+
+        follow = count
+        if flag in _OBSERVATION_FLAGS:
+            follow = count * lines_per_satellite
+            if version < 3:
+                # Satellite list continuation lines (12 satellites per line)
+                follow += max(math.ceil(count / 12) - 1, 0)
+        record = [line]
+        for _ in range(follow):
+            record.append(next(f, b''))
+        yield time, record
+
+
+def split_blocks(rinex_file: str, block_seconds: float, folder: str,
+                 progress: Optional[Callable[[float], None]] = None) -> Iterator[str]:
+    """Split an observation file into block files of block_seconds in one pass.
+
+    Blocks are aligned to the first epoch. Each block file holds the original
+    header followed by the block's records; it is yielded once complete and
+    may be removed by the caller.
+
+    Raises:
+        ValueError: If the file is not a plain text RINEX observation file
+    """
+    size = os.path.getsize(rinex_file) or 1
+    suffix = ''.join(os.path.basename(rinex_file).partition('.')[1:])
+    step = np.timedelta64(int(block_seconds * 1e9), 'ns')
+    with open(rinex_file, 'rb') as f:
+        header, version, n_types = read_header(f)
+        first = None
+        index = None
+        out = None
+        path = None
+        try:
+            for time, record in iter_epoch_records(f, version, n_types):
+                if time is not None:
+                    if first is None:
+                        first = time
+                    block = int((time - first) // step)
+                    if block != index:
+                        if out is not None:
+                            out.close()
+                            out = None
+                            if progress is not None:
+                                progress(f.tell() / size)
+                            yield path
+                        index = block
+                        path = os.path.join(folder, f'block_{index:05d}{suffix}')
+                        out = open(path, 'wb')
+                        out.writelines(header)
+                if out is not None:
+                    out.writelines(record)
+            if out is not None:
+                out.close()
+                out = None
+                if progress is not None:
+                    progress(1.0)
+                yield path
+        finally:
+            if out is not None:
+                out.close()
+
+
+def _load_sliced(rinex_file: str, block_seconds: float) -> Iterator['xr.Dataset']:
+    """Decode a whole (compressed) file once and yield it in time blocks"""
+    import georinex as gr
+
+    obs = gr.load(rinex_file, use='G', meas=PSEUDORANGE_CODES)
+    if obs is None or obs.sizes.get('time', 0) == 0:
+        return
+    times = obs['time'].values
+    blocks = ((times - times[0]) // np.timedelta64(int(block_seconds * 1e9), 'ns')).astype(np.int64)
+    for start, stop in zip(*_runs(blocks)):
+        yield obs.isel(time=slice(start, stop))
+
+
+def _runs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and stop indices of runs of equal values"""
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
+    return starts, np.append(starts[1:], len(values))
+
+
+def _read_cached_blocks(cache_dir: str, progress: Optional[Callable[[float], None]] = None
+                        ) -> Iterator['xr.Dataset']:
+    import xarray as xr
+
+    names = sorted(name for name in os.listdir(cache_dir) if name.endswith('.nc'))
+    for index, name in enumerate(names):
+        with xr.open_dataset(os.path.join(cache_dir, name)) as block:
+            block = block.load()
+        if progress is not None:
+            progress((index + 1) / len(names))
+        yield block
+
+
+def _directory_size(path: str) -> int:
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    except OSError:
+        return 0
+
+
+def evict_cache(cache_root: str, max_bytes: int, keep: Optional[str] = None) -> None:
+    """Remove least recently used block directories until cache_root fits in max_bytes
+
+    Args:
+        cache_root: Folder holding one directory of decoded blocks per file
+        max_bytes: Total size to shrink the cache to
+        keep: Optional directory name that is never evicted
+    """
+    entries = []
+    for entry in os.scandir(cache_root):
+        if not entry.is_dir() or entry.name.endswith('.tmp'):
+            continue
+        try:
+            used = entry.stat().st_mtime
+        except OSError:
+            continue
+        entries.append((used, entry.name, _directory_size(entry.path)))
+
+    total = sum(size for _, _, size in entries)
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_root, name), ignore_errors=True)
+        total -= size
+        logger.info(f"Evicted decoded RINEX blocks {name} ({size} bytes)")
+
+
+def iter_observation_blocks(rinex_file: str, block_seconds: float = DEFAULT_BLOCK_SECONDS,
+                            cache_dir: Optional[str] = None,
+                            progress: Optional[Callable[[float], None]] = None,
+                            cache_max_bytes: Optional[int] = None) -> Iterator['xr.Dataset']:
+    """Yield GPS pseudorange observations one time block at a time.
+
+    Args:
+        rinex_file: RINEX observation file
+        block_seconds: Length of each block
+        cache_dir: Optional directory holding (or receiving) the decoded
+            blocks as NetCDF; it is only published once all blocks are written
+        progress: Optional callable receiving the fraction of the file decoded
+        cache_max_bytes: Optional size of the folder holding cache_dir above
+            which the least recently used block directories are evicted
+
+    Yields:
+        georinex observation datasets restricted to GPS and PSEUDORANGE_CODES
+    """
+    if cache_dir and os.path.isdir(cache_dir):
+        logger.info(f"Reading decoded RINEX blocks from {cache_dir}")
+        if cache_max_bytes is not None:
+            try:
+                os.utime(cache_dir)
+            except OSError:
+                pass
+        yield from _read_cached_blocks(cache_dir, progress)
+        return
+
+    tmp_dir = None
+    if cache_dir:
+        tmp_dir = f'{cache_dir}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(tmp_dir)
+
+    try:
+        for index, block in enumerate(_decode_blocks(rinex_file, block_seconds, progress)):
+            if block is None or block.sizes.get('time', 0) == 0:
+                continue
+            if tmp_dir:
+                try:
+                    block.to_netcdf(os.path.join(tmp_dir, f'block_{index:05d}.nc'))
+                except Exception as e:
+                    logger.warning(f"Could not cache decoded RINEX block: {str(e)}")
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    tmp_dir = None
+            yield block
+
+        if tmp_dir:
+            try:
+                os.rename(tmp_dir, cache_dir)
+                tmp_dir = None
+            except OSError:
+                # Another worker published the same file first
+                pass
+            if cache_max_bytes is not None:
+                cache_root, name = os.path.split(os.path.normpath(cache_dir))
+                evict_cache(cache_root, cache_max_bytes, keep=name)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _decode_blocks(rinex_file: str, block_seconds: float,
+                   progress: Optional[Callable[[float], None]] = None) -> Iterator[Optional['xr.Dataset']]:
+    """Decode the GPS pseudoranges of each time block"""
+    import georinex as gr
+
+    try:
+        with open(rinex_file, 'rb') as f:
+            read_header(f)
+    except ValueError as e:
+        logger.info(f"Decoding {rinex_file} at once ({str(e)})")
+        yield from _load_sliced(rinex_file, block_seconds)
+        if progress is not None:
+            progress(1.0)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='rinex-blocks-') as folder:
+        for path in split_blocks(rinex_file, block_seconds, folder, progress):
+            try:
+                yield gr.load(path, use='G', meas=PSEUDORANGE_CODES)
+            finally:
+                os.remove(path)
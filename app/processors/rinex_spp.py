@@ -0,0 +1,318 @@
+"""GPS single point positioning from RINEX pseudoranges.
+
+Satellite positions are computed from broadcast ephemerides (IS-GPS-200
+Keplerian model) for every (epoch, satellite) pair at once, and the
+receiver position and clock are solved by iterated least squares on all
+epochs simultaneously: the per-epoch 4x4 normal equations are stacked and
+solved with a single batched np.linalg.solve call.
+
+The module works on plain NumPy arrays; georinex datasets are converted
+with Ephemerides.from_dataset() and observation_arrays().
+"""
+import logging
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SPEED_OF_LIGHT = 299792458.0
+GM = 3.986005e14                # WGS-84 gravitational constant (m^3/s^2)
+OMEGA_E = 7.2921151467e-5       # WGS-84 Earth rotation rate (rad/s)
+RELATIVISTIC_F = -4.442807633e-10
+SECONDS_PER_WEEK = 604800.0
+GPS_EPOCH = np.datetime64('1980-01-06T00:00:00', 'ns')
+
+# Ignore ephemerides further than this from the epoch (validity is +-2h around toe)
+MAX_EPHEMERIS_AGE = 7200.0 + 300.0
+
+# georinex navigation variables used by the orbit model
+EPHEMERIS_FIELDS = (
+    'SVclockBias', 'SVclockDrift', 'SVclockDriftRate', 'Crs', 'DeltaN', 'M0',
+    'Cuc', 'Eccentricity', 'Cus', 'sqrtA', 'Toe', 'Cic', 'Omega0', 'Cis', 'Io',
+    'Crc', 'omega', 'OmegaDot', 'IDOT', 'GPSWeek', 'TGD'
+)
+
+# Observation codes by preference (RINEX 3 first, then RINEX 2)
+L1_CODES = ('C1C', 'C1W', 'C1P', 'C1X', 'P1', 'C1')
+L2_CODES = ('C2W', 'C2P', 'C2L', 'C2X', 'C2S', 'P2', 'C2')
+
+# L1/L2 frequencies for the ionosphere-free combination
+F1 = 1575.42e6
+F2 = 1227.60e6
+
+
+def gps_seconds(times) -> np.ndarray:
+    """Seconds since the GPS epoch for datetime64 values (in GPS time)"""
+    times = np.asarray(times).astype('datetime64[ns]')
+    return (times - GPS_EPOCH).astype(np.int64) * 1e-9
+
+
+class Ephemerides:
+    """Broadcast ephemeris records, searchable by satellite and time.
+
+    Records are kept flat and sorted by (satellite, toc) so the record for
+    any array of (satellite, time) queries is found with one searchsorted.
+    """
+
+    def __init__(self, sv: Sequence[str], toc: np.ndarray, fields: Dict[str, np.ndarray]):
+        """
+        Args:
+            sv: Satellite id of each record (e.g. 'G05')
+            toc: Clock reference time of each record in GPS seconds
+            fields: EPHEMERIS_FIELDS arrays, one value per record
+        """
+        sv = np.asarray(sv)
+        self.satellites, sv_index = np.unique(sv, return_inverse=True)
+        toc = np.asarray(toc, dtype=np.float64)
+        order = np.lexsort((toc, sv_index))
+        self.sv_index = sv_index[order]
+        self.toc = toc[order]
+        self.fields = {name: np.asarray(fields[name], dtype=np.float64)[order] for name in EPHEMERIS_FIELDS}
+        # Satellite index dominates the sort key, time orders within a satellite
+        self._stride = 10.0 ** np.ceil(np.log10(max(np.abs(self.toc).max(initial=1.0), 1.0) * 10))
+        self._keys = self.sv_index * self._stride + self.toc
+
+    def __len__(self):
+        return len(self.toc)
+
+    @classmethod
+    def from_dataset(cls, nav) -> 'Ephemerides':
+        """Build from a georinex navigation dataset (dims time x sv), GPS only
+
+        Raises:
+            ValueError: If fields are missing or there is no GPS ephemeris
+        """
+        missing = [name for name in EPHEMERIS_FIELDS if name not in nav]
+        if missing:
+            raise ValueError(f"Navigation data lacks fields: {', '.join(missing)}")
+        sv = np.asarray(nav['sv'].values).astype(str)
+        is_gps = np.char.startswith(sv, 'G')
+        toc = gps_seconds(nav['time'].values)
+
+        values = {name: np.asarray(nav[name].values, dtype=np.float64)[:, is_gps] for name in EPHEMERIS_FIELDS}
+        present = np.isfinite(values['sqrtA']) & np.isfinite(values['Toe'])
+        time_index, sv_index = np.nonzero(present)
+        if not len(time_index):
+            raise ValueError("Navigation data has no GPS ephemerides")
+        return cls(
+            sv[is_gps][sv_index],
+            toc[time_index],
+            {name: array[time_index, sv_index] for name, array in values.items()}
+        )
+
+    def select(self, satellites: Sequence[str], t: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Pick the record closest in time for every (epoch, satellite) pair.
+
+        Args:
+            satellites: Satellite ids of the observation columns
+            t: Epoch times in GPS seconds, shape (n_epochs,)
+
+        Returns:
+            (fields, valid): field arrays of shape (n_epochs, n_satellites)
+            and a mask of pairs that have a usable ephemeris
+        """
+        t = np.asarray(t, dtype=np.float64)[:, None]
+        column_index = np.searchsorted(self.satellites, np.asarray(satellites))
+        column_index = np.minimum(column_index, len(self.satellites) - 1)
+        known = self.satellites[column_index] == np.asarray(satellites)
+
+        keys = column_index[None, :] * self._stride + t
+        upper = np.clip(np.searchsorted(self._keys, keys), 0, len(self._keys) - 1)
+        lower = np.maximum(upper - 1, 0)
+        # Choose whichever neighbour belongs to the satellite and is closest in time
+        candidates = np.stack((lower, upper))
+        same_sv = self.sv_index[candidates] == column_index[None, None, :]
+        age = np.where(same_sv, np.abs(self.toc[candidates] - t[None]), np.inf)
+        best = np.take_along_axis(candidates, np.argmin(age, axis=0)[None], axis=0)[0]
+        valid = known[None, :] & (np.min(age, axis=0) <= MAX_EPHEMERIS_AGE)
+
+        fields = {name: values[best] for name, values in self.fields.items()}
+        fields['toc'] = self.toc[best]
+        return fields, valid
+
+
+def satellite_positions(eph: Dict[str, np.ndarray], t: np.ndarray,
+                        include_tgd: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ECEF satellite positions and clock offsets at transmit times.
+
+    Args:
+        eph: Ephemeris fields (as returned by Ephemerides.select), any shape
+        t: Transmit times in GPS seconds, broadcastable to the field shape
+        include_tgd: Apply the L1 group delay (not used for iono-free ranges)
+
+    Returns:
+        (x, y, z, clock) with the clock offset in seconds, including the
+        relativistic correction
+    """
+    a = eph['sqrtA'] ** 2
+    e = eph['Eccentricity']
+    toe = eph['GPSWeek'] * SECONDS_PER_WEEK + eph['Toe']
+    tk = t - toe
+
+    mean_motion = np.sqrt(GM / a ** 3) + eph['DeltaN']
+    mean_anomaly = eph['M0'] + mean_motion * tk
+    eccentric = mean_anomaly
+    for _ in range(10):
+        eccentric = mean_anomaly + e * np.sin(eccentric)
+    sin_e = np.sin(eccentric)
+    cos_e = np.cos(eccentric)
+
+    true_anomaly = np.arctan2(np.sqrt(1 - e * e) * sin_e, cos_e - e)
+    phi = true_anomaly + eph['omega']
+    sin_2phi = np.sin(2 * phi)
+    cos_2phi = np.cos(2 * phi)
+    u = phi + eph['Cus'] * sin_2phi + eph['Cuc'] * cos_2phi
+    r = a * (1 - e * cos_e) + eph['Crs'] * sin_2phi + eph['Crc'] * cos_2phi
+    inclination = eph['Io'] + eph['IDOT'] * tk + eph['Cis'] * sin_2phi + eph['Cic'] * cos_2phi
+
+    x_orbit = r * np.cos(u)
+    y_orbit = r * np.sin(u)
+    node = eph['Omega0'] + (eph['OmegaDot'] - OMEGA_E) * tk - OMEGA_E * eph['Toe']
+    cos_node = np.cos(node)
+    sin_node = np.sin(node)
+    cos_i = np.cos(inclination)
+    x = x_orbit * cos_node - y_orbit * cos_i * sin_node
+    y = x_orbit * sin_node + y_orbit * cos_i * cos_node
+    z = y_orbit * np.sin(inclination)
+
+    dt = t - eph['toc']
+    clock = (eph['SVclockBias'] + eph['SVclockDrift'] * dt + eph['SVclockDriftRate'] * dt * dt
+             + RELATIVISTIC_F * e * eph['sqrtA'] * sin_e)
+    if include_tgd:
+        clock = clock - np.nan_to_num(eph['TGD'])
+    return x, y, z, clock
+
+
+def observation_arrays(obs) -> Tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+    """Extract GPS pseudoranges from a georinex observation dataset.
+
+    Uses the ionosphere-free L1/L2 combination where both codes are present,
+    and L1 alone otherwise.
+
+    Returns:
+        (times, satellites, pseudoranges, iono_free) with pseudoranges of
+        shape (n_epochs, n_satellites), NaN where missing
+    """
+    sv = np.asarray(obs['sv'].values).astype(str)
+    is_gps = np.char.startswith(sv, 'G')
+    l1_code = next((code for code in L1_CODES if code in obs), None)
+    if l1_code is None:
+        raise ValueError("No L1 pseudorange observable found")
+    p1 = np.asarray(obs[l1_code].values, dtype=np.float64)[:, is_gps]
+
+    l2_code = next((code for code in L2_CODES if code in obs), None)
+    iono_free = False
+    if l2_code is not None:
+        p2 = np.asarray(obs[l2_code].values, dtype=np.float64)[:, is_gps]
+        combined = (F1 ** 2 * p1 - F2 ** 2 * p2) / (F1 ** 2 - F2 ** 2)
+        # Fall back to L1 per observation when L2 is missing
+        pseudoranges = np.where(np.isfinite(combined), combined, p1)
+        iono_free = bool(np.isfinite(combined).any())
+    else:
+        pseudoranges = p1
+    return np.asarray(obs['time'].values), sv[is_gps], pseudoranges, iono_free
+
+
+def _troposphere_delay(elevation: np.ndarray) -> np.ndarray:
+    """Simple zenith delay mapped with 1/sin(elevation) (metres)"""
+    return 2.47 / (np.sin(elevation) + 0.0121)
+
+
+def solve_positions(times, satellites: Sequence[str], pseudoranges: np.ndarray, ephemerides: Ephemerides,
+                    approx_position: Optional[Iterable[float]] = None, elevation_mask: float = 10.0,
+                    iono_free: bool = False, max_iterations: int = 10) -> Dict[str, np.ndarray]:
+    """Solve receiver position and clock for all epochs at once.
+
+    Args:
+        times: Receiver epochs (datetime64, GPS time), shape (n_epochs,)
+        satellites: Satellite id per pseudorange column
+        pseudoranges: Code ranges in metres, shape (n_epochs, n_satellites), NaN if missing
+        ephemerides: Broadcast ephemerides covering the epochs
+        approx_position: Optional ECEF start position (e.g. from the RINEX header)
+        elevation_mask: Minimum satellite elevation in degrees
+        iono_free: Ranges are the L1/L2 ionosphere-free combination (no TGD)
+        max_iterations: Least-squares iteration limit
+
+    Returns:
+        Dict of per-epoch columns: timestamp, x, y, z, clock_bias (m),
+        num_satellites, pdop and valid (at least four satellites used)
+    """
+    times = np.asarray(times).astype('datetime64[ns]')
+    pseudoranges = np.asarray(pseudoranges, dtype=np.float64)
+    n_epochs = len(times)
+    t_rx = gps_seconds(times)[:, None]
+
+    eph, usable = ephemerides.select(satellites, t_rx[:, 0])
+    usable &= np.isfinite(pseudoranges)
+    ranges = np.where(usable, pseudoranges, 0.0)
+
+    state = np.zeros((n_epochs, 4))
+    if approx_position is not None and np.any(approx_position):
+        state[:, :3] = np.asarray(list(approx_position), dtype=np.float64)
+
+    # Satellite clock and position at transmit time, refined once with the clock
+    t_tx = t_rx - ranges / SPEED_OF_LIGHT
+    _, _, _, sat_clock = satellite_positions(eph, t_tx, include_tgd=not iono_free)
+    t_tx = t_tx - sat_clock
+    sat_x, sat_y, sat_z, sat_clock = satellite_positions(eph, t_tx, include_tgd=not iono_free)
+    # Earth rotation during signal travel (Sagnac), applied in the ECEF frame at reception
+    theta = OMEGA_E * (t_rx - t_tx)
+    sat_x, sat_y = sat_x * np.cos(theta) + sat_y * np.sin(theta), -sat_x * np.sin(theta) + sat_y * np.cos(theta)
+    corrected = ranges + SPEED_OF_LIGHT * sat_clock
+
+    mask = np.radians(elevation_mask)
+    weights = usable.astype(np.float64)
+    normal = np.zeros((n_epochs, 4, 4))
+    for iteration in range(max_iterations):
+        dx = sat_x - state[:, 0:1]
+        dy = sat_y - state[:, 1:2]
+        dz = sat_z - state[:, 2:3]
+        geometric = np.sqrt(dx * dx + dy * dy + dz * dz)
+        geometric = np.where(geometric > 0, geometric, 1.0)
+
+        predicted = geometric + state[:, 3:4]
+        radius = np.linalg.norm(state[:, :3], axis=1, keepdims=True)
+        located = radius > 6.0e6
+        if iteration > 0:
+            # Geocentric up vector is close enough for masking and troposphere mapping
+            up = (dx * state[:, 0:1] + dy * state[:, 1:2] + dz * state[:, 2:3]) / np.where(located, radius, 1.0)
+            elevation = np.arcsin(np.clip(up / geometric, -1.0, 1.0))
+            predicted = predicted + np.where(located, _troposphere_delay(np.maximum(elevation, 0.05)), 0.0)
+            weights = (usable & (~located | (elevation >= mask))).astype(np.float64)
+
+        residual = (corrected - predicted) * weights
+        design = np.stack((-dx / geometric, -dy / geometric, -dz / geometric, np.ones_like(geometric)), axis=-1)
+        normal = np.einsum('esi,es,esj->eij', design, weights, design)
+        rhs = np.einsum('esi,es->ei', design, residual)
+
+        solvable = weights.sum(axis=1) >= 4
+        normal[~solvable] = np.eye(4)
+        rhs[~solvable] = 0.0
+        try:
+            delta = np.linalg.solve(normal, rhs[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            # Singular geometry in some epoch: solve epoch by epoch with least squares
+            delta = np.stack([np.linalg.lstsq(n, r, rcond=None)[0] for n, r in zip(normal, rhs)])
+        state += delta
+        if np.max(np.abs(delta[solvable, :3]), initial=0.0) < 1e-4:
+            break
+
+    used = weights.sum(axis=1).astype(np.int16)
+    valid = used >= 4
+    with np.errstate(invalid='ignore'):
+        cofactor = np.linalg.pinv(normal)
+        pdop = np.sqrt(np.trace(cofactor[:, :3, :3], axis1=1, axis2=2))
+    state[~valid] = np.nan
+    pdop[~valid] = np.nan
+    logger.debug(f"SPP solved {int(valid.sum())}/{n_epochs} epochs")
+    return {
+        'timestamp': times,
+        'x': state[:, 0],
+        'y': state[:, 1],
+        'z': state[:, 2],
+        'clock_bias': state[:, 3],
+        'num_satellites': used,
+        'pdop': pdop,
+        'valid': valid
+    }
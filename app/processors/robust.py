@@ -0,0 +1,125 @@
+import numpy as np
+from typing import Dict, Tuple
+
+# Scale factor making the median absolute deviation a consistent estimate of sigma
+MAD_SCALE = 1.4826
+# Floor for robust scales (metres), so data quantised to millimetres never has a zero scale
+MIN_SCALE = 0.001
+
+REFERENCE_ESTIMATORS = ('mean', 'median', 'sigma_clip', 'huber')
+
+
+def robust_scale(points: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """Per-axis sigma estimated from the median absolute deviation about center"""
+    deviations = np.abs(points - center)
+    return np.maximum(MAD_SCALE * np.median(deviations, axis=0), MIN_SCALE)
+
+
+def robust_center(points: np.ndarray, method: str = 'median', clip_sigma: float = 3.0,
+                  huber_k: float = 1.345, max_iterations: int = 10,
+                  tolerance: float = 1e-4) -> Tuple[np.ndarray, Dict]:
+    """Estimate the center of projected positions per axis.
+
+    Every method is a fixed number of linear passes (np.median selects by
+    partitioning instead of sorting), so the cost stays linear in the number
+    of points.
+
+    Args:
+        points: (n, 3) array of east, north, up in metres
+        method: 'mean', 'median', 'sigma_clip' (iterated mean of the points
+            within clip_sigma robust sigmas on every axis) or 'huber'
+            (M-estimator by iteratively reweighted means, scale fixed from the MAD)
+        clip_sigma: Clipping threshold of 'sigma_clip' in sigmas
+        huber_k: Huber tuning constant in sigmas (1.345 gives 95% efficiency
+            for normal data)
+        max_iterations: Iteration limit of 'sigma_clip' and 'huber'
+        tolerance: Center change in metres at which iterations stop
+
+    Returns:
+        Tuple of (center, info dict with 'estimator', 'iterations' and
+        'clipped' points for sigma_clip)
+    """
+    if method not in REFERENCE_ESTIMATORS:
+        raise ValueError(f"Unknown reference estimator: {method}")
+    # One contiguous row per axis, so the reductions run over contiguous memory
+    axes = np.ascontiguousarray(np.asarray(points, dtype=np.float64).T)
+    info = {'estimator': method, 'iterations': 0, 'clipped': 0}
+    if method == 'mean':
+        return axes.mean(axis=1), info
+
+    center = np.median(axes, axis=1)
+    if method == 'median':
+        return center, info
+
+    scale = np.maximum(MAD_SCALE * np.median(np.abs(axes - center[:, None]), axis=1), MIN_SCALE)
+    if method == 'sigma_clip':
+        inliers = None
+        for iteration in range(1, max_iterations + 1):
+            info['iterations'] = iteration
+            updated = np.all(np.abs(axes - center[:, None]) <= (clip_sigma * scale)[:, None], axis=0)
+            if not updated.any() or (inliers is not None and np.array_equal(updated, inliers)):
+                break
+            inliers = updated
+            selected = axes[:, inliers]
+            center = selected.mean(axis=1)
+            scale = np.maximum(selected.std(axis=1), MIN_SCALE)
+        info['clipped'] = int(len(inliers) - np.count_nonzero(inliers)) if inliers is not None else 0
+        return center, info
+
+    for iteration in range(1, max_iterations + 1):
+        info['iterations'] = iteration
+        residuals = np.abs(axes - center[:, None])
+        weights = np.minimum(1.0, (huber_k * scale)[:, None] / np.maximum(residuals, 1e-12))
+        updated = (weights * axes).sum(axis=1) / weights.sum(axis=1)
+        converged = np.max(np.abs(updated - center)) < tolerance
+        center = updated
+        if converged:
+            break
+    return center, info
+
+
+def outlier_mask(points: np.ndarray, center: np.ndarray, scale: np.ndarray, sigma: float) -> np.ndarray:
+    """Points further than sigma robust sigmas from center on any axis"""
+    return np.any(np.abs(np.asarray(points, dtype=np.float64) - center) > sigma * scale, axis=1)
+
+
+class PositionSample:
+    """Systematic sample of positions with bounded memory.
+
+    Every stride-th position is kept; when the buffer is full every other
+    kept position is dropped and the stride doubles, so the sample stays
+    spread evenly over the whole input however long it is.
+    """
+
+    def __init__(self, max_size: int = 1000000):
+        self.max_size = max(int(max_size), 2)
+        self.stride = 1
+        self.seen = 0
+        self._parts = []
+        self._size = 0
+
+    def add(self, points: np.ndarray) -> None:
+        """Add a batch of (n, 3) positions"""
+        points = np.asarray(points, dtype=np.float64)
+        first = (-self.seen) % self.stride
+        self.seen += len(points)
+        selected = points[first::self.stride]
+        if len(selected) == 0:
+            return
+        self._parts.append(selected)
+        self._size += len(selected)
+        while self._size > self.max_size:
+            merged = self.array()[::2]
+            self.stride *= 2
+            self._parts = [merged]
+            self._size = len(merged)
+
+    def array(self) -> np.ndarray:
+        if not self._parts:
+            return np.zeros((0, 3))
+        if len(self._parts) > 1:
+            self._parts = [np.concatenate(self._parts)]
+        return self._parts[0]
+
+    def __len__(self) -> int:
+        return self._size
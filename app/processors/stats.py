@@ -0,0 +1,164 @@
+import math
+import numpy as np
+from typing import Dict
+
+
+class RunningStats:
+    """Online mean/std/RMSE/min/max accumulator with constant memory.
+
+    Values are fed in batches; each batch is reduced with NumPy and merged
+    into the running moments using the parallel form of Welford's algorithm
+    (Chan et al.), so the result matches a single pass over all values.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'sum_sq', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sum_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values) -> None:
+        """Add a batch of values"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        n_b = values.size
+        if n_b == 0:
+            return
+
+        mean_b = float(values.mean())
+        m2_b = float(np.sum((values - mean_b) ** 2))
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+
+        self.sum_sq += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Merge another accumulator into this one"""
+        if other.count == 0:
+            return
+        n_a, n_b = self.count, other.count
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += other.m2 + delta * delta * n_a * n_b / n
+        self.count = n
+        self.sum_sq += other.sum_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation (same as np.std)"""
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+    @property
+    def rmse(self) -> float:
+        return math.sqrt(self.sum_sq / self.count) if self.count else math.nan
+
+    def to_dict(self) -> Dict:
+        """Return statistics in the same layout as the accuracy metrics"""
+        return {
+            'rmse': self.rmse,
+            'std': self.std,
+            'mean': self.mean if self.count else math.nan,
+            'max': self.max if self.count else math.nan,
+            'min': self.min if self.count else math.nan
+        }
+
+
+def percentiles(values, qs) -> np.ndarray:
+    """Percentiles (0-100) with linear interpolation, matching np.percentile.
+
+    Uses np.partition on the needed order statistics instead of a full sort,
+    so the cost is linear in the number of values.
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    qs = np.asarray(qs, dtype=np.float64)
+    if values.size == 0:
+        return np.full(qs.shape, np.nan)
+
+    positions = qs / 100.0 * (values.size - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, values.size - 1)
+    selected = np.partition(values, np.unique(np.concatenate((lower, upper))))
+    fraction = positions - lower
+    return selected[lower] + (selected[upper] - selected[lower]) * fraction
+
+
+def accuracy_percentiles(horizontal_errors, vertical_errors) -> Dict[str, Dict[str, float]]:
+    """CEP50/CEP95/2DRMS, vertical LE95 and 3D R95 from per-epoch errors"""
+    horizontal_errors = np.asarray(horizontal_errors, dtype=np.float64)
+    vertical_errors = np.asarray(vertical_errors, dtype=np.float64)
+    cep50, cep95 = percentiles(horizontal_errors, [50, 95])
+    return {
+        'horizontal': {
+            'cep50': float(cep50),
+            'cep95': float(cep95),
+            '2drms': 2.0 * math.sqrt(float(np.mean(horizontal_errors ** 2))) if horizontal_errors.size else math.nan
+        },
+        'vertical': {
+            'le95': float(percentiles(vertical_errors, [95])[0])
+        },
+        'r95': float(percentiles(np.hypot(horizontal_errors, vertical_errors), [95])[0])
+    }
+
+
+class QuantileSketch:
+    """Approximate quantiles of non-negative values with bounded memory.
+
+    Values are counted in logarithmic buckets, so any quantile is returned
+    with a relative error of at most `relative_accuracy`. Memory depends only
+    on the accuracy and the covered value range, not on the number of values;
+    values outside [min_value, max_value] are clamped into the end buckets.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.005, min_value: float = 1e-4, max_value: float = 1e6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        self.counts = np.zeros(math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+
+    def update(self, values) -> None:
+        """Add a batch of values"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        small = values < self.min_value
+        self.zero_count += int(np.count_nonzero(small))
+        indices = np.ceil(np.log(values[~small]) / self._log_gamma).astype(np.int64) - self._offset
+        np.clip(indices, 0, len(self.counts) - 1, out=indices)
+        self.counts += np.bincount(indices, minlength=len(self.counts))
+        self.count += values.size
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Merge a sketch created with the same parameters"""
+        self.counts += other.counts
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (0-1)"""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        index = min(index, len(self.counts) - 1)
+        # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+        return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
@@ -0,0 +1,61 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+_DONE = object()
+
+
+class StageTimer:
+    """Wall time per processing stage (read, parse, solve, project, stats, store).
+
+    Stages nest and the time is exclusive: time spent in an inner stage is
+    not counted in the outer one, so the stages add up to the timed part of
+    a run. Iterators that do work lazily (chunk readers, parsers) are timed
+    per item with iterate(), which keeps the nesting intact when one timed
+    iterator consumes another.
+    """
+
+    __slots__ = ('seconds', 'rows', '_stack', '_started')
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.rows = 0
+        self._stack = []
+        self._started = time.perf_counter()
+
+    def _enter(self) -> None:
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _exit(self, name: str) -> None:
+        started, inner = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - inner
+        if self._stack:
+            self._stack[-1][1] += elapsed
+
+    @contextmanager
+    def stage(self, name: str):
+        self._enter()
+        try:
+            yield
+        finally:
+            self._exit(name)
+
+    def iterate(self, iterable: Iterable, name: str) -> Iterator:
+        """Yield from iterable, counting the time to produce each item as stage name"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def to_dict(self) -> Dict:
+        total = time.perf_counter() - self._started
+        return {
+            'stages': {name: round(seconds, 6) for name, seconds in self.seconds.items()},
+            'total_seconds': round(total, 6),
+            'rows': self.rows,
+            'rows_per_second': self.rows / total if total > 0 else None
+        }
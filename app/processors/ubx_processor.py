@@ -0,0 +1,272 @@
+"""Bulk decoding of u-blox UBX binary logs.
+
+The log is memory mapped and scanned for frame sync bytes with NumPy.
+Frames of the wanted message types are checked (header, length and
+Fletcher checksum) for all candidates at once, then decoded by viewing the
+frame bytes through a structured dtype, so no per-frame Python code runs.
+When frames repeat at a constant stride (a receiver logging the same
+message set every epoch) the decode is a strided view over the mapped
+file; otherwise only the wanted frames are gathered.
+
+NAV-PVT supplies time, fix type and position; NAV-HPPOSLLH, when logged,
+replaces the position with its high precision version for the same epoch.
+"""
+import logging
+import mmap
+import numpy as np
+from typing import BinaryIO, Dict, Tuple, Union
+
+from .fix_quality import FIX_NONE, FIX_SINGLE, FIX_DGPS, FIX_FLOAT, FIX_FIXED
+from .epochs import EpochBatch
+
+logger = logging.getLogger(__name__)
+
+SYNC_1 = 0xB5
+SYNC_2 = 0x62
+# Sync (2), class, id, length (2) and checksum (2)
+FRAME_OVERHEAD = 8
+SCAN_BLOCK = 16 * 1024 * 1024
+CHECKSUM_ROWS = 65536
+
+NAV_PVT = (0x01, 0x07, 92)
+NAV_HPPOSLLH = (0x01, 0x14, 36)
+
+MILLISECONDS_PER_WEEK = 604800000
+
+
+def _frame_dtype(payload_length: int, fields) -> np.dtype:
+    """Structured dtype of a whole frame; field offsets are payload offsets"""
+    names, formats, offsets = zip(*fields)
+    return np.dtype({
+        'names': list(names),
+        'formats': list(formats),
+        'offsets': [6 + offset for offset in offsets],
+        'itemsize': payload_length + FRAME_OVERHEAD
+    })
+
+
+NAV_PVT_DTYPE = _frame_dtype(NAV_PVT[2], [
+    ('iTOW', '<u4', 0), ('year', '<u2', 4), ('month', 'u1', 6), ('day', 'u1', 7),
+    ('hour', 'u1', 8), ('min', 'u1', 9), ('sec', 'u1', 10), ('valid', 'u1', 11),
+    ('nano', '<i4', 16), ('fixType', 'u1', 20), ('flags', 'u1', 21), ('numSV', 'u1', 23),
+    ('lon', '<i4', 24), ('lat', '<i4', 28), ('height', '<i4', 32), ('hMSL', '<i4', 36),
+    ('hAcc', '<u4', 40), ('vAcc', '<u4', 44), ('pDOP', '<u2', 76), ('flags3', 'u1', 78)
+])
+
+NAV_HPPOSLLH_DTYPE = _frame_dtype(NAV_HPPOSLLH[2], [
+    ('flags', 'u1', 3), ('iTOW', '<u4', 4), ('lon', '<i4', 8), ('lat', '<i4', 12),
+    ('height', '<i4', 16), ('lonHp', 'i1', 24), ('latHp', 'i1', 25), ('heightHp', 'i1', 26),
+    ('hAcc', '<u4', 28), ('vAcc', '<u4', 32)
+])
+
+
+def sync_offsets(data: np.ndarray, block: int = SCAN_BLOCK) -> np.ndarray:
+    """Offsets of all 0xB5 0x62 pairs, scanned block by block to bound temporaries"""
+    found = []
+    for start in range(0, max(len(data) - 1, 0), block):
+        chunk = data[start:start + block + 1]
+        hits = np.flatnonzero(chunk[:-1] == SYNC_1)
+        hits = hits[chunk[hits + 1] == SYNC_2]
+        found.append(hits + start)
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+def extract_frames(data: np.ndarray, candidates: np.ndarray, message: Tuple[int, int, int]) -> Tuple[np.ndarray, int]:
+    """Valid frames of one fixed-length message type.
+
+    Args:
+        data: uint8 array of the whole log
+        candidates: Sync offsets from sync_offsets
+        message: (class, id, payload length)
+
+    Returns:
+        Tuple of (uint8 array of shape (frames, frame length), number of
+        frames with a matching header but a bad checksum)
+    """
+    msg_class, msg_id, length = message
+    total = length + FRAME_OVERHEAD
+    offsets = candidates[candidates + total <= len(data)]
+    offsets = offsets[(data[offsets + 2] == msg_class) & (data[offsets + 3] == msg_id)]
+    offsets = offsets[(data[offsets + 4] | data[offsets + 5].astype(np.int64) << 8) == length]
+    if len(offsets) == 0:
+        return np.zeros((0, total), dtype=np.uint8), 0
+
+    strides = np.diff(offsets)
+    if len(offsets) > 1 and np.all(strides == strides[0]) and strides[0] >= total:
+        # Constant stride: view the frames in place
+        frames = np.lib.stride_tricks.as_strided(data[offsets[0]:], shape=(len(offsets), total),
+                                                 strides=(int(strides[0]), 1), writeable=False)
+    else:
+        frames = data[offsets[:, None] + np.arange(total)]
+
+    ok = _checksums_ok(frames)
+    if ok.all():
+        return frames, 0
+    return frames[ok], int((~ok).sum())
+
+
+def _checksums_ok(frames: np.ndarray) -> np.ndarray:
+    """Verify the Fletcher-8 checksums of equal-length frames.
+
+    ck_a is the byte sum and ck_b the sum weighted by distance from the end,
+    so both are a row sum and a matrix-vector product. They are computed in
+    floating point (exact well below 2**24 for short frames) so the product
+    runs through BLAS, a block of rows at a time to bound the temporaries.
+    """
+    checked = frames[:, 2:-2]
+    width = checked.shape[1]
+    dtype = np.float32 if 255 * width * (width + 1) // 2 < 2 ** 24 else np.float64
+    weights = np.arange(width, 0, -1, dtype=dtype)
+    ok = np.empty(len(frames), dtype=bool)
+    for start in range(0, len(frames), CHECKSUM_ROWS):
+        block = checked[start:start + CHECKSUM_ROWS].astype(dtype)
+        ck_a = block.sum(axis=1).astype(np.int64) & 0xFF
+        ck_b = (block @ weights).astype(np.int64) & 0xFF
+        ok[start:start + CHECKSUM_ROWS] = ((ck_a == frames[start:start + CHECKSUM_ROWS, -2])
+                                           & (ck_b == frames[start:start + CHECKSUM_ROWS, -1]))
+    return ok
+
+
+def decode_frames(frames: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """View validated frames as a structured array (no copy)"""
+    if len(frames) == 0:
+        return np.zeros(0, dtype=dtype)
+    return frames.view(dtype)[:, 0]
+
+
+def pvt_fix_classes(pvt: np.ndarray) -> np.ndarray:
+    """Map NAV-PVT fix type and carrier solution flags to shared fix classes"""
+    flags = pvt['flags']
+    gnss_fix_ok = (flags & 0x01).astype(bool)
+    diff_soln = (flags & 0x02).astype(bool)
+    carr_soln = flags >> 6
+    classes = np.full(len(pvt), FIX_SINGLE, dtype=np.int8)
+    classes[diff_soln] = FIX_DGPS
+    classes[carr_soln == 1] = FIX_FLOAT
+    classes[carr_soln == 2] = FIX_FIXED
+    classes[~gnss_fix_ok | (pvt['fixType'] < 2) | (pvt['fixType'] == 5)] = FIX_NONE
+    return classes
+
+
+def pvt_timestamps(pvt: np.ndarray) -> np.ndarray:
+    """UTC timestamps (datetime64[ns]) from the NAV-PVT date and time fields"""
+    months = (pvt['year'].astype(np.int64) - 1970) * 12 + pvt['month'].astype(np.int64) - 1
+    days = months.astype('datetime64[M]').astype('datetime64[D]') + (pvt['day'].astype(np.int64) - 1)
+    seconds = pvt['hour'].astype(np.int64) * 3600 + pvt['min'].astype(np.int64) * 60 + pvt['sec']
+    return (days.astype('datetime64[ns]') + (seconds * 1000000000 + pvt['nano']).astype('timedelta64[ns]'))
+
+
+def _week_keys(itow: np.ndarray) -> np.ndarray:
+    """iTOW made unique across week rollovers within one log"""
+    itow = itow.astype(np.int64)
+    weeks = np.concatenate(([0], np.cumsum(np.diff(itow) < 0)))
+    return weeks * MILLISECONDS_PER_WEEK + itow
+
+
+class UBXProcessor:
+    """Processor for u-blox UBX binary logs."""
+
+    def read_columns(self, data: np.ndarray) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """Decode a UBX log held in a uint8 array.
+
+        Returns:
+            Tuple of (epoch columns, statistics about the decoded frames)
+        """
+        candidates = sync_offsets(data)
+        pvt_frames, pvt_errors = extract_frames(data, candidates, NAV_PVT)
+        hp_frames, hp_errors = extract_frames(data, candidates, NAV_HPPOSLLH)
+        pvt = decode_frames(pvt_frames, NAV_PVT_DTYPE)
+        hp = decode_frames(hp_frames, NAV_HPPOSLLH_DTYPE)
+
+        fix_class = pvt_fix_classes(pvt)
+        valid_time = (pvt['valid'] & 0x03) == 0x03
+        usable = valid_time & (fix_class != FIX_NONE) & ((pvt['flags3'] & 0x01) == 0)
+
+        latitude = pvt['lat'] * 1e-7
+        longitude = pvt['lon'] * 1e-7
+        height = pvt['height'] * 1e-3
+        h_acc = pvt['hAcc'] * 1e-3
+        v_acc = pvt['vAcc'] * 1e-3
+        high_precision = np.zeros(len(pvt), dtype=bool)
+        if len(hp) and len(pvt):
+            hp = hp[(hp['flags'] & 0x01) == 0]
+            pvt_keys = _week_keys(pvt['iTOW'])
+            hp_keys = _week_keys(hp['iTOW'])
+            order = np.argsort(pvt_keys, kind='stable')
+            index = np.minimum(np.searchsorted(pvt_keys[order], hp_keys), len(order) - 1)
+            matched = pvt_keys[order][index] == hp_keys
+            target = order[index[matched]]
+            hp = hp[matched]
+            latitude[target] = hp['lat'] * 1e-7 + hp['latHp'] * 1e-9
+            longitude[target] = hp['lon'] * 1e-7 + hp['lonHp'] * 1e-9
+            height[target] = hp['height'] * 1e-3 + hp['heightHp'] * 1e-4
+            h_acc[target] = hp['hAcc'] * 1e-4
+            v_acc[target] = hp['vAcc'] * 1e-4
+            high_precision[target] = True
+
+        columns = {
+            'timestamp': pvt_timestamps(pvt[usable]),
+            'latitude': latitude[usable],
+            'longitude': longitude[usable],
+            'altitude': height[usable],
+            'fix_class': fix_class[usable],
+            'num_satellites': pvt['numSV'][usable].astype(np.int16),
+            'h_acc': h_acc[usable],
+            'v_acc': v_acc[usable],
+            'pdop': pvt['pDOP'][usable] * 0.01
+        }
+        statistics = {
+            'bytes': int(len(data)),
+            'nav_pvt_frames': int(len(pvt)),
+            'nav_hpposllh_frames': int(len(hp_frames)),
+            'high_precision_epochs': int(high_precision[usable].sum()),
+            'checksum_errors': pvt_errors + hp_errors,
+            'epochs_without_fix': int((~usable).sum())
+        }
+        return columns, statistics
+
+    def process_ubx_file_bulk(self, source: Union[str, BinaryIO]) -> Dict:
+        """Process a UBX log through a memory map.
+
+        Args:
+            source: Path or binary file object; file objects without a file
+                descriptor (e.g. archived uploads) are read into memory
+
+        Returns:
+            Dict with 'data' (EpochBatch) and 'statistics'
+        """
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return self.process_ubx_file_bulk(f)
+
+        try:
+            fileno = source.fileno()
+        except OSError:
+            fileno = None
+        if fileno is None:
+            columns, statistics = self.read_columns(np.frombuffer(source.read(), dtype=np.uint8))
+            data = EpochBatch.from_columns(columns)
+        else:
+            try:
+                mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                mapped = None
+            try:
+                raw = np.frombuffer(mapped, dtype=np.uint8) if mapped is not None else np.zeros(0, dtype=np.uint8)
+                columns, statistics = self.read_columns(raw)
+                # All columns are computed arrays, so nothing refers to the mapping after this
+                data = EpochBatch.from_columns(columns)
+                del raw
+            finally:
+                if mapped is not None:
+                    mapped.close()
+
+        if len(data):
+            statistics['mean_accuracy'] = {
+                'horizontal': float(data['h_acc'].mean()),
+                'vertical': float(data['v_acc'].mean())
+            }
+        logger.info(f"Decoded {statistics['nav_pvt_frames']} NAV-PVT and "
+                    f"{statistics['nav_hpposllh_frames']} NAV-HPPOSLLH frames from {getattr(source, 'name', 'stream')}")
+        return {'data': data, 'statistics': statistics}
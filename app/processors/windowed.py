@@ -0,0 +1,120 @@
+import numpy as np
+from typing import Dict, Optional
+
+
+def window_starts(timestamps: np.ndarray, window_seconds: Optional[float] = None,
+                  window_epochs: Optional[int] = None) -> np.ndarray:
+    """Return the first row index of each window.
+
+    Windows are either fixed time buckets aligned to the first epoch or
+    consecutive blocks of window_epochs rows. Empty time buckets are skipped.
+    """
+    n = len(timestamps)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if window_epochs is not None:
+        if window_epochs < 1:
+            raise ValueError("window_epochs must be positive")
+        return np.arange(0, n, int(window_epochs), dtype=np.int64)
+    if not window_seconds or window_seconds <= 0:
+        raise ValueError("window_seconds or window_epochs must be positive")
+
+    elapsed = (timestamps - timestamps[0]).astype('timedelta64[ns]').astype(np.int64)
+    bucket = elapsed // int(window_seconds * 1e9)
+    return np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1)).astype(np.int64)
+
+
+def window_statistics(values: np.ndarray, starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Compute RMSE/mean/std/max/min per window with reduceat (no per-window loop)"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(starts) == 0:
+        empty = np.zeros(0)
+        return {'rmse': empty, 'mean': empty, 'std': empty, 'max': empty, 'min': empty}
+
+    counts = np.diff(np.append(starts, len(values)))
+    sums = np.add.reduceat(values, starts)
+    sums_sq = np.add.reduceat(values * values, starts)
+    mean = sums / counts
+    mean_sq = sums_sq / counts
+    return {
+        'rmse': np.sqrt(mean_sq),
+        'mean': mean,
+        'std': np.sqrt(np.maximum(mean_sq - mean * mean, 0.0)),
+        'max': np.maximum.reduceat(values, starts),
+        'min': np.minimum.reduceat(values, starts)
+    }
+
+
+def rolling_rmse(values: np.ndarray, length: int, at: Optional[np.ndarray] = None) -> np.ndarray:
+    """RMSE over the trailing `length` epochs, from a cumulative sum.
+
+    Args:
+        values: Per-epoch errors
+        length: Number of trailing epochs
+        at: Optional row indices to evaluate at (default: every epoch)
+
+    Raises:
+        ValueError: If length is less than one epoch
+    """
+    if length < 1:
+        raise ValueError("Rolling length must be at least one epoch")
+    values = np.asarray(values, dtype=np.float64)
+    cumulative = np.concatenate(([0.0], np.cumsum(values * values)))
+    upper = np.arange(1, len(values) + 1) if at is None else np.asarray(at) + 1
+    lower = np.maximum(upper - int(length), 0)
+    return np.sqrt((cumulative[upper] - cumulative[lower]) / (upper - lower))
+
+
+def time_to_first_fix(timestamps: np.ndarray, fixed: np.ndarray) -> Optional[float]:
+    """Seconds from the first epoch to the first fixed epoch (None if never fixed)"""
+    indices = np.flatnonzero(fixed)
+    if len(timestamps) == 0 or len(indices) == 0:
+        return None
+    return float((timestamps[indices[0]] - timestamps[0]) / np.timedelta64(1, 's'))
+
+
+def convergence_time(timestamps: np.ndarray, errors: np.ndarray, threshold: float,
+                     hold_epochs: int = 10) -> Optional[float]:
+    """Seconds until the error first stays below threshold for hold_epochs consecutive epochs"""
+    n = len(errors)
+    hold_epochs = max(int(hold_epochs), 1)
+    if n < hold_epochs:
+        return None
+    below = np.concatenate(([0], np.cumsum(np.asarray(errors) < threshold)))
+    runs = below[hold_epochs:] - below[:-hold_epochs]
+    indices = np.flatnonzero(runs == hold_epochs)
+    if len(indices) == 0:
+        return None
+    return float((timestamps[indices[0]] - timestamps[0]) / np.timedelta64(1, 's'))
+
+
+def accuracy_timeseries(columns: Dict[str, np.ndarray], window_seconds: Optional[float] = None,
+                        window_epochs: Optional[int] = None, rolling_epochs: Optional[int] = None) -> Dict:
+    """Windowed horizontal/vertical statistics for a dataset's stored epochs.
+
+    Args:
+        columns: Epoch columns with 'timestamp', 'horizontal_error' and 'vertical_error'
+        window_seconds: Time window length
+        window_epochs: Alternative window length in epochs
+        rolling_epochs: Optional trailing RMSE length, sampled at each window end
+
+    Returns:
+        Dict of equally long arrays keyed by window, ready to plot
+    """
+    timestamps = np.asarray(columns['timestamp']).astype('datetime64[ns]')
+    starts = window_starts(timestamps, window_seconds, window_epochs)
+    ends = np.append(starts[1:], len(timestamps)) - 1
+
+    result = {
+        'time': timestamps[starts],
+        'end_time': timestamps[ends],
+        'count': np.diff(np.append(starts, len(timestamps))),
+        'horizontal': window_statistics(columns['horizontal_error'], starts),
+        'vertical': window_statistics(columns['vertical_error'], starts)
+    }
+    if rolling_epochs:
+        result['rolling_rmse'] = {
+            'horizontal': rolling_rmse(columns['horizontal_error'], rolling_epochs, at=ends),
+            'vertical': rolling_rmse(columns['vertical_error'], rolling_epochs, at=ends)
+        }
+    return result
@@ -1,18 +1,25 @@
 import datetime
+import io
+import logging
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Tuple
-from pyproj import Transformer
+from typing import BinaryIO, Dict, Tuple, Union
+from .projection import get_transformer, ECEF, WGS84_3D
+from .epochs import EpochBatch
+
+logger = logging.getLogger(__name__)
+
+# Column layout of RTKLIB-style XYZ solution files (15 whitespace separated fields)
+XYZ_COLUMNS = [
+    "date", "time", "x", "y", "z", "solution_type", "num_satellites",
+    "std_dev_x", "std_dev_y", "std_dev_z", "sdxy", "sdyz", "sdzx", "age", "ratio"
+]
+XYZ_NUMERIC_COLUMNS = XYZ_COLUMNS[2:]
 
 class XYZProcessor:
     """Processor for XYZ format GNSS data files."""
     
     def __init__(self):
-        self.ecef_to_lla = Transformer.from_crs(
-            {"proj": "geocent", "ellps": "WGS84", "datum": "WGS84"},
-            {"proj": "latlong", "ellps": "WGS84", "datum": "WGS84"},
-            always_xy=True
-        )
+        self.ecef_to_lla = get_transformer(ECEF, WGS84_3D)
 
     def parse_xyz_line(self, line: str) -> Dict:
         """Parse a single line of XYZ data.
@@ -70,42 +77,157 @@ class XYZProcessor:
             Dict containing processed data and statistics
         """
         data = []
+        invalid_lines = 0
         with open(file_path, 'r') as f:
             for line in f:
                 try:
                     parsed = self.parse_xyz_line(line)
                     data.append(parsed)
                 except (ValueError, IndexError) as e:
-                    print(f"Warning: Skipping invalid line: {e}")
+                    logger.debug(f"Skipping invalid line: {e}")
+                    invalid_lines += 1
                     continue
         
-        df = pd.DataFrame(data)
+        if invalid_lines:
+            logger.warning(f"Skipped {invalid_lines} invalid lines in {file_path}")
+        
+        data = EpochBatch.from_records(data)
+        
+        return {
+            "data": data,
+            "statistics": self._compute_statistics(data),
+            "invalid_lines": invalid_lines
+        }
+
+    def process_xyz_file_bulk(self, source: Union[str, BinaryIO]) -> Dict:
+        """Process an XYZ format file in columnar (bulk) mode.
+        
+        The whole file is tokenised by the pandas C parser in one pass, the
+        timestamps are parsed as a vector and ECEF coordinates are converted
+        to lat/lon/alt with a single array call to the transformer.
+        
+        Args:
+            source: Path to XYZ file or binary file object
+            
+        Returns:
+            Dict containing an EpochBatch with the same fields as
+            parse_xyz_line, statistics and the number of invalid lines
+        """
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                raw = f.read()
+        else:
+            raw = source.read()
+        
+        data, invalid_lines = self.parse_xyz_bytes(raw)
+        if invalid_lines:
+            logger.warning(f"Skipped {invalid_lines} invalid lines in {getattr(source, 'name', source)}")
+        
+        return {
+            "data": data,
+            "statistics": self._compute_statistics(data),
+            "invalid_lines": invalid_lines
+        }
+
+    def parse_xyz_bytes(self, raw: bytes) -> Tuple[EpochBatch, int]:
+        """Parse complete XYZ lines held in memory (a whole file or a chunk of one).
+        
+        Args:
+            raw: File content ending on a line boundary
+            
+        Returns:
+            Tuple of (EpochBatch with the parse_xyz_line fields, number of invalid lines)
+        """
+        import pandas as pd
+
+        # Lines that are not blank; anything that does not end up as a valid
+        # row is counted as invalid
+        total_lines = sum(1 for line in raw.splitlines() if line.strip())
+        
+        if total_lines:
+            df = pd.read_csv(
+                io.BytesIO(raw),
+                sep=r"\s+",
+                header=None,
+                names=XYZ_COLUMNS,
+                dtype={"date": str, "time": str},
+                on_bad_lines="skip",
+                engine="c"
+            )
+        else:
+            df = pd.DataFrame(columns=XYZ_COLUMNS)
+        
+        for column in XYZ_NUMERIC_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+        df["timestamp"] = pd.to_datetime(
+            df["date"] + " " + df["time"],
+            format="%Y/%m/%d %H:%M:%S.%f",
+            errors="coerce"
+        )
+        
+        # Short lines are padded with NaN by the parser, so a complete row has
+        # every numeric field and a valid timestamp
+        valid = df[XYZ_NUMERIC_COLUMNS].notna().all(axis=1) & df["timestamp"].notna()
+        df = df.loc[valid].reset_index(drop=True)
+        
+        invalid_lines = total_lines - len(df)
+        
+        x = df["x"].to_numpy(dtype=np.float64)
+        y = df["y"].to_numpy(dtype=np.float64)
+        z = df["z"].to_numpy(dtype=np.float64)
+        lon, lat, alt = self.ecef_to_lla.transform(x, y, z)
+        
+        data = EpochBatch(
+            df["timestamp"].to_numpy(dtype="datetime64[ns]"),
+            lat,
+            lon,
+            alt,
+            x=x,
+            y=y,
+            z=z,
+            solution_type=df["solution_type"].to_numpy(dtype=np.int8),
+            num_satellites=df["num_satellites"].to_numpy(dtype=np.int16),
+            std_dev_x=df["std_dev_x"].to_numpy(dtype=np.float64),
+            std_dev_y=df["std_dev_y"].to_numpy(dtype=np.float64),
+            std_dev_z=df["std_dev_z"].to_numpy(dtype=np.float64),
+            age=df["age"].to_numpy(dtype=np.float64),
+            ratio=df["ratio"].to_numpy(dtype=np.float64)
+        )
+        
+        return data, invalid_lines
+
+    def _compute_statistics(self, data: EpochBatch) -> Dict:
+        """Calculate summary statistics for parsed XYZ data.
         
-        # Calculate statistics
-        stats = {
-            "start_time": df["timestamp"].min(),
-            "end_time": df["timestamp"].max(),
-            "duration": (df["timestamp"].max() - df["timestamp"].min()).total_seconds(),
-            "num_points": len(df),
-            "mean_satellites": df["num_satellites"].mean(),
+        Args:
+            data: Parsed epochs
+            
+        Returns:
+            Dict containing time span, satellite and position statistics
+        """
+        import pandas as pd
+
+        # Series over the batch's columns (no copies), for pandas' NaN handling
+        columns = {name: pd.Series(values, copy=False) for name, values in data.items()}
+        return {
+            "start_time": columns["timestamp"].min(),
+            "end_time": columns["timestamp"].max(),
+            "duration": (columns["timestamp"].max() - columns["timestamp"].min()).total_seconds(),
+            "num_points": len(data),
+            "mean_satellites": columns["num_satellites"].mean(),
             "mean_position": {
-                "latitude": df["latitude"].mean(),
-                "longitude": df["longitude"].mean(),
-                "altitude": df["altitude"].mean()
+                "latitude": columns["latitude"].mean(),
+                "longitude": columns["longitude"].mean(),
+                "altitude": columns["altitude"].mean()
             },
             "std_position": {
-                "latitude": df["latitude"].std(),
-                "longitude": df["longitude"].std(),
-                "altitude": df["altitude"].std()
+                "latitude": columns["latitude"].std(),
+                "longitude": columns["longitude"].std(),
+                "altitude": columns["altitude"].std()
             },
             "mean_accuracy": {
-                "x": df["std_dev_x"].mean(),
-                "y": df["std_dev_y"].mean(),
-                "z": df["std_dev_z"].mean()
+                "x": columns["std_dev_x"].mean(),
+                "y": columns["std_dev_y"].mean(),
+                "z": columns["std_dev_z"].mean()
             }
         }
-        
-        return {
-            "data": data,
-            "statistics": stats
-        }
@@ -0,0 +1,307 @@
+"""Compressed archive of raw uploads in MongoDB GridFS.
+
+Uploads land in UPLOAD_FOLDER under their content hash. Once the dataset
+exists they are moved into a GridFS bucket: the file is compressed as one
+zstd stream, read and written a megabyte at a time, and GridFS stores the
+compressed stream as chunk documents. Files are keyed by content hash, so
+identical uploads are archived once.
+
+Processing opens an upload from the upload folder while it is still there
+and from the archive otherwise, through ArchiveReader, which decompresses
+chunk by chunk as the parser reads, so an archived file is never restored
+in full. Only RINEX, whose reader needs a path, gets a temporary copy.
+
+Uploads are archived on a background thread (archive_later), so upload
+requests never wait for MongoDB; until a file is archived it is simply
+read from the upload folder.
+
+The bucket is opened on first use in each process, and gridfs, zstandard
+and pymongo are imported then, so they stay out of application startup.
+"""
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    import gridfs
+
+    from .mongo import Mongo
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1024 * 1024
+DEFAULT_LEVEL = 3
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# Archives opened by pool workers, one client per process
+_worker_archives: Dict[tuple, 'RawArchive'] = {}
+
+
+def content_hash_of(path: str) -> Optional[str]:
+    """Content hash in a content-addressed upload name (<hash>.<format>); None for other names"""
+    stem = os.path.basename(path).split('.', 1)[0]
+    return stem if HASH_PATTERN.fullmatch(stem) else None
+
+
+class ArchiveReader(io.RawIOBase):
+    """Binary stream of an archived file, decompressed chunk by chunk as it is read.
+
+    Seeking forward decompresses and discards; seeking backwards restarts
+    from the beginning, so the file is never held in memory.
+    """
+
+    def __init__(self, bucket: 'gridfs.GridFSBucket', file_id):
+        super().__init__()
+        self._bucket = bucket
+        self._file_id = file_id
+        self._reader = None
+        self._position = 0
+        self.size: Optional[int] = None
+        self._open()
+
+    def _open(self) -> None:
+        import zstandard
+
+        if self._reader is not None:
+            self._reader.close()
+        download = self._bucket.open_download_stream(self._file_id)
+        # Uncompressed size, recorded when the file was archived
+        self.size = (download.metadata or {}).get('size')
+        self._reader = zstandard.ZstdDecompressor().stream_reader(download, read_size=READ_SIZE)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        data = self._reader.read(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        self._position += size
+        return size
+
+    def readall(self) -> bytes:
+        chunks = []
+        for chunk in iter(lambda: self._reader.read(READ_SIZE), b''):
+            chunks.append(chunk)
+            self._position += len(chunk)
+        return b''.join(chunks)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('Archived files can only be seeked from the start or current position')
+        if offset < self._position:
+            self._open()
+        while self._position < offset:
+            if not self.read(min(READ_SIZE, offset - self._position)):
+                break
+        return self._position
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        super().close()
+
+
+class RawArchive:
+    """GridFS bucket of zstd compressed raw uploads keyed by content hash"""
+
+    def __init__(self, database=None, bucket_name: str = 'raw', level: int = DEFAULT_LEVEL):
+        self.database = database
+        self.bucket_name = bucket_name
+        self.level = level
+        self._mongo: Optional['Mongo'] = None
+        self._database_name = None
+        self._bucket = None
+        self._owner = None
+        self._executor = None
+        self._executor_owner = None
+
+    def init_app(self, app, mongo: 'Mongo'):
+        self.level = app.config['RAW_ARCHIVE_LEVEL']
+        if app.config['RAW_ARCHIVE_ENABLED']:
+            self._mongo = mongo
+            self._database_name = app.config['RAW_ARCHIVE_DATABASE']
+            self.bucket_name = app.config['RAW_ARCHIVE_BUCKET']
+        app.extensions['raw_archive'] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.database is not None or self._mongo is not None
+
+    @property
+    def bucket(self) -> 'gridfs.GridFSBucket':
+        """The GridFS bucket, opened on first use in each process"""
+        if self._bucket is None or self._owner != os.getpid():
+            import gridfs
+
+            database = self.database if self.database is not None else self._mongo.client[self._database_name]
+            self._bucket = gridfs.GridFSBucket(database, self.bucket_name)
+            self._owner = os.getpid()
+        return self._bucket
+
+    def _file_ids(self, content_hash: str) -> list:
+        """Archived copies of content_hash, oldest first"""
+        cursor = self.bucket.find({'filename': content_hash}).sort([('uploadDate', 1), ('_id', 1)])
+        return [doc._id for doc in cursor]
+
+    def exists(self, content_hash: str) -> bool:
+        return bool(self._file_ids(content_hash))
+
+    def store(self, path: str, content_hash: str) -> bool:
+        """Compress a local file into the archive unless its content is archived already.
+
+        Returns:
+            True if the file was newly archived
+        """
+        if self.exists(content_hash):
+            return False
+        import zstandard
+
+        size = os.path.getsize(path)
+        upload = self.bucket.open_upload_stream(content_hash, metadata={'compression': 'zstd', 'size': size})
+        try:
+            with open(path, 'rb') as f:
+                compressor = zstandard.ZstdCompressor(level=self.level)
+                compressor.copy_stream(f, upload, size=size, read_size=READ_SIZE, write_size=READ_SIZE)
+            upload.close()
+        except Exception:
+            upload.abort()
+            raise
+
+        # Two processes archiving the same upload keep the older copy
+        file_ids = self._file_ids(content_hash)
+        if file_ids and file_ids[0] != upload._id:
+            self.bucket.delete(upload._id)
+            return False
+        logger.info(f"Archived {content_hash}: {size} bytes as {upload.length} compressed")
+        return True
+
+    def archive_file(self, path: str, content_hash: str) -> bool:
+        """Move an upload into the archive, removing the local file.
+
+        The file stays in the upload folder when the archive is disabled or
+        unreachable, and processing then reads it from there.
+        """
+        if not self.enabled:
+            return False
+        try:
+            self.store(path, content_hash)
+        except Exception as e:
+            logger.warning(f"Could not archive {path}, keeping it in the upload folder: {str(e)}")
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # A concurrent upload of the same content archived it first
+            pass
+        return True
+
+    def archive_later(self, path: str, content_hash: str) -> Optional[Future]:
+        """Move an upload into the archive on a background thread (see archive_file).
+
+        Returns:
+            The future of the archiving task, None when the archive is disabled
+        """
+        if not self.enabled:
+            return None
+        if self._executor is None or self._executor_owner != os.getpid():
+            # Threads do not survive a fork, so each process starts its own
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='raw-archive')
+            self._executor_owner = os.getpid()
+        return self._executor.submit(self._archive_logged, path, content_hash)
+
+    def _archive_logged(self, path: str, content_hash: str) -> bool:
+        try:
+            return self.archive_file(path, content_hash)
+        except Exception as e:
+            logger.error(f"Archiving {path} failed: {str(e)}")
+            return False
+
+    def open(self, content_hash: str) -> ArchiveReader:
+        file_ids = self._file_ids(content_hash)
+        if not file_ids:
+            raise FileNotFoundError(f"{content_hash} is not in the raw archive")
+        return ArchiveReader(self.bucket, file_ids[0])
+
+    def delete(self, content_hash: str) -> None:
+        if not self.enabled:
+            return
+        for file_id in self._file_ids(content_hash):
+            self.bucket.delete(file_id)
+
+
+def worker_archive(config: Dict) -> Optional[RawArchive]:
+    """The raw archive in a pool worker, from the job configuration"""
+    if not config.get('RAW_ARCHIVE_ENABLED'):
+        return None
+    key = (config['MONGO_URI'], config['RAW_ARCHIVE_DATABASE'], config['RAW_ARCHIVE_BUCKET'])
+    archive = _worker_archives.get(key)
+    if archive is None:
+        from pymongo import MongoClient
+
+        database = MongoClient(config['MONGO_URI'])[config['RAW_ARCHIVE_DATABASE']]
+        archive = _worker_archives[key] = RawArchive(database, config['RAW_ARCHIVE_BUCKET'])
+    return archive
+
+
+@contextmanager
+def open_upload(path: str, archive: Optional[RawArchive]) -> Iterator[BinaryIO]:
+    """Open an upload from the upload folder or, once moved there, from the archive"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        content_hash = content_hash_of(path)
+        if archive is None or content_hash is None:
+            raise
+        f = archive.open(content_hash)
+    with f:
+        yield f
+
+
+@contextmanager
+def local_copy(path: Optional[str], archive: Optional[RawArchive]) -> Iterator[Optional[str]]:
+    """Path to an upload that stays valid for the duration of the context.
+
+    For readers that need a file name. A local upload is hard linked, so
+    archiving it meanwhile does not remove it from under the reader; an
+    archived one is restored to a temporary file. The copy keeps the
+    upload's file name, so caches keyed on it are shared.
+    """
+    if path is None:
+        yield None
+        return
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.restore-', dir=folder)
+    try:
+        tmp_path = os.path.join(tmp_dir, os.path.basename(path))
+        try:
+            os.link(path, tmp_path)
+        except FileNotFoundError:
+            with open_upload(path, archive) as src, open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, READ_SIZE)
+        except OSError:
+            # No hard links on this filesystem
+            shutil.copyfile(path, tmp_path)
+        yield tmp_path
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+raw_archive = RawArchive()
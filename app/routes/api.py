@@ -1,31 +1,139 @@
-from flask import Blueprint, request, jsonify, current_app, make_response
+from flask import Blueprint, request, jsonify, current_app, make_response, Response, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from ..processors.gnss_processor import GNSSProcessor
-from ..models import Dataset, BaseStation, AnalysisResult, db
+from ..models import Dataset, AnalysisResult, ProcessingJob, db, json_safe
+from ..jobs import job_queue, base_station_coords, station_coords, result_cache_key, JobConflictError
+from ..epoch_store import EpochStore, TIME_COLUMN
+from ..live import live_ingest, StreamTargetError
+from ..base_stations import base_station_cache, approximate_position
+from ..raw_archive import raw_archive
+from ..export import EpochExport, EXPORT_FORMATS
+from ..chunked_upload import UploadSession, UploadError, cleanup_stale_sessions
+from ..processors.windowed import accuracy_timeseries, time_to_first_fix, convergence_time
+from ..processors.fix_quality import fix_classes, FIX_FIXED
+from ..processors.downsample import track_levels, encode_polyline, MAX_ZOOM, TRACK_LEVEL_COLUMN
 import os
+import base64
+import hashlib
+import uuid
+import numpy as np
 from datetime import datetime
 import logging
 import traceback
 import json
+import queue
 
 bp = Blueprint('api', __name__)
 logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {'nmea', 'rnx', 'rinex', 'xyz'}
+ALLOWED_EXTENSIONS = {'nmea', 'rnx', 'rinex', 'xyz', 'ubx'}
+NAV_EXTENSIONS = {'nav', 'rnx'}
+# Request headers never written to the log
+SECRET_HEADERS = {'Cookie', 'Authorization', 'X-Profile'}
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Seconds between SSE keep-alive comments when a live stream sends no updates
+LIVE_HEARTBEAT_SECONDS = 15
+
+MAX_BATCH_DATASETS = 100
+# Result columns a batch comparison can be ranked by (lower is better)
+RANK_METRICS = ('horizontal_rmse', 'horizontal_cep50', 'horizontal_cep95', 'vertical_rmse', 'vertical_le95', 'r95')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def allowed_nav_file(filename):
+    """RINEX navigation files: .nav/.rnx or RINEX 2 style .YYn"""
+    if '.' not in filename:
+        return False
+    extension = filename.rsplit('.', 1)[1].lower()
+    return extension in NAV_EXTENSIONS or (len(extension) == 3 and extension[:2].isdigit() and extension[2] == 'n')
+
+def _campaign(value):
+    """Normalise an optional campaign tag from a request"""
+    value = (value or '').strip()[:100]
+    return value or None
+
+def _base_station(value, file_path, format_type):
+    """Resolve the requested base station of an upload.
+    
+    'auto' selects the active station nearest to where the file was recorded,
+    within BASE_STATION_AUTO_MAX_DISTANCE.
+    
+    Returns:
+        Tuple of (base station id or None, distance in metres for 'auto')
+    """
+    if value != 'auto':
+        return value or None, None
+    try:
+        position = approximate_position(file_path, format_type)
+    except Exception as e:
+        logger.warning(f"Could not read a position from {file_path}: {str(e)}")
+        position = None
+    if position is None:
+        logger.info(f"No position found in {file_path}, uploading without base station")
+        return None, None
+    station, distance = base_station_cache.nearest(*position, current_app.config['BASE_STATION_AUTO_MAX_DISTANCE'])
+    if station is None:
+        logger.info(f"No active base station within range of {position}")
+        return None, None
+    logger.info(f"Selected base station {station.id} at {distance:.0f} m")
+    return station.id, distance
+
+def save_hashed(stream, upload_dir, format_type):
+    """Copy an upload stream to disk in chunks while computing its SHA-256.
+    
+    The file is stored as <hash>.<format>, so identical uploads share one file.
+    
+    Returns:
+        Tuple of (content hash, size in bytes, stored path, True if newly stored)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(upload_dir, f'.upload-{uuid.uuid4().hex}')
+    try:
+        with open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        content_hash = hasher.hexdigest()
+        file_path = os.path.join(upload_dir, f'{content_hash}.{format_type}')
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+            return content_hash, size, file_path, False
+        os.replace(tmp_path, file_path)
+        return content_hash, size, file_path, True
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _nav_file(format_type):
+    """The navigation file sent with a RINEX observation upload, or an error response"""
+    nav_file = request.files.get('nav_file')
+    if not nav_file or not nav_file.filename:
+        return None, None
+    if format_type not in ('rnx', 'rinex') or not allowed_nav_file(nav_file.filename):
+        logger.error(f"Invalid navigation file: {nav_file.filename}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Navigation files are only supported with RINEX observations (.nav, .rnx, .YYn)'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return None, response
+    return nav_file, None
+
 @bp.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
     """Handle file upload with detailed logging."""
-    logger.info("=== Starting File Upload ===")
-    logger.info(f"Request Method: {request.method}")
-    logger.info(f"Request Headers: {dict(request.headers)}")
-    logger.info(f"Request Form Data: {dict(request.form)}")
-    logger.info(f"Request Files: {list(request.files.keys())}")
+    logger.debug("=== Starting File Upload ===")
+    logger.debug(f"Request Method: {request.method}")
+    logger.debug(f"Request Headers: {dict((k, v) for k, v in request.headers.items() if k not in SECRET_HEADERS)}")
+    logger.debug(f"Request Form Data: {dict(request.form)}")
+    logger.debug(f"Request Files: {list(request.files.keys())}")
     
     try:
         if 'file' not in request.files:
@@ -38,7 +146,7 @@ def upload_file():
             return response
 
         file = request.files['file']
-        logger.info(f"File received: {file.filename}, Content-Type: {file.content_type}")
+        logger.debug(f"File received: {file.filename}, Content-Type: {file.content_type}")
         
         if file.filename == '':
             logger.error("Empty filename received")
@@ -53,42 +161,63 @@ def upload_file():
             logger.error(f"Invalid file type: {file.filename}")
             response = make_response(json.dumps({
                 'success': False,
-                'error': 'Invalid file type. Supported formats: NMEA, RINEX, XYZ'
+                'error': 'Invalid file type. Supported formats: NMEA, RINEX, XYZ, UBX'
             }), 400)
             response.headers['Content-Type'] = 'application/json'
             return response
 
+        nav_file, error = _nav_file(file.filename.rsplit('.', 1)[1].lower())
+        if error:
+            return error
+
         # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(current_app.root_path, 'uploads')
+        upload_dir = current_app.config['UPLOAD_FOLDER']
         os.makedirs(upload_dir, exist_ok=True)
-        logger.info(f"Upload directory verified: {upload_dir}")
+        logger.debug(f"Upload directory verified: {upload_dir}")
 
-        # Save file
+        # Save file under its content hash, hashing while it is written
         filename = secure_filename(file.filename)
-        file_path = os.path.join(upload_dir, filename)
-        logger.info(f"Saving file to: {file_path}")
-        file.save(file_path)
-        logger.info("File saved successfully")
+        format_type = filename.rsplit('.', 1)[1].lower()
+        content_hash, file_size, file_path, created = save_hashed(file.stream, upload_dir, format_type)
+        logger.info(f"File saved to: {file_path} ({file_size} bytes, {'new' if created else 'duplicate'})")
+
+        # RINEX observations need a navigation file to compute positions
+        nav_hash = None
+        if nav_file:
+            nav_hash, nav_size, nav_path, _ = save_hashed(nav_file.stream, upload_dir, 'nav')
+            logger.info(f"Navigation file saved to: {nav_path} ({nav_size} bytes)")
 
         # Create dataset entry
         try:
+            base_station_id, station_distance = _base_station(request.form.get('base_station_id'),
+                                                              file_path, format_type)
             dataset = Dataset(
                 name=filename,
-                format_type=filename.rsplit('.', 1)[1].lower(),
+                format_type=format_type,
                 user_id=current_user.id,
-                base_station_id=request.form.get('base_station_id'),
-                processing_status='pending'
+                base_station_id=base_station_id,
+                processing_status='pending',
+                content_hash=content_hash,
+                file_size=file_size,
+                nav_hash=nav_hash,
+                campaign=_campaign(request.form.get('campaign'))
             )
             db.session.add(dataset)
             db.session.commit()
             logger.info(f"Dataset created with ID: {dataset.id}")
 
+            raw_archive.archive_later(file_path, content_hash)
+            if nav_hash:
+                raw_archive.archive_later(nav_path, nav_hash)
+
             response_data = {
                 'success': True,
                 'dataset_id': dataset.id,
-                'filename': filename
+                'filename': filename,
+                'base_station_id': dataset.base_station_id,
+                'base_station_distance': station_distance
             }
-            logger.info(f"Sending response: {response_data}")
+            logger.debug(f"Sending response: {response_data}")
             
             response = make_response(json.dumps(response_data), 200)
             response.headers['Content-Type'] = 'application/json'
@@ -98,8 +227,9 @@ def upload_file():
             logger.error(f"Database error: {str(e)}")
             logger.error(traceback.format_exc())
             try:
-                os.remove(file_path)
-                logger.info("Cleaned up uploaded file after database error")
+                if created:
+                    os.remove(file_path)
+                    logger.info("Cleaned up uploaded file after database error")
             except:
                 logger.warning("Failed to clean up uploaded file")
                 
@@ -120,6 +250,190 @@ def upload_file():
         response.headers['Content-Type'] = 'application/json'
         return response
 
+def _upload_session(upload_id):
+    """Load a chunked upload session owned by the current user, or return an error response"""
+    session = UploadSession.load(current_app.config['UPLOAD_FOLDER'], upload_id)
+    if session is None or session.user_id != current_user.id:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Upload not found'
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return None, response
+    return session, None
+
+def _parsed_cache():
+    return EpochStore(current_app.config['PARSED_CACHE_FOLDER'],
+                      max_bytes=current_app.config['PARSED_CACHE_MAX_BYTES'])
+
+@bp.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    """Start a resumable chunked upload.
+    
+    The file is then sent with PUT /uploads/<id>?offset=<n> requests whose
+    bodies are consecutive byte ranges, and finished with
+    POST /uploads/<id>/complete. Files of any size can be uploaded this way;
+    MAX_CONTENT_LENGTH only limits the size of each chunk.
+    """
+    params = request.get_json(silent=True) or request.form
+    filename = secure_filename(params.get('filename', ''))
+    if not filename:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'No filename provided'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cleanup_stale_sessions(upload_folder, current_app.config['UPLOAD_SESSION_TTL'])
+    session = UploadSession.create(upload_folder, current_user.id, filename,
+                                   params.get('base_station_id') or None,
+                                   _campaign(params.get('campaign')))
+    logger.info(f"Upload session {session.id} started for {filename}")
+
+    response = make_response(json.dumps({
+        'success': True,
+        'upload_id': session.id,
+        'offset': 0,
+        'max_chunk_size': current_app.config['MAX_CONTENT_LENGTH']
+    }), 201)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_upload(upload_id):
+    """Get the offset to resume a chunked upload from."""
+    session, error = _upload_session(upload_id)
+    if error:
+        return error
+
+    response = make_response(json.dumps({
+        'success': True,
+        'upload_id': session.id,
+        'offset': session.offset,
+        'format_type': session.format_type,
+        'epochs_parsed': session.meta['epochs']
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    """Append a chunk (the raw request body) at the given offset."""
+    session, error = _upload_session(upload_id)
+    if error:
+        return error
+
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        offset = request.headers.get('Upload-Offset', type=int)
+    try:
+        if offset is None:
+            raise UploadError('Missing offset')
+        new_offset = session.append(request.stream, offset, _parsed_cache())
+    except UploadError as e:
+        if e.status == 415:
+            session.delete()
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e),
+            'offset': e.offset
+        }), e.status)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    response = make_response(json.dumps({
+        'success': True,
+        'offset': new_offset,
+        'format_type': session.format_type,
+        'epochs_parsed': session.meta['epochs']
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    """Abort a chunked upload and discard the received data."""
+    session, error = _upload_session(upload_id)
+    if error:
+        return error
+    session.delete()
+    response = make_response(json.dumps({'success': True}), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """Finish a chunked upload and create its dataset.
+    
+    RINEX observations can bring their navigation file as a multipart
+    nav_file field of this request, as with POST /upload.
+    """
+    session, error = _upload_session(upload_id)
+    if error:
+        return error
+    nav_file, error = _nav_file(session.format_type)
+    if error:
+        return error
+
+    try:
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        expected_size = request.args.get('size', type=int)
+        if expected_size is not None and expected_size != session.offset:
+            raise UploadError(f'Received {session.offset} of {expected_size} bytes', 409, session.offset)
+        content_hash, file_size, file_path = session.complete(upload_folder, _parsed_cache())
+    except UploadError as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e),
+            'offset': e.offset
+        }), e.status)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    nav_hash = None
+    if nav_file:
+        nav_hash, nav_size, nav_path, _ = save_hashed(nav_file.stream, upload_folder, 'nav')
+        logger.info(f"Navigation file saved to: {nav_path} ({nav_size} bytes)")
+
+    base_station_id, station_distance = _base_station(session.meta['base_station_id'], file_path,
+                                                      session.format_type)
+    dataset = Dataset(
+        name=session.meta['filename'],
+        format_type=session.format_type,
+        user_id=current_user.id,
+        base_station_id=base_station_id,
+        campaign=session.meta.get('campaign'),
+        processing_status='pending',
+        content_hash=content_hash,
+        file_size=file_size,
+        nav_hash=nav_hash
+    )
+    db.session.add(dataset)
+    db.session.commit()
+    logger.info(f"Chunked upload {upload_id} stored as {file_path}, dataset {dataset.id}")
+    raw_archive.archive_later(file_path, content_hash)
+    if nav_hash:
+        raw_archive.archive_later(nav_path, nav_hash)
+
+    response = make_response(json.dumps({
+        'success': True,
+        'dataset_id': dataset.id,
+        'filename': dataset.name,
+        'format_type': dataset.format_type,
+        'epochs_parsed': session.meta['epochs'],
+        'base_station_id': dataset.base_station_id,
+        'base_station_distance': station_distance
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
 @bp.route('/process/<int:dataset_id>', methods=['POST'])
 @login_required
 def process_dataset(dataset_id):
@@ -138,28 +452,52 @@ def process_dataset(dataset_id):
             response.headers['Content-Type'] = 'application/json'
             return response
 
-        # Process the dataset
-        processor = GNSSProcessor(dataset)
-        result = processor.process()
-        
-        if result:
-            logger.info(f"Dataset {dataset_id} processed successfully")
+        # Reuse an earlier analysis of the same content against the same reference
+        cache_key = result_cache_key(dataset.processing_hash, base_station_coords(dataset),
+                                     job_queue.metric_options)
+        cached = None
+        if cache_key:
+            cached = (AnalysisResult.query
+                      .filter_by(cache_key=cache_key)
+                      .order_by(AnalysisResult.id.desc())
+                      .first())
+        if cached is not None:
+            result = cached.copy_for(dataset.id)
+            db.session.add(result)
+            dataset.processing_status = 'done'
+            db.session.commit()
+            EpochStore(current_app.config['EPOCH_STORE_FOLDER']).copy(cached.dataset_id, dataset.id)
+            logger.info(f"Dataset {dataset_id} served from cached result {cached.id}")
             response = make_response(json.dumps({
                 'success': True,
-                'message': 'Dataset processed successfully'
+                'message': 'Dataset processed (cached result)',
+                'cached': True,
+                'result': result.to_dict()
             }), 200)
-        else:
-            logger.error(f"Failed to process dataset {dataset_id}")
-            response = make_response(json.dumps({
-                'success': False,
-                'error': 'Processing failed'
-            }), 500)
-            
+            response.headers['Content-Type'] = 'application/json'
+            return response
+
+        # Queue the dataset for background processing
+        job = job_queue.enqueue(dataset)
+        logger.info(f"Dataset {dataset_id} queued as job {job.id}")
+        response = make_response(json.dumps({
+            'success': True,
+            'message': 'Dataset queued for processing',
+            'job': job.to_dict()
+        }), 202)
         response.headers['Content-Type'] = 'application/json'
         return response
 
+    except JobConflictError as e:
+        db.session.rollback()
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e)
+        }), 409)
+        response.headers['Content-Type'] = 'application/json'
+        return response
     except Exception as e:
-        logger.error(f"Error processing dataset {dataset_id}: {str(e)}")
+        logger.error(f"Error queueing dataset {dataset_id}: {str(e)}")
         logger.error(traceback.format_exc())
         response = make_response(json.dumps({
             'success': False,
@@ -168,23 +506,926 @@ def process_dataset(dataset_id):
         response.headers['Content-Type'] = 'application/json'
         return response
 
+def _batch_error(message, status):
+    response = make_response(json.dumps({
+        'success': False,
+        'error': message
+    }), status)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+def _rank_rows(rows, metric):
+    """Sort comparison rows by metric and assign competition ranks (1, 2, 2, 4)"""
+    ranked = sorted((row for row in rows if row[metric] is not None), key=lambda row: row[metric])
+    unranked = [row for row in rows if row[metric] is None]
+    previous = None
+    for position, row in enumerate(ranked, 1):
+        row['rank'] = previous['rank'] if previous and previous[metric] == row[metric] else position
+        previous = row
+    for row in unranked:
+        row['rank'] = None
+    return ranked + unranked
+
+def _batch_datasets(dataset_ids, campaign):
+    """The current user's datasets selected by ids or campaign, or an error response"""
+    if not dataset_ids and not campaign:
+        return None, _batch_error('Provide dataset_ids or campaign', 400)
+
+    query = Dataset.query.filter_by(user_id=current_user.id)
+    if dataset_ids:
+        try:
+            dataset_ids = list(dict.fromkeys(int(dataset_id) for dataset_id in dataset_ids))
+        except (TypeError, ValueError):
+            return None, _batch_error('dataset_ids must be a list of integers', 400)
+        query = query.filter(Dataset.id.in_(dataset_ids))
+    if campaign:
+        query = query.filter(Dataset.campaign == campaign)
+    datasets = query.order_by(Dataset.id).all()
+
+    if dataset_ids:
+        missing = sorted(set(dataset_ids) - {dataset.id for dataset in datasets})
+        if missing:
+            return None, _batch_error(f"Datasets not found: {', '.join(map(str, missing))}", 404)
+    if not datasets:
+        return None, _batch_error('No datasets found', 404)
+    if len(datasets) > MAX_BATCH_DATASETS:
+        return None, _batch_error(f'At most {MAX_BATCH_DATASETS} datasets can be processed in one batch', 400)
+    return datasets, None
+
+def _comparison_row(dataset, result, cached=False, job=None):
+    """One row of a batch comparison table"""
+    return {
+        'dataset_id': dataset.id,
+        'name': dataset.name,
+        'campaign': dataset.campaign,
+        'status': dataset.processing_status,
+        'cached': cached,
+        'job_id': job.id if job else None,
+        'result_id': result.id if result else None,
+        'num_points': result.num_points if result else None,
+        'horizontal_rmse': result.horizontal_rmse if result else None,
+        'horizontal_cep50': result.horizontal_cep50 if result else None,
+        'horizontal_cep95': result.horizontal_cep95 if result else None,
+        'vertical_rmse': result.vertical_rmse if result else None,
+        'vertical_le95': result.vertical_le95 if result else None,
+        'r95': result.r95 if result else None
+    }
+
+@bp.route('/batch/process', methods=['POST'])
+@login_required
+def process_batch():
+    """Process several datasets against one reference.
+    
+    The JSON body selects datasets with 'dataset_ids' or a 'campaign' tag.
+    With 'base_station_id' every dataset is analysed against that station
+    (for this batch only; the datasets keep their own), otherwise against
+    its own base station. A dataset being processed against another
+    reference fails the batch with 409. Datasets whose content was
+    already analysed against the same reference reuse the cached result; the
+    rest are queued as one processing job each, like POST /process/<id>.
+    The response (202 while jobs are queued) lists the job ids to poll at
+    /jobs/<id>; GET /batch/results then returns the comparison ranked by
+    'rank_by' (default horizontal_rmse).
+    """
+    params = request.get_json(silent=True) or {}
+    campaign = _campaign(params.get('campaign'))
+    rank_by = params.get('rank_by', 'horizontal_rmse')
+    if rank_by not in RANK_METRICS:
+        return _batch_error(f"rank_by must be one of: {', '.join(RANK_METRICS)}", 400)
+    datasets, error = _batch_datasets(params.get('dataset_ids'), campaign)
+    if error:
+        return error
+
+    # Resolve each reference once for the whole batch
+    reference_id = params.get('base_station_id')
+    station_cache = {}
+    if reference_id is not None:
+        try:
+            reference_id = int(reference_id)
+        except (TypeError, ValueError):
+            return _batch_error('base_station_id must be an integer', 400)
+        station_cache[reference_id] = station_coords(reference_id)
+        if station_cache[reference_id] is None:
+            return _batch_error('Base station not found', 404)
+
+    logger.info(f"=== Starting Batch Processing of {len(datasets)} datasets ===")
+    try:
+        # Cached results and job rows are committed together, so a failure leaves no partial batch
+        epoch_store = EpochStore(current_app.config['EPOCH_STORE_FOLDER'])
+        rows = []
+        jobs = []
+        copies = []
+        for dataset in datasets:
+            station_id = reference_id if reference_id is not None else dataset.base_station_id
+            if station_id not in station_cache:
+                station_cache[station_id] = station_coords(station_id)
+            cache_key = result_cache_key(dataset.processing_hash, station_cache[station_id],
+                                         job_queue.metric_options)
+            cached = None
+            if cache_key:
+                cached = (AnalysisResult.query
+                          .filter_by(cache_key=cache_key)
+                          .order_by(AnalysisResult.id.desc())
+                          .first())
+            if cached is not None:
+                result = cached.copy_for(dataset.id)
+                db.session.add(result)
+                dataset.processing_status = 'done'
+                copies.append((cached.dataset_id, dataset.id))
+                rows.append((dataset, result, None))
+            else:
+                # Processed in the background by the job queue's worker pool
+                job = job_queue.enqueue(dataset, reference_id, commit=False)
+                jobs.append(job)
+                rows.append((dataset, None, job))
+        db.session.commit()
+        job_queue.wake()
+        for src_id, dst_id in copies:
+            epoch_store.copy(src_id, dst_id)
+        rows = [_comparison_row(dataset, result, cached=result is not None, job=job)
+                for dataset, result, job in rows]
+        jobs = [job.id for job in jobs]
+        logger.info(f"Batch of {len(datasets)} datasets: {len(jobs)} queued, {len(datasets) - len(jobs)} cached")
+
+        response = make_response(json.dumps({
+            'success': True,
+            'rank_by': rank_by,
+            'base_station_id': reference_id,
+            'queued': len(jobs),
+            'cached': len(datasets) - len(jobs),
+            'jobs': jobs,
+            'datasets': _rank_rows(rows, rank_by)
+        }), 202 if jobs else 200)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    except JobConflictError as e:
+        db.session.rollback()
+        return _batch_error(str(e), 409)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error in batch processing: {str(e)}")
+        logger.error(traceback.format_exc())
+        return _batch_error(f'Processing error: {str(e)}', 500)
+
+@bp.route('/batch/results', methods=['GET'])
+@login_required
+def get_batch_results():
+    """Compare the latest results of several datasets.
+    
+    Query parameters: dataset_ids (comma separated) or campaign, and
+    rank_by (default horizontal_rmse). Datasets still being processed are
+    listed unranked with their status.
+    """
+    campaign = _campaign(request.args.get('campaign'))
+    rank_by = request.args.get('rank_by', 'horizontal_rmse')
+    if rank_by not in RANK_METRICS:
+        return _batch_error(f"rank_by must be one of: {', '.join(RANK_METRICS)}", 400)
+    dataset_ids = request.args.get('dataset_ids')
+    datasets, error = _batch_datasets(dataset_ids.split(',') if dataset_ids else None, campaign)
+    if error:
+        return error
+
+    results = dict(db.session.query(Dataset.id, AnalysisResult)
+                   .join(AnalysisResult, AnalysisResult.id == _latest_result_id())
+                   .filter(Dataset.id.in_([dataset.id for dataset in datasets]))
+                   .all())
+    rows = [_comparison_row(dataset, results.get(dataset.id)) for dataset in datasets]
+    pending = sum(1 for dataset in datasets if dataset.processing_status in ('queued', 'running'))
+
+    response = make_response(json.dumps({
+        'success': True,
+        'rank_by': rank_by,
+        'pending': pending,
+        'datasets': _rank_rows(rows, rank_by)
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Get status and progress of a processing job."""
+    job = ProcessingJob.query.get_or_404(job_id)
+    
+    if job.dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized access attempt to job {job_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    response = make_response(json.dumps({
+        'success': True,
+        'job': job.to_dict(),
+        'dataset_status': job.dataset.processing_status
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+RESULTS_PAGE_SIZE = 50
+MAX_RESULTS_PAGE_SIZE = 500
+
+def _latest_result_id():
+    """Correlated subquery selecting the id of each dataset's latest result (one index probe per row)"""
+    return (db.select(AnalysisResult.id)
+            .where(AnalysisResult.dataset_id == Dataset.id)
+            .order_by(AnalysisResult.id.desc())
+            .limit(1)
+            .correlate(Dataset)
+            .scalar_subquery())
+
+def _encode_cursor(upload_date, dataset_id):
+    payload = json.dumps([upload_date.isoformat() if upload_date else None, dataset_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """(upload_date, dataset id) of the last row of the previous page"""
+    try:
+        upload_date, dataset_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(upload_date), int(dataset_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def _results_etag(user_id, *request_args):
+    """Validator for a user's result listing from two aggregate queries.
+
+    Any upload, deletion or status change alters the per-status counts or
+    the newest dataset id, and any new result (including reprocessing) the
+    newest result id, so unchanged listings are answered without loading
+    a single row.
+    """
+    statuses = (db.session.query(Dataset.processing_status, db.func.count(Dataset.id), db.func.max(Dataset.id))
+                .filter(Dataset.user_id == user_id)
+                .group_by(Dataset.processing_status)
+                .all())
+    latest_result = (db.session.query(db.func.max(AnalysisResult.id))
+                     .join(Dataset, Dataset.id == AnalysisResult.dataset_id)
+                     .filter(Dataset.user_id == user_id)
+                     .scalar())
+    version = [sorted((str(status), count, max_id) for status, count, max_id in statuses), latest_result,
+               list(request_args)]
+    return hashlib.sha256(json.dumps(version).encode()).hexdigest()[:32]
+
+def _not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _result_row(row):
+    """Fields of the dashboard table, map and chart for one (dataset, latest result) row"""
+    data = {
+        'id': row.id,
+        'name': row.name,
+        'upload_date': row.upload_date.isoformat() if row.upload_date else None,
+        'format_type': row.format_type,
+        'processing_status': row.processing_status,
+        'results': None
+    }
+    if row.result_id is not None:
+        data['results'] = {
+            'id': row.result_id,
+            'reference_mode': row.reference_mode,
+            'horizontal': {'rmse': row.horizontal_rmse},
+            'vertical': {'rmse': row.vertical_rmse},
+            'num_points': row.num_points,
+            'reference_position': {
+                'latitude': row.reference_latitude,
+                'longitude': row.reference_longitude
+            }
+        }
+    return data
+
+@bp.route('/results', methods=['GET'])
+@login_required
+def list_results():
+    """List the user's datasets with their latest analysis result, newest first.
+    
+    Pages are keyed on (upload_date, id): pass the returned next_cursor as
+    ?cursor= for the next page. Responses carry an ETag, and a matching
+    If-None-Match is answered with 304 before any row is loaded.
+    """
+    limit = max(1, min(request.args.get('limit', RESULTS_PAGE_SIZE, type=int), MAX_RESULTS_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e)
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    etag = _results_etag(current_user.id, cursor, limit)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    query = (db.session.query(
+                Dataset.id, Dataset.name, Dataset.upload_date, Dataset.format_type, Dataset.processing_status,
+                AnalysisResult.id.label('result_id'), AnalysisResult.reference_mode,
+                AnalysisResult.horizontal_rmse, AnalysisResult.vertical_rmse, AnalysisResult.num_points,
+                AnalysisResult.reference_latitude, AnalysisResult.reference_longitude)
+             .outerjoin(AnalysisResult, AnalysisResult.id == _latest_result_id())
+             .filter(Dataset.user_id == current_user.id))
+    if after is not None:
+        query = query.filter(db.tuple_(Dataset.upload_date, Dataset.id) < db.tuple_(*after))
+    rows = query.order_by(Dataset.upload_date.desc(), Dataset.id.desc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    next_cursor = _encode_cursor(page[-1].upload_date, page[-1].id) if len(rows) > limit else None
+    response = make_response(json.dumps({
+        'success': True,
+        'results': [_result_row(row) for row in page],
+        'next_cursor': next_cursor
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    return response
+
+@bp.route('/results/<int:dataset_id>', methods=['GET'])
+@login_required
+def get_result(dataset_id):
+    """Get a dataset with its latest analysis result in full."""
+    row = (db.session.query(Dataset, AnalysisResult)
+           .outerjoin(AnalysisResult, AnalysisResult.id == _latest_result_id())
+           .filter(Dataset.id == dataset_id)
+           .first())
+    if row is None:
+        abort(404)
+    dataset, result = row
+
+    if dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized access attempt to dataset {dataset_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    if result is None:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'No analysis results for this dataset',
+            'processing_status': dataset.processing_status
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    # Stored results are never modified, so the result id identifies the content
+    etag = f'result-{result.id}'
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    response = make_response(json.dumps({
+        'success': True,
+        'dataset': {
+            'id': dataset.id,
+            'name': dataset.name,
+            'format_type': dataset.format_type,
+            'upload_date': dataset.upload_date.isoformat() if dataset.upload_date else None,
+            'processing_status': dataset.processing_status,
+            'base_station_id': dataset.base_station_id,
+            'campaign': dataset.campaign
+        },
+        'results': json_safe(result.to_dict())
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    return response
+
+@bp.route('/datasets/<int:dataset_id>', methods=['DELETE'])
+@login_required
+def delete_dataset(dataset_id):
+    """Delete a dataset with its results, jobs, stored epochs and (if unshared) uploaded files."""
+    dataset = Dataset.query.get_or_404(dataset_id)
+
+    if dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized delete attempt on dataset {dataset_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    active = ProcessingJob.query.filter(
+        ProcessingJob.dataset_id == dataset.id,
+        ProcessingJob.status.in_(('queued', 'running'))
+    ).first()
+    if active is not None:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Dataset is being processed'
+        }), 409)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    stored_files = []
+    if dataset.content_hash:
+        stored_files.append((dataset.content_hash, dataset.stored_filename))
+    if dataset.nav_hash:
+        stored_files.append((dataset.nav_hash, dataset.nav_filename))
+    try:
+        ProcessingJob.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
+        AnalysisResult.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
+        db.session.delete(dataset)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting dataset {dataset_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        response = make_response(json.dumps({
+            'success': False,
+            'error': f'Error deleting dataset: {str(e)}'
+        }), 500)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    EpochStore(current_app.config['EPOCH_STORE_FOLDER']).delete(dataset_id)
+    # Uploads are content addressed, so a file may still belong to another dataset
+    for content_hash, filename in stored_files:
+        shared = db.or_(Dataset.content_hash == content_hash, Dataset.nav_hash == content_hash)
+        if Dataset.query.filter(shared).first() is None:
+            path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                raw_archive.delete(content_hash)
+            except Exception as e:
+                # The dataset is gone either way; an orphaned archive copy only costs space
+                logger.warning(f"Could not remove {content_hash} from the raw archive: {str(e)}")
+    logger.info(f"Dataset {dataset_id} deleted")
+
+    response = make_response(json.dumps({
+        'success': True,
+        'message': 'Dataset deleted'
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/datasets/<int:dataset_id>/epochs', methods=['GET'])
+@login_required
+def get_epochs(dataset_id):
+    """Get stored per-epoch data for an optional time window."""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    
+    if dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized access attempt to dataset {dataset_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    reader = EpochStore(current_app.config['EPOCH_STORE_FOLDER']).open(dataset_id)
+    if reader is None:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'No epoch data stored for this dataset'
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    try:
+        columns = request.args.get('columns')
+        columns = columns.split(',') if columns else reader.columns
+        limit = max(0, min(request.args.get('limit', 10000, type=int), 100000))
+        start, end = request.args.get('start'), request.args.get('end')
+        count = reader.window_count(start, end)
+        # Only the returned epochs are read, however large the window
+        data = reader.read(columns, start=start, end=end, limit=limit)
+    except (KeyError, ValueError) as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': f'Invalid request: {str(e)}'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    payload = {}
+    for name, values in data.items():
+        if name == TIME_COLUMN:
+            # Milliseconds since the Unix epoch, as used by JavaScript dates
+            values = values.astype('datetime64[ms]').astype(np.int64)
+        payload[name] = values.tolist()
+
+    response = make_response(json.dumps({
+        'success': True,
+        'count': count,
+        'truncated': count > limit,
+        'columns': payload
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/datasets/<int:dataset_id>/export', methods=['GET'])
+@login_required
+def export_epochs(dataset_id):
+    """Download the stored per-epoch data as a streamed file.
+    
+    Query parameters: format=csv|geojson|gpx|parquet (default csv), start and
+    end (optional time window), fix=fixed,float,... (optional fix classes),
+    columns (optional, CSV, GeoJSON points and Parquet) and
+    geometry=points|line (GeoJSON)
+    """
+    dataset = Dataset.query.get_or_404(dataset_id)
+    
+    if dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized access attempt to dataset {dataset_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    reader = EpochStore(current_app.config['EPOCH_STORE_FOLDER']).open(dataset_id)
+    if reader is None:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'No epoch data stored for this dataset'
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    output_format = request.args.get('format', 'csv')
+    try:
+        columns = request.args.get('columns')
+        fix = request.args.get('fix')
+        export = EpochExport(reader,
+                             columns=columns.split(',') if columns else None,
+                             start=request.args.get('start'),
+                             end=request.args.get('end'),
+                             fix=fix.split(',') if fix else None,
+                             name=dataset.name)
+        chunks = export.stream(output_format, request.args.get('geometry', 'points'))
+    except (KeyError, ValueError) as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': f'Invalid request: {str(e)}'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    mimetype, extension = EXPORT_FORMATS[output_format]
+    filename = f"{os.path.splitext(secure_filename(dataset.name))[0] or f'dataset_{dataset_id}'}.{extension}"
+    logger.info(f"Exporting dataset {dataset_id} as {output_format}")
+    # The body is generated batch by batch while it is sent
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+MAX_TRACK_POINTS = 20000
+
+@bp.route('/datasets/<int:dataset_id>/track', methods=['GET'])
+@login_required
+def get_track(dataset_id):
+    """Get the dataset track simplified for a map view.
+    
+    Query parameters: bbox=minLon,minLat,maxLon,maxLat (optional), zoom
+    (web map zoom level) and format=polyline (default, JSON with an encoded
+    polyline) or f32 (binary little-endian Float32 lat/lon offsets from the
+    origin given in the X-Origin-Lat/X-Origin-Lon headers).
+    """
+    dataset = Dataset.query.get_or_404(dataset_id)
+    
+    if dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized access attempt to dataset {dataset_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    reader = EpochStore(current_app.config['EPOCH_STORE_FOLDER']).open(dataset_id)
+    if reader is None or 'latitude' not in reader.dtypes:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'No epoch data stored for this dataset'
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    try:
+        zoom = min(max(request.args.get('zoom', MAX_ZOOM, type=int), 0), MAX_ZOOM)
+        output_format = request.args.get('format', 'polyline')
+        if output_format not in ('polyline', 'f32'):
+            raise ValueError(f"unknown format {output_format}")
+        bbox = request.args.get('bbox')
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(','))
+    except ValueError as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': f'Invalid request: {str(e)}'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    if TRACK_LEVEL_COLUMN in reader.dtypes:
+        levels = reader.column(TRACK_LEVEL_COLUMN)
+    else:
+        # Datasets processed before levels were precomputed by the job; they are
+        # stored when the dataset is processed again, requests never write
+        levels = track_levels(reader.column('latitude'), reader.column('longitude'))
+    latitude = reader.column('latitude')
+    longitude = reader.column('longitude')
+    if bbox:
+        visible = (latitude >= min_lat) & (latitude <= max_lat) & (longitude >= min_lon) & (longitude <= max_lon)
+        # Keep the neighbours of visible points so lines run to the map edge
+        visible[1:] |= visible[:-1].copy()
+        visible[:-1] |= visible[1:].copy()
+        candidates = np.flatnonzero(visible)
+    else:
+        candidates = np.arange(len(levels))
+
+    # Lower the level when the view would still hold too many points
+    counts = np.cumsum(np.bincount(levels[candidates], minlength=MAX_ZOOM + 1))
+    while zoom > 0 and counts[zoom] > MAX_TRACK_POINTS:
+        zoom -= 1
+    selected = candidates[levels[candidates] <= zoom]
+    lat = np.asarray(latitude[selected], dtype=np.float64)
+    lon = np.asarray(longitude[selected], dtype=np.float64)
+
+    if output_format == 'f32':
+        origin_lat = float(lat[0]) if len(lat) else 0.0
+        origin_lon = float(lon[0]) if len(lon) else 0.0
+        offsets = np.column_stack((lat - origin_lat, lon - origin_lon)).astype('<f4')
+        response = make_response(offsets.tobytes(), 200)
+        response.headers['Content-Type'] = 'application/octet-stream'
+        response.headers['X-Origin-Lat'] = repr(origin_lat)
+        response.headers['X-Origin-Lon'] = repr(origin_lon)
+        response.headers['X-Point-Count'] = str(len(selected))
+        response.headers['X-Zoom'] = str(zoom)
+        return response
+
+    # Decimal digits resolving a tenth of a 256 px tile pixel at the returned zoom
+    precision = int(min(max(np.ceil(np.log10(2 ** zoom * 2560 / 360.0)), 5), 7))
+    response = make_response(json.dumps({
+        'success': True,
+        'count': int(len(selected)),
+        'total': reader.count,
+        'zoom': zoom,
+        'precision': precision,
+        'polyline': encode_polyline(lat, lon, precision)
+    }), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+MAX_TIMESERIES_WINDOWS = 20000
+
+@bp.route('/datasets/<int:dataset_id>/timeseries', methods=['GET'])
+@login_required
+def get_timeseries(dataset_id):
+    """Get windowed and rolling accuracy statistics for plotting."""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    
+    if dataset.user_id != current_user.id:
+        logger.warning(f"Unauthorized access attempt to dataset {dataset_id} by user {current_user.id}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Unauthorized access'
+        }), 403)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    reader = EpochStore(current_app.config['EPOCH_STORE_FOLDER']).open(dataset_id)
+    if reader is None:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'No epoch data stored for this dataset'
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    window_epochs = request.args.get('epochs', type=int)
+    window_seconds = None if window_epochs is not None else request.args.get('window', 60.0, type=float)
+    rolling_epochs = request.args.get('rolling', type=int)
+    threshold = request.args.get('threshold', type=float)
+    hold_epochs = request.args.get('hold', 10, type=int)
+    for name, value in (('epochs', window_epochs), ('window', window_seconds),
+                        ('rolling', rolling_epochs), ('hold', hold_epochs)):
+        if value is not None and not 0 < value < float('inf'):
+            response = make_response(json.dumps({
+                'success': False,
+                'error': f'Invalid request: {name} must be a positive number'
+            }), 400)
+            response.headers['Content-Type'] = 'application/json'
+            return response
+
+    quality_columns = [name for name in ('fix_class', 'quality', 'solution_type') if name in reader.columns][:1]
+    try:
+        columns = reader.read(['timestamp', 'horizontal_error', 'vertical_error'] + quality_columns,
+                              start=request.args.get('start'), end=request.args.get('end'))
+        series = accuracy_timeseries(columns, window_seconds, window_epochs, rolling_epochs)
+    except ValueError as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': f'Invalid request: {str(e)}'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    if len(series['time']) > MAX_TIMESERIES_WINDOWS:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': f'Too many windows ({len(series["time"])}), use a larger window'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    timestamps = columns['timestamp']
+    fixed = fix_classes(columns) == FIX_FIXED if quality_columns else np.zeros(len(timestamps), dtype=bool)
+
+    def to_ms(values):
+        return values.astype('datetime64[ms]').astype(np.int64).tolist()
+
+    payload = {
+        'success': True,
+        'time': to_ms(series['time']),
+        'end_time': to_ms(series['end_time']),
+        'count': series['count'].tolist(),
+        'horizontal': {name: values.tolist() for name, values in series['horizontal'].items()},
+        'vertical': {name: values.tolist() for name, values in series['vertical'].items()},
+        'time_to_first_fix': time_to_first_fix(timestamps, fixed),
+        'convergence_time': (convergence_time(timestamps, columns['horizontal_error'], threshold, hold_epochs)
+                             if threshold else None)
+    }
+    if 'rolling_rmse' in series:
+        payload['rolling_rmse'] = {name: values.tolist() for name, values in series['rolling_rmse'].items()}
+
+    response = make_response(json.dumps(payload), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+def _live_stream(stream_id):
+    """Look up a live stream of the current user, or return an error response"""
+    stream = live_ingest.get(stream_id)
+    if stream is None or stream.user_id != current_user.id:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'Live stream not found'
+        }), 404)
+        response.headers['Content-Type'] = 'application/json'
+        return None, response
+    return stream, None
+
+@bp.route('/live/streams', methods=['GET'])
+@login_required
+def list_live_streams():
+    """List the current user's live streams with their statistics."""
+    payload = [json_safe(stream.to_dict()) for stream in live_ingest.streams(current_user.id)]
+    response = make_response(json.dumps(payload), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/live/streams', methods=['POST'])
+@login_required
+def create_live_stream():
+    """Start ingesting a live NMEA/UBX stream.
+    
+    The JSON body gives the source 'host' and 'port', and for an NTRIP
+    caster the 'mountpoint' with optional 'username'/'password'. Errors are
+    measured against 'base_station_id' when given, otherwise against the
+    stream's running mean position. Hosts that do not resolve are rejected
+    with 400, hosts outside LIVE_STREAM_ALLOWED_HOSTS (by default: any
+    private, loopback or link-local address) with 403.
+    """
+    params = request.get_json(silent=True) or {}
+    host = (params.get('host') or '').strip()
+    try:
+        port = int(params.get('port'))
+    except (TypeError, ValueError):
+        port = None
+    if not host or port is None or not 0 < port < 65536:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': 'host and a valid port are required'
+        }), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    reference = None
+    if params.get('base_station_id'):
+        reference = station_coords(params['base_station_id'])
+        if reference is None:
+            response = make_response(json.dumps({
+                'success': False,
+                'error': 'Base station not found'
+            }), 404)
+            response.headers['Content-Type'] = 'application/json'
+            return response
+
+    try:
+        stream = live_ingest.add_stream(
+            current_user.id, params.get('name') or f'{host}:{port}', host, port,
+            mountpoint=params.get('mountpoint') or None,
+            username=params.get('username') or None,
+            password=params.get('password') or None,
+            reference=reference
+        )
+    except StreamTargetError as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e)
+        }), e.status)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+    except ValueError as e:
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e)
+        }), 429)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    response = make_response(json.dumps({
+        'success': True,
+        'stream': json_safe(stream.to_dict())
+    }), 201)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/live/streams/<int:stream_id>', methods=['DELETE'])
+@login_required
+def delete_live_stream(stream_id):
+    """Stop a live stream."""
+    stream, error = _live_stream(stream_id)
+    if error:
+        return error
+    live_ingest.remove_stream(stream.id)
+    response = make_response(json.dumps({'success': True}), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+@bp.route('/live/streams/<int:stream_id>/events', methods=['GET'])
+@login_required
+def live_stream_events(stream_id):
+    """Server-Sent Events feed of a live stream's statistics.
+    
+    Each 'update' event carries the stream's current state. A client that
+    reads slower than updates are produced skips the oldest ones. Each
+    connection holds a request thread, so connections beyond the per
+    process or per user limit are refused with 503.
+    """
+    stream, error = _live_stream(stream_id)
+    if error:
+        return error
+    try:
+        live_ingest.add_subscriber(current_user.id)
+    except ValueError as e:
+        logger.warning(f"Refused live update connection for user {current_user.id}: {str(e)}")
+        response = make_response(json.dumps({
+            'success': False,
+            'error': str(e)
+        }), 503)
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['Retry-After'] = str(LIVE_HEARTBEAT_SECONDS)
+        return response
+    user_id = current_user.id
+    updates = stream.subscribe(live_ingest.subscriber_queue)
+    initial = json.dumps(json_safe(stream.to_dict()))
+
+    def events():
+        try:
+            yield f'event: update\ndata: {initial}\n\n'
+            while True:
+                try:
+                    message = updates.get(timeout=LIVE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is None:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+                yield f'event: update\ndata: {message}\n\n'
+        finally:
+            stream.unsubscribe(updates)
+
+    response = Response(events(), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the events never started
+    response.call_on_close(lambda: live_ingest.remove_subscriber(user_id))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @bp.route('/base-stations', methods=['GET'])
 @login_required
 def get_base_stations():
     """Get list of base stations."""
     logger.info("=== Fetching Base Stations ===")
     try:
-        base_stations = BaseStation.query.all()
-        stations_data = []
-        
-        for station in base_stations:
-            stations_data.append({
-                'id': station.id,
-                'name': station.name,
-                'latitude': station.latitude,
-                'longitude': station.longitude
-            })
-            
+        stations_data = [station.to_dict() for station in base_station_cache.all()]
         logger.info(f"Returning {len(stations_data)} base stations")
         response = make_response(json.dumps(stations_data), 200)
         response.headers['Content-Type'] = 'application/json'
@@ -0,0 +1,66 @@
+"""Preloading for preforking servers.
+
+create_app() only configures the extensions: pandas, pyproj and georinex
+are imported where they are first used, and database and MongoDB
+connections are opened by the first request of each process. A worker
+therefore starts quickly, but pays for the imports and for building
+transformers and the base station cache on its first requests.
+
+Under gunicorn with preload_app (see gunicorn.conf.py) the master process
+calls preload() once before forking, so the workers inherit the imported
+modules, the cached transformers and the base station cache copy-on-write
+instead of each building their own. after_fork() then drops what must not
+be shared between processes: pooled database connections opened by the
+master and its MongoDB client. The job queue and the live ingest loop
+start their threads on first use in each process, so nothing of them is
+inherited.
+"""
+import importlib
+import logging
+import time
+
+from .processors.projection import get_transformer, WGS84_3D, ECEF
+
+logger = logging.getLogger(__name__)
+
+# Modules used while serving requests (uploads, base station lookups, live streams)
+PRELOAD_MODULES = ('numpy', 'pandas', 'pyproj', 'app.processors.gnss_processor', 'app.processors.xyz_processor')
+
+# Transformers between the CRSs every processor uses
+PRELOAD_TRANSFORMERS = ((ECEF, WGS84_3D), (WGS84_3D, ECEF))
+
+
+def preload(app) -> None:
+    """Import heavy modules and fill read-only caches before workers are forked"""
+    started = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    for crs_from, crs_to in PRELOAD_TRANSFORMERS:
+        get_transformer(crs_from, crs_to)
+
+    from . import db
+    from .base_stations import base_station_cache
+
+    with app.app_context():
+        try:
+            # Also builds the transformers to each station's UTM zone
+            base_station_cache.all()
+        except Exception as e:
+            logger.warning(f"Base stations not preloaded, workers load them on first use: {str(e)}")
+        finally:
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+    logger.info(f"Preloaded shared state in {time.perf_counter() - started:.2f}s")
+
+
+def after_fork(app) -> None:
+    """Drop connections inherited from the parent process"""
+    from . import db
+    from .mongo import mongo
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's connections open for the parent
+            engine.dispose(close=False)
+    mongo.reset()
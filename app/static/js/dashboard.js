@@ -1,3 +1,8 @@
+let dashboardMap = null;
+let trackLayer = null;
+let trackDatasetId = null;
+const liveSources = {};
+
 // Dashboard initialization
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize map
@@ -5,6 +10,14 @@ document.addEventListener('DOMContentLoaded', function() {
     L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
         attribution: '© OpenStreetMap contributors'
     }).addTo(map);
+    dashboardMap = map;
+
+    // Reload the visible part of the selected track at the new zoom level
+    map.on('moveend', () => {
+        if (trackDatasetId !== null) {
+            loadTrack(trackDatasetId);
+        }
+    });
 
     // Initialize accuracy chart
     const ctx = document.getElementById('accuracyChart').getContext('2d');
@@ -41,6 +54,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Load datasets
     loadDatasets();
+    loadLiveStreams();
+    document.getElementById('liveStreamForm').addEventListener('submit', startLiveStream);
 
     // Event listeners
     document.getElementById('uploadBtn').addEventListener('click', () => {
@@ -48,16 +63,25 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
-// Load and display datasets
+// Load and display datasets, following the listing's pages
 async function loadDatasets() {
     try {
-        const response = await fetch('/api/results');
-        if (!response.ok) throw new Error('Failed to fetch datasets');
-        
-        const data = await response.json();
+        const data = [];
+        let cursor = null;
+        do {
+            const url = cursor ? `/api/results?cursor=${encodeURIComponent(cursor)}` : '/api/results';
+            const response = await fetch(url);
+            if (!response.ok) throw new Error('Failed to fetch datasets');
+
+            const page = await response.json();
+            data.push(...page.results);
+            cursor = page.next_cursor;
+        } while (cursor);
+
         updateResultsTable(data);
-        updateMap(data);
-        updateChart(data);
+        const processed = data.filter(dataset => dataset.results);
+        updateMap(processed);
+        updateChart(processed);
     } catch (error) {
         console.error('Error loading datasets:', error);
         showAlert('Error loading datasets', 'danger');
@@ -70,18 +94,21 @@ function updateResultsTable(data) {
     tbody.innerHTML = '';
 
     data.forEach(dataset => {
+        const results = dataset.results;
         const row = document.createElement('tr');
         row.innerHTML = `
             <td>${dataset.name}</td>
             <td>${new Date(dataset.upload_date).toLocaleDateString()}</td>
             <td>${dataset.format_type}</td>
-            <td>${dataset.results.horizontal.rmse.toFixed(3)} m</td>
-            <td>${dataset.results.vertical.rmse.toFixed(3)} m</td>
-            <td>${dataset.results.num_points}</td>
+            <td>${results ? `${results.horizontal.rmse.toFixed(3)} m` : dataset.processing_status}</td>
+            <td>${results ? `${results.vertical.rmse.toFixed(3)} m` : ''}</td>
+            <td>${results ? results.num_points : ''}</td>
             <td>
-                <button class="btn btn-sm btn-info" onclick="showDetails(${dataset.id})">
+                <button class="btn btn-sm btn-info" onclick="showDetails(${dataset.id})" ${results ? '' : 'disabled'}>
                     Details
                 </button>
+                ${results ? `<a class="btn btn-sm btn-secondary" href="/api/datasets/${dataset.id}/export?format=csv">CSV</a>
+                <a class="btn btn-sm btn-secondary" href="/api/datasets/${dataset.id}/export?format=gpx">GPX</a>` : ''}
                 <button class="btn btn-sm btn-danger" onclick="deleteDataset(${dataset.id})">
                     Delete
                 </button>
@@ -93,7 +120,8 @@ function updateResultsTable(data) {
 
 // Update map with dataset points
 function updateMap(data) {
-    const map = L.map('map');
+    const map = dashboardMap;
+    if (!map) return;
     map.eachLayer((layer) => {
         if (layer instanceof L.Marker) {
             map.removeLayer(layer);
@@ -160,14 +188,34 @@ function showDetails(datasetId) {
             document.getElementById('verticalMax').textContent = `${data.results.vertical.max.toFixed(3)} m`;
             document.getElementById('verticalMin').textContent = `${data.results.vertical.min.toFixed(3)} m`;
 
+            const formatMetric = value => value == null ? 'n/a' : `${value.toFixed(3)} m`;
+            document.getElementById('horizontalCEP50').textContent = formatMetric(data.results.horizontal.cep50);
+            document.getElementById('horizontalCEP95').textContent = formatMetric(data.results.horizontal.cep95);
+            document.getElementById('horizontal2DRMS').textContent = formatMetric(data.results.horizontal['2drms']);
+            document.getElementById('verticalLE95').textContent = formatMetric(data.results.vertical.le95);
+            document.getElementById('r95').textContent = formatMetric(data.results.r95);
+
             document.getElementById('refLat').textContent = data.results.reference_position.latitude.toFixed(7);
             document.getElementById('refLon').textContent = data.results.reference_position.longitude.toFixed(7);
             document.getElementById('refAlt').textContent = `${data.results.reference_position.altitude.toFixed(3)} m`;
-            document.getElementById('refMode').textContent = data.results.reference_mode;
+            const estimation = data.results.reference_estimation;
+            document.getElementById('refMode').textContent = estimation
+                ? `${data.results.reference_mode} (${estimation.estimator}, ${estimation.rejected_outliers} outliers rejected)`
+                : data.results.reference_mode;
+            showFixStats(data.results.fix_stats);
 
             // Show modal
             const modal = new bootstrap.Modal(document.getElementById('analysisModal'));
             modal.show();
+
+            loadTimeseries(datasetId);
+
+            // Show the track around the reference position
+            trackDatasetId = datasetId;
+            dashboardMap.setView([
+                data.results.reference_position.latitude,
+                data.results.reference_position.longitude
+            ], 17);
         })
         .catch(error => {
             console.error('Error loading dataset details:', error);
@@ -175,6 +223,203 @@ function showDetails(datasetId) {
         });
 }
 
+// Show metrics per fix type, fixed time and fix-loss events
+function showFixStats(fixStats) {
+    const section = document.getElementById('fixStatsSection');
+    if (!fixStats) {
+        section.style.display = 'none';
+        return;
+    }
+    const formatMetric = value => value == null ? 'n/a' : `${value.toFixed(3)} m`;
+    document.getElementById('fixStatsTable').innerHTML = Object.entries(fixStats.classes).map(([name, stats]) => `
+        <tr>
+            <td>${name}</td>
+            <td>${stats.epochs}</td>
+            <td>${stats.percentage.toFixed(1)}%</td>
+            <td>${formatMetric(stats.horizontal.rmse)}</td>
+            <td>${formatMetric(stats.vertical.rmse)}</td>
+        </tr>
+    `).join('');
+    const losses = fixStats.fix_loss;
+    document.getElementById('fixedTime').textContent =
+        fixStats.fixed_time_percentage == null ? 'n/a' : `${fixStats.fixed_time_percentage.toFixed(1)}%`;
+    document.getElementById('fixLosses').textContent = losses.events
+        ? `${losses.events} (longest ${losses.max_duration.toFixed(1)} s)`
+        : '0';
+    section.style.display = '';
+}
+
+// Decode a Google encoded polyline into [lat, lon] pairs
+function decodePolyline(encoded, precision = 5) {
+    const factor = Math.pow(10, precision);
+    const points = [];
+    let index = 0, lat = 0, lon = 0;
+    while (index < encoded.length) {
+        const deltas = [0, 0];
+        for (let i = 0; i < 2; i++) {
+            let result = 0, shift = 0, byte;
+            do {
+                byte = encoded.charCodeAt(index++) - 63;
+                result += (byte & 0x1f) * Math.pow(2, shift);
+                shift += 5;
+            } while (byte >= 0x20);
+            deltas[i] = (result % 2) ? -(result + 1) / 2 : result / 2;
+        }
+        lat += deltas[0];
+        lon += deltas[1];
+        points.push([lat / factor, lon / factor]);
+    }
+    return points;
+}
+
+// Load the simplified track of a dataset for the visible map area
+async function loadTrack(datasetId) {
+    const map = dashboardMap;
+    if (!map) return;
+
+    const bounds = map.getBounds();
+    const bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()].join(',');
+    try {
+        const response = await fetch(`/api/datasets/${datasetId}/track?bbox=${bbox}&zoom=${map.getZoom()}`);
+        const data = await response.json();
+        if (!data.success || datasetId !== trackDatasetId) return;
+
+        if (trackLayer) {
+            map.removeLayer(trackLayer);
+        }
+        trackLayer = L.polyline(decodePolyline(data.polyline, data.precision), {
+            color: 'rgba(54, 162, 235, 1)',
+            weight: 2
+        }).addTo(map);
+    } catch (error) {
+        console.error('Error loading track:', error);
+    }
+}
+
+// Plot windowed RMSE of a dataset on the accuracy chart
+async function loadTimeseries(datasetId, windowSeconds = 60) {
+    const chart = Chart.getChart('accuracyChart');
+    if (!chart) return;
+
+    try {
+        const response = await fetch(`/api/datasets/${datasetId}/timeseries?window=${windowSeconds}`);
+        const data = await response.json();
+        if (!data.success) return;
+
+        chart.data.datasets = [
+            {
+                label: 'Horizontal RMSE',
+                data: data.time.map((t, i) => ({ x: t, y: data.horizontal.rmse[i] })),
+                backgroundColor: 'rgba(54, 162, 235, 0.5)',
+                borderColor: 'rgba(54, 162, 235, 1)',
+                showLine: true
+            },
+            {
+                label: 'Vertical RMSE',
+                data: data.time.map((t, i) => ({ x: t, y: data.vertical.rmse[i] })),
+                backgroundColor: 'rgba(255, 99, 132, 0.5)',
+                borderColor: 'rgba(255, 99, 132, 1)',
+                showLine: true
+            }
+        ];
+        chart.update();
+    } catch (error) {
+        console.error('Error loading accuracy time series:', error);
+    }
+}
+
+// Live streams: one row per stream, updated from its Server-Sent Events feed
+async function loadLiveStreams() {
+    try {
+        const response = await fetch('/api/live/streams');
+        if (!response.ok) throw new Error('Failed to fetch live streams');
+        const streams = await response.json();
+        streams.forEach(stream => {
+            updateLiveRow(stream);
+            subscribeLiveStream(stream.id);
+        });
+    } catch (error) {
+        console.error('Error loading live streams:', error);
+    }
+}
+
+async function startLiveStream(event) {
+    event.preventDefault();
+    const formData = new FormData(event.target);
+    try {
+        const response = await fetch('/api/live/streams', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(Object.fromEntries(formData.entries()))
+        });
+        const data = await response.json();
+        if (!response.ok || !data.success) throw new Error(data.error || 'Failed to start live stream');
+        updateLiveRow(data.stream);
+        subscribeLiveStream(data.stream.id);
+        event.target.reset();
+    } catch (error) {
+        console.error('Error starting live stream:', error);
+        showAlert(error.message, 'danger');
+    }
+}
+
+function subscribeLiveStream(streamId) {
+    if (liveSources[streamId]) return;
+    const source = new EventSource(`/api/live/streams/${streamId}/events`);
+    source.addEventListener('update', (event) => updateLiveRow(JSON.parse(event.data)));
+    source.addEventListener('end', () => {
+        source.close();
+        delete liveSources[streamId];
+        document.getElementById(`liveStream${streamId}`)?.remove();
+    });
+    liveSources[streamId] = source;
+}
+
+function formatMetres(value) {
+    return value === null || value === undefined ? '-' : `${value.toFixed(3)} m`;
+}
+
+function updateLiveRow(stream) {
+    const tbody = document.querySelector('#liveStreamsTable tbody');
+    let row = document.getElementById(`liveStream${stream.id}`);
+    if (!row) {
+        row = document.createElement('tr');
+        row.id = `liveStream${stream.id}`;
+        tbody.appendChild(row);
+    }
+    const stats = stream.stats;
+    row.innerHTML = `
+        <td>${stream.name}</td>
+        <td title="${stream.error || ''}">${stream.status}</td>
+        <td>${stats.epochs}</td>
+        <td>${stats.last_fix ? stats.last_fix.fix_class : '-'}</td>
+        <td>${formatMetres(stats.horizontal.rmse)}</td>
+        <td>${formatMetres(stats.horizontal.cep95)}</td>
+        <td>${formatMetres(stats.vertical.rmse)}</td>
+        <td>${formatMetres(stats.rolling.horizontal_rmse)}</td>
+        <td>
+            <button class="btn btn-sm btn-danger" onclick="stopLiveStream(${stream.id})">
+                Stop
+            </button>
+        </td>
+    `;
+}
+
+async function stopLiveStream(streamId) {
+    try {
+        const response = await fetch(`/api/live/streams/${streamId}`, { method: 'DELETE' });
+        if (!response.ok) throw new Error('Failed to stop live stream');
+        if (liveSources[streamId]) {
+            liveSources[streamId].close();
+            delete liveSources[streamId];
+        }
+        document.getElementById(`liveStream${streamId}`)?.remove();
+    } catch (error) {
+        console.error('Error stopping live stream:', error);
+        showAlert('Error stopping live stream', 'danger');
+    }
+}
+
 // Delete dataset
 async function deleteDataset(datasetId) {
     if (!confirm('Are you sure you want to delete this dataset?')) return;
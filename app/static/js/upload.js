@@ -1,3 +1,7 @@
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_CHUNK_RETRIES = 3;
+
 document.addEventListener('DOMContentLoaded', function() {
     const form = document.getElementById('uploadForm');
     const progressBar = document.querySelector('#uploadProgress .progress-bar');
@@ -20,6 +24,17 @@ document.addEventListener('DOMContentLoaded', function() {
                 baseStation: formData.get('base_station_id')
             });
 
+            // Large files are sent in resumable chunks and parsed while uploading
+            const file = formData.get('file');
+            const navFile = formData.get('nav_file');
+            if (file && file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                const uploadData = await uploadInChunks(file, navFile && navFile.size ? navFile : null,
+                    formData.get('base_station_id'), formData.get('campaign'), progressBar, statusDiv);
+                await processDataset(uploadData.dataset_id, progressBar, statusDiv);
+                showUploadSuccess(progressBar, statusDiv);
+                return;
+            }
+
             // Upload file
             console.log('Sending upload request...');
             const uploadResponse = await fetch('/api/upload', {
@@ -87,15 +102,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(processData.error || 'Processing failed');
             }
 
-            // Update UI for success
-            progressBar.style.width = '100%';
-            statusDiv.textContent = 'Success!';
-            showAlert('File uploaded and processed successfully', 'success');
+            // Processing runs in the background, poll the job until it finishes
+            // (cached results for previously analysed files come back immediately)
+            if (processData.job) {
+                await waitForJob(processData.job.id, progressBar, statusDiv);
+            }
 
-            // Redirect to dashboard
-            setTimeout(() => {
-                window.location.href = '/dashboard';
-            }, 1500);
+            showUploadSuccess(progressBar, statusDiv);
 
         } catch (error) {
             console.error('Error during upload/process:', error);
@@ -105,6 +118,142 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+function showUploadSuccess(progressBar, statusDiv) {
+    // Update UI for success
+    progressBar.style.width = '100%';
+    statusDiv.textContent = 'Success!';
+    showAlert('File uploaded and processed successfully', 'success');
+
+    // Redirect to dashboard
+    setTimeout(() => {
+        window.location.href = '/dashboard';
+    }, 1500);
+}
+
+// Send a file in resumable chunks; the server parses it while it arrives.
+// A RINEX navigation file is sent whole with the completion request.
+async function uploadInChunks(file, navFile, baseStationId, campaign, progressBar, statusDiv) {
+    const startResponse = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            filename: file.name,
+            base_station_id: baseStationId || null,
+            campaign: campaign || null
+        })
+    });
+    const session = await startResponse.json();
+    if (!startResponse.ok || !session.success) {
+        throw new Error(session.error || 'Could not start upload');
+    }
+
+    const chunkSize = Math.min(UPLOAD_CHUNK_SIZE, session.max_chunk_size || UPLOAD_CHUNK_SIZE);
+    let offset = 0;
+    let failures = 0;
+    while (offset < file.size) {
+        let data;
+        try {
+            const response = await fetch(`/api/uploads/${session.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: {
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/octet-stream'
+                },
+                body: file.slice(offset, offset + chunkSize)
+            });
+            data = await response.json();
+            if (response.status === 409 && data.offset !== null) {
+                // Resume from what the server actually received
+                offset = data.offset;
+                continue;
+            }
+            if (!response.ok || !data.success) {
+                throw new Error(data.error || 'Chunk upload failed');
+            }
+        } catch (error) {
+            if (++failures > UPLOAD_CHUNK_RETRIES) {
+                throw error;
+            }
+            const status = await fetch(`/api/uploads/${session.upload_id}`).then(r => r.json());
+            offset = status.offset;
+            continue;
+        }
+
+        failures = 0;
+        offset = data.offset;
+        // Upload accounts for the first half of the bar
+        progressBar.style.width = `${Math.round(offset / file.size * 50)}%`;
+        statusDiv.textContent = `Uploading... ${Math.round(offset / 1048576)} of ${Math.round(file.size / 1048576)} MB`
+            + (data.epochs_parsed ? ` (${data.epochs_parsed} epochs parsed)` : '');
+    }
+
+    const completeBody = new FormData();
+    if (navFile) {
+        completeBody.append('nav_file', navFile);
+    }
+    const completeResponse = await fetch(`/api/uploads/${session.upload_id}/complete?size=${file.size}`, {
+        method: 'POST',
+        headers: {
+            'Accept': 'application/json'
+        },
+        body: completeBody
+    });
+    const uploadData = await completeResponse.json();
+    if (!completeResponse.ok || !uploadData.success) {
+        throw new Error(uploadData.error || 'Upload failed');
+    }
+    return uploadData;
+}
+
+async function processDataset(datasetId, progressBar, statusDiv) {
+    statusDiv.textContent = 'Processing...';
+    const response = await fetch(`/api/process/${datasetId}`, {
+        method: 'POST',
+        headers: {
+            'Accept': 'application/json'
+        }
+    });
+    const data = await response.json();
+    if (!response.ok || !data.success) {
+        throw new Error(data.error || 'Processing failed');
+    }
+    if (data.job) {
+        await waitForJob(data.job.id, progressBar, statusDiv);
+    }
+}
+
+async function waitForJob(jobId, progressBar, statusDiv) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`, {
+            headers: {
+                'Accept': 'application/json'
+            }
+        });
+        const data = await response.json();
+
+        if (!response.ok || !data.success) {
+            throw new Error(data.error || 'Failed to fetch job status');
+        }
+
+        const job = data.job;
+        if (job.status === 'done') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Processing failed');
+        }
+
+        // Upload accounts for the first half of the bar, processing for the second
+        progressBar.style.width = `${50 + Math.round(job.progress * 50)}%`;
+        statusDiv.textContent = job.status === 'queued' ? 'Queued...' : 'Processing...';
+
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function loadBaseStations() {
     try {
         console.log('Fetching base stations...');
@@ -0,0 +1,51 @@
+"""Benchmark per-point versus batched UTM projection.
+
+Usage:
+    python -m benchmarks.bench_projection [--points 1000000]
+"""
+import argparse
+import time
+import numpy as np
+from app.processors.projection import get_transformer, utm_crs, WGS84
+
+
+def make_positions(n: int, seed: int = 0):
+    """Generate n positions scattered around a site in southern Norway"""
+    rng = np.random.default_rng(seed)
+    lat = 60.8 + rng.normal(0.0, 1e-4, n)
+    lon = 11.12 + rng.normal(0.0, 1e-4, n)
+    return lat, lon
+
+
+def bench_per_point(transformer, lat, lon) -> float:
+    start = time.perf_counter()
+    for i in range(len(lat)):
+        transformer.transform(lon[i], lat[i])
+    return time.perf_counter() - start
+
+
+def bench_batched(transformer, lat, lon) -> float:
+    start = time.perf_counter()
+    transformer.transform(lon, lat)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    lat, lon = make_positions(args.points)
+    transformer = get_transformer(WGS84, utm_crs(lat[0], lon[0]))
+
+    batched = bench_batched(transformer, lat, lon)
+    per_point = bench_per_point(transformer, lat, lon)
+
+    print(f"points:    {args.points}")
+    print(f"per-point: {per_point:.3f} s ({args.points / per_point:,.0f} points/s)")
+    print(f"batched:   {batched:.3f} s ({args.points / batched:,.0f} points/s)")
+    print(f"speedup:   {per_point / batched:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark vectorised single point positioning on a synthetic 24h, 30s dataset.
+
+Broadcast ephemerides for a 31-satellite constellation and pseudoranges
+for a static receiver are simulated, then solved once with all epochs
+batched and once epoch by epoch.
+
+Usage:
+    python -m benchmarks.bench_rinex_spp [--epochs 2880] [--interval 30]
+"""
+import argparse
+import time
+import numpy as np
+from app.processors.projection import get_transformer, ECEF, WGS84_3D
+from app.processors.rinex_spp import (
+    Ephemerides, EPHEMERIS_FIELDS, OMEGA_E, SPEED_OF_LIGHT, SECONDS_PER_WEEK,
+    gps_seconds, satellite_positions, solve_positions, _troposphere_delay
+)
+
+START = np.datetime64('2024-03-15T00:00:00', 'ns')
+RECEIVER_LLA = (60.8, 11.12, 200.0)
+
+
+def make_ephemerides(start: np.datetime64, hours: float, n_satellites: int = 31) -> Ephemerides:
+    """Six-plane constellation with a new ephemeris every two hours"""
+    t0 = gps_seconds(np.array([start]))[0]
+    week = np.floor(t0 / SECONDS_PER_WEEK)
+    toc = t0 + np.arange(0.0, hours * 3600 + 7200, 7200)
+    sv, times, fields = [], [], {name: [] for name in EPHEMERIS_FIELDS}
+    rng = np.random.default_rng(1)
+    for k in range(n_satellites):
+        clock = rng.normal(0, 1e-4)
+        for t in toc:
+            sv.append(f'G{k + 1:02d}')
+            times.append(t)
+            values = dict.fromkeys(EPHEMERIS_FIELDS, 0.0)
+            values.update({
+                'sqrtA': 5153.7, 'Eccentricity': 0.005 + 0.001 * (k % 5), 'Io': 0.96,
+                'Omega0': (k % 6) * np.pi / 3, 'M0': k * 2 * np.pi / n_satellites * 6.3,
+                'OmegaDot': -8e-9, 'GPSWeek': week, 'Toe': t - week * SECONDS_PER_WEEK,
+                'SVclockBias': clock
+            })
+            # Keep the orbit continuous across records: M0 refers to each record's toe
+            values['M0'] += np.sqrt(3.986005e14 / 5153.7 ** 6) * (t - toc[0])
+            for name in EPHEMERIS_FIELDS:
+                fields[name].append(values[name])
+    return Ephemerides(sv, np.array(times), {name: np.array(v) for name, v in fields.items()})
+
+
+def simulate(ephemerides: Ephemerides, times: np.ndarray, receiver: np.ndarray, noise: float = 1.0):
+    """Pseudoranges of all satellites above 10 degrees, including light time and Earth rotation"""
+    satellites = ephemerides.satellites
+    t_rx = gps_seconds(times)[:, None]
+    eph, valid = ephemerides.select(satellites, t_rx[:, 0])
+    receiver_clock = 1e-4 * SPEED_OF_LIGHT
+
+    tau = np.full(valid.shape, 0.075)
+    for _ in range(4):
+        x, y, z, clock = satellite_positions(eph, t_rx - tau)
+        theta = OMEGA_E * tau
+        x, y = x * np.cos(theta) + y * np.sin(theta), -x * np.sin(theta) + y * np.cos(theta)
+        dx, dy, dz = x - receiver[0], y - receiver[1], z - receiver[2]
+        rho = np.sqrt(dx * dx + dy * dy + dz * dz)
+        tau = rho / SPEED_OF_LIGHT
+
+    elevation = np.arcsin((dx * receiver[0] + dy * receiver[1] + dz * receiver[2]) / (rho * np.linalg.norm(receiver)))
+    ranges = (rho + receiver_clock - SPEED_OF_LIGHT * clock + _troposphere_delay(np.maximum(elevation, 0.05))
+              + np.random.default_rng(2).normal(0, noise, rho.shape))
+    ranges[~valid | (elevation < np.radians(10))] = np.nan
+    return satellites, ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--epochs', type=int, default=2880)
+    parser.add_argument('--interval', type=float, default=30.0)
+    parser.add_argument('--loop-epochs', type=int, default=300, help='Epochs solved one by one for comparison')
+    args = parser.parse_args()
+
+    x, y, z = get_transformer(WGS84_3D, ECEF).transform(RECEIVER_LLA[1], RECEIVER_LLA[0], RECEIVER_LLA[2])
+    receiver = np.array([x, y, z])
+    times = START + (np.arange(args.epochs) * args.interval * 1e9).astype('timedelta64[ns]')
+    ephemerides = make_ephemerides(START, args.epochs * args.interval / 3600)
+    satellites, ranges = simulate(ephemerides, times, receiver)
+
+    start = time.perf_counter()
+    solution = solve_positions(times, satellites, ranges, ephemerides)
+    batched = time.perf_counter() - start
+
+    n_loop = min(args.loop_epochs, args.epochs)
+    start = time.perf_counter()
+    for i in range(n_loop):
+        solve_positions(times[i:i + 1], satellites, ranges[i:i + 1], ephemerides)
+    per_epoch = (time.perf_counter() - start) / n_loop
+
+    valid = solution['valid']
+    errors = np.sqrt((solution['x'][valid] - x) ** 2 + (solution['y'][valid] - y) ** 2
+                     + (solution['z'][valid] - z) ** 2)
+    print(f"Epochs:            {args.epochs} ({int(valid.sum())} solved, "
+          f"{np.nanmean(solution['num_satellites']):.1f} satellites on average)")
+    print(f"Batched solve:     {batched:.3f} s ({args.epochs / batched:,.0f} epochs/s)")
+    print(f"Per-epoch solve:   {per_epoch * args.epochs:.3f} s (extrapolated from {n_loop} epochs)")
+    print(f"Speedup:           {per_epoch * args.epochs / batched:.1f}x")
+    print(f"3D error RMS:      {np.sqrt(np.mean(errors ** 2)):.2f} m, mean PDOP {np.nanmean(solution['pdop']):.2f}")
+
+
+if __name__ == '__main__':
+    main()
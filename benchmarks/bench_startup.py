@@ -0,0 +1,133 @@
+"""Benchmark application startup and first-request latency.
+
+Every run starts a fresh interpreter, as a gunicorn worker would, and times
+in it:
+
+    import       import app
+    create_app   create_app()
+    first        the first request (GET /metrics through the test client)
+    second       the same request again, i.e. without first-use costs
+    processor    building the first GNSSProcessor (imports pandas, pyproj
+                 and the parsers, builds transformers)
+
+With --preload, app.startup.preload() runs after create_app() as it does in
+the gunicorn master, and its time is reported separately; processor then
+shows what a forked worker is left with. The median of --repeat runs is
+reported, with the heavy modules already imported after create_app() and
+the RSS at that point. create_app() opens no connections, so the
+default in-memory SQLite database is enough; set DATABASE_URL to time
+--preload against a real database (it queries the base stations).
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat 5] [--preload] [--importtime 15] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'pyproj', 'georinex', 'xarray', 'pymongo', 'gridfs', 'zstandard')
+STAGES = ('import', 'create_app', 'preload', 'first', 'second', 'processor')
+
+# Runs in the fresh interpreter and prints its timings as JSON
+PROBE = '''
+import json, sys, time
+timings = {}
+start = time.perf_counter()
+import app
+timings['import'] = time.perf_counter() - start
+
+start = time.perf_counter()
+application = app.create_app()
+timings['create_app'] = time.perf_counter() - start
+loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+with open('/proc/self/status') as f:
+    rss = next((int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:')), None)
+
+if PRELOAD:
+    from app.startup import preload
+    start = time.perf_counter()
+    preload(application)
+    timings['preload'] = time.perf_counter() - start
+
+client = application.test_client()
+for stage in ('first', 'second'):
+    start = time.perf_counter()
+    status = client.get('/metrics').status_code
+    timings[stage] = time.perf_counter() - start
+    assert status == 200, status
+
+start = time.perf_counter()
+from app.processors.gnss_processor import GNSSProcessor
+GNSSProcessor()
+timings['processor'] = time.perf_counter() - start
+print(json.dumps({'timings': timings, 'loaded': loaded, 'rss_bytes': rss}))
+'''
+
+
+def run_probe(preload: bool, env: Dict[str, str]) -> Dict:
+    code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\nPRELOAD = {preload!r}\n{PROBE}'
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def import_profile(env: Dict[str, str], top: int) -> List[Dict]:
+    """Modules with the largest cumulative import time of `import app; create_app()`"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'],
+                               cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({'module': name.strip(), 'self_ms': int(self_us) / 1000,
+                        'cumulative_ms': int(cumulative_us) / 1000})
+    return sorted(modules, key=lambda module: module['cumulative_ms'], reverse=True)[:top]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--preload', action='store_true', help='Run app.startup.preload() after create_app()')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='Also list the N slowest imports (python -X importtime)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        env = dict(os.environ)
+        env.setdefault('DATABASE_URL', 'sqlite://')
+        env.setdefault('EPOCH_STORE_FOLDER', os.path.join(work_dir, 'epochs'))
+        env.setdefault('PARSED_CACHE_FOLDER', os.path.join(work_dir, 'parsed'))
+        runs = [run_probe(args.preload, env) for _ in range(args.repeat)]
+        profile = import_profile(env, args.importtime) if args.importtime else []
+
+    seconds = {stage: statistics.median(run['timings'][stage] for run in runs)
+               for stage in STAGES if stage in runs[0]['timings']}
+    for stage, value in seconds.items():
+        print(f"{stage:<11} {value * 1000:9.1f} ms")
+    print(f"startup     {(seconds['import'] + seconds['create_app']) * 1000:9.1f} ms (import + create_app)")
+    print(f"rss         {runs[0]['rss_bytes'] / 1e6:9.1f} MB after create_app")
+    print(f"loaded      {', '.join(runs[0]['loaded']) or 'none'} of {', '.join(HEAVY_MODULES)}")
+    for module in profile:
+        print(f"  {module['cumulative_ms']:8.1f} ms  {module['module']}")
+
+    report = {'repeat': args.repeat, 'preload': args.preload, 'median_seconds': seconds,
+              'rss_bytes': runs[0]['rss_bytes'], 'heavy_modules_loaded': runs[0]['loaded'],
+              'slowest_imports': profile, 'runs': runs}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark bulk UBX decoding against message-by-message pyubx2 parsing.
+
+A synthetic 10 Hz log with NAV-PVT, NAV-HPPOSLLH and NAV-CLOCK frames per
+epoch is written to a temporary file. --irregular interleaves NMEA
+sentences of varying length, so frames are no longer at a constant stride
+and have to be gathered instead of viewed in place.
+
+Usage:
+    python -m benchmarks.bench_ubx [--epochs 360000] [--irregular] [--pyubx2-epochs 20000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from pyubx2 import UBXReader
+
+from app.processors.ubx_processor import (
+    UBXProcessor, NAV_PVT, NAV_PVT_DTYPE, NAV_HPPOSLLH, NAV_HPPOSLLH_DTYPE, FRAME_OVERHEAD,
+    MILLISECONDS_PER_WEEK
+)
+
+START = np.datetime64('2024-03-15T00:00:00', 'ms')
+# GPS time of week of START (a Friday) in milliseconds
+START_TOW = 5 * 86400000
+NAV_CLOCK = (0x01, 0x22, 20)
+
+
+def finish_frames(raw: np.ndarray, message) -> np.ndarray:
+    """Write sync, header and checksum into a (frames, frame length) uint8 matrix"""
+    msg_class, msg_id, length = message
+    raw[:, 0], raw[:, 1], raw[:, 2], raw[:, 3] = 0xB5, 0x62, msg_class, msg_id
+    raw[:, 4], raw[:, 5] = length & 0xFF, length >> 8
+    checked = raw[:, 2:-2].astype(np.uint64)
+    raw[:, -2] = checked.sum(axis=1) & 0xFF
+    raw[:, -1] = (checked @ np.arange(checked.shape[1], 0, -1, dtype=np.uint64)) & 0xFF
+    return raw
+
+
+def make_log(epochs: int, irregular: bool, seed: int = 1) -> bytes:
+    rng = np.random.default_rng(seed)
+    elapsed = np.arange(epochs, dtype=np.int64) * 100
+    times = START + elapsed.astype('timedelta64[ms]')
+    seconds_of_day = (times - times.astype('datetime64[D]')).astype(np.int64)
+    latitude = 60.8 + rng.normal(0, 1e-7, epochs)
+    longitude = 11.12 + rng.normal(0, 2e-7, epochs)
+    height = 200.0 + rng.normal(0, 0.02, epochs)
+
+    pvt = np.zeros(epochs, dtype=NAV_PVT_DTYPE)
+    pvt['iTOW'] = (START_TOW + elapsed) % MILLISECONDS_PER_WEEK
+    days = times.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    pvt['year'] = months.astype(np.int64) // 12 + 1970
+    pvt['month'] = months.astype(np.int64) % 12 + 1
+    pvt['day'] = (days - months).astype(np.int64) + 1
+    pvt['hour'] = seconds_of_day // 3600000
+    pvt['min'] = seconds_of_day // 60000 % 60
+    pvt['sec'] = seconds_of_day // 1000 % 60
+    pvt['nano'] = seconds_of_day % 1000 * 1000000
+    pvt['valid'] = 0x07
+    pvt['fixType'] = 3
+    pvt['flags'] = 0x01 | 0x02 | (2 << 6)
+    pvt['numSV'] = rng.integers(12, 30, epochs)
+    pvt['lat'] = np.round(latitude * 1e7)
+    pvt['lon'] = np.round(longitude * 1e7)
+    pvt['height'] = np.round(height * 1e3)
+    pvt['hMSL'] = pvt['height'] - 39000
+    pvt['hAcc'] = 14
+    pvt['vAcc'] = 20
+    pvt['pDOP'] = 110
+
+    hp = np.zeros(epochs, dtype=NAV_HPPOSLLH_DTYPE)
+    hp['iTOW'] = pvt['iTOW']
+    hp['lat'] = np.floor(latitude * 1e7)
+    hp['latHp'] = np.round((latitude * 1e7 - hp['lat']) * 100)
+    hp['lon'] = np.floor(longitude * 1e7)
+    hp['lonHp'] = np.round((longitude * 1e7 - hp['lon']) * 100)
+    hp['height'] = np.floor(height * 1e3)
+    hp['heightHp'] = np.round((height * 1e3 - hp['height']) * 10)
+    hp['hAcc'] = 140
+    hp['vAcc'] = 200
+
+    clock = np.zeros((epochs, NAV_CLOCK[2] + FRAME_OVERHEAD), dtype=np.uint8)
+    rows = np.hstack((
+        finish_frames(pvt.view(np.uint8).reshape(epochs, -1), NAV_PVT),
+        finish_frames(hp.view(np.uint8).reshape(epochs, -1), NAV_HPPOSLLH),
+        finish_frames(clock, NAV_CLOCK)
+    ))
+    if not irregular:
+        return rows.tobytes()
+    padding = rng.integers(0, 40, epochs)
+    return b''.join(row.tobytes() + b'$GPTXT,01,01,02,' + b'x' * int(n) + b'*00\r\n'
+                    for row, n in zip(rows, padding))
+
+
+def pyubx2_positions(path: str, limit_bytes: int):
+    """Reference decode of NAV-HPPOSLLH positions with pyubx2, message by message"""
+    positions = []
+    with open(path, 'rb') as f:
+        reader = UBXReader(f, protfilter=2)
+        for _, msg in reader:
+            if f.tell() > limit_bytes:
+                break
+            if msg.identity == 'NAV-HPPOSLLH':
+                # Recent pyubx2 versions fold the high precision parts into lat/lon/height
+                positions.append((msg.lat + getattr(msg, 'latHp', 0), msg.lon + getattr(msg, 'lonHp', 0),
+                                  (msg.height + getattr(msg, 'heightHp', 0)) / 1000.0))
+    return np.array(positions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--epochs', type=int, default=360000, help='10 Hz epochs (360000 = 10 hours)')
+    parser.add_argument('--irregular', action='store_true', help='Interleave NMEA sentences between epochs')
+    parser.add_argument('--pyubx2-epochs', type=int, default=20000, help='Epochs decoded with pyubx2')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_log(args.epochs, args.irregular)
+    size_mb = len(data) / 1e6
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.ubx')
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        processor = UBXProcessor()
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = processor.process_ubx_file_bulk(path)
+            timings.append(time.perf_counter() - start)
+        bulk = min(timings)
+        data = result['data']
+
+        limit = int(len(data) * min(1.0, args.pyubx2_epochs / args.epochs))
+        start = time.perf_counter()
+        reference = pyubx2_positions(path, limit)
+        reference_time = time.perf_counter() - start
+
+    n = len(reference)
+    decoded = np.column_stack((data.latitude, data.longitude, data.altitude))[:n]
+    difference = np.abs(decoded - reference).max(axis=0) if n else np.full(3, np.nan)
+    print(f"Log: {args.epochs} epochs, {size_mb:.1f} MB ({'irregular' if args.irregular else 'constant'} stride)")
+    print(f"Bulk NumPy decode: {bulk:.3f} s, {size_mb / bulk:.0f} MB/s, {len(data)} epochs, "
+          f"{result['statistics']['high_precision_epochs']} high precision")
+    print(f"pyubx2 per message: {reference_time:.3f} s for {limit / 1e6:.1f} MB, "
+          f"{limit / 1e6 / reference_time:.1f} MB/s ({n} epochs)")
+    print(f"Speedup: {(len(data) / bulk) / (limit / reference_time):.0f}x")
+    print(f"Max difference vs pyubx2: lat {difference[0]:.2e} deg, lon {difference[1]:.2e} deg, "
+          f"height {difference[2]:.2e} m")
+
+
+if __name__ == '__main__':
+    main()
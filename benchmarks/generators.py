@@ -0,0 +1,239 @@
+"""Deterministic synthetic GNSS data for benchmarks.
+
+All generators simulate a static receiver near 60.8N 11.12E whose solution
+alternates between fixed, float and single segments, with the same seed
+always producing byte-identical files. Data is produced in blocks, so the
+10M epoch sizes can be written without holding the whole file in memory.
+
+    nmea   GGA sentences at 10 Hz, preceded by one RMC for the date
+    xyz    RTKLIB solution lines in the 15-column layout of
+           sample_data/ZS-1289_solution_*.XYZ, at 5 Hz
+    rinex  RINEX 3.04 GPS observations (C1C, C2W) at 30 s and a matching
+           navigation file simulated with benchmarks.bench_rinex_spp
+
+Usage:
+    python -m benchmarks.generators nmea 100000 /tmp/bench.nmea
+"""
+import argparse
+import functools
+import operator
+import os
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from app.processors.projection import get_transformer, WGS84_3D, ECEF
+
+START = np.datetime64('2024-03-15T00:00:00', 'ns')
+SITE = (60.8, 11.12, 200.0)
+BLOCK_EPOCHS = 100000
+
+# File extension of each generated format
+EXTENSIONS = {'nmea': 'nmea', 'xyz': 'xyz', 'rinex': 'rnx'}
+
+# Solution segments: (NMEA quality, RTKLIB Q, horizontal sigma, vertical sigma) in metres
+_SEGMENTS = ((4, 1, 0.01, 0.02), (5, 2, 0.2, 0.4), (1, 5, 1.5, 3.0))
+_METRES_PER_DEGREE = 111320.0
+
+
+def solution_epochs(epochs: int, rate: float, seed: int = 0,
+                    start: int = 0, count: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Positions and solution classes of epochs [start, start + count).
+
+    The receiver is fixed 90% of the time; every 600 epochs a float segment
+    of up to 40 epochs follows, and every 3000 epochs a short single segment.
+    Noise is drawn from a generator seeded per block, so any block can be
+    produced on its own and still match a full run.
+    """
+    count = epochs - start if count is None else count
+    index = np.arange(start, start + count)
+    segment = np.zeros(count, dtype=np.int64)
+    segment[(index % 600) < (index // 600 % 5) * 10] = 1
+    segment[(index % 3000) >= 2990] = 2
+    sigmas = np.array([s[2:] for s in _SEGMENTS])[segment]
+
+    rng = np.random.default_rng([seed, start])
+    noise = rng.normal(size=(count, 3)) * sigmas[:, [0, 0, 1]]
+    latitude = SITE[0] + noise[:, 0] / _METRES_PER_DEGREE
+    longitude = SITE[1] + noise[:, 1] / (_METRES_PER_DEGREE * np.cos(np.radians(SITE[0])))
+    return {
+        'timestamp': START + (index * (1e9 / rate)).astype('timedelta64[ns]'),
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': SITE[2] + noise[:, 2],
+        'segment': segment,
+        'satellites': rng.integers(12, 30, count),
+        'age': 0.2 + (index % 10) * 0.1
+    }
+
+
+def _blocks(epochs: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, epochs, BLOCK_EPOCHS):
+        yield start, min(BLOCK_EPOCHS, epochs - start)
+
+
+def _nmea_checksum(body: bytes) -> str:
+    return f'{functools.reduce(operator.xor, body, 0):02X}'
+
+
+def _degrees_minutes(values: np.ndarray) -> np.ndarray:
+    """Decimal degrees as NMEA dddmm.mmmm values"""
+    degrees = np.floor(values).astype(np.int64)
+    return degrees * 100 + (values - degrees) * 60.0
+
+
+def nmea_blocks(epochs: int, rate: float = 10.0, seed: int = 0) -> Iterator[bytes]:
+    """GGA sentences in blocks of BLOCK_EPOCHS epochs.
+
+    Every field is fixed width, so the bodies of a block form a byte matrix
+    and the XOR checksums are one reduction over its rows.
+    """
+    day = START.astype('datetime64[D]').astype(object)
+    rmc = f"GPRMC,000000.00,A,6048.0000,N,01107.2000,E,0.0,0.0,{day:%d%m%y},,,R".encode()
+    yield b'$' + rmc + b'*' + _nmea_checksum(rmc).encode() + b'\r\n'
+
+    for start, count in _blocks(epochs):
+        data = solution_epochs(epochs, rate, seed, start, count)
+        seconds = (data['timestamp'] - data['timestamp'].astype('datetime64[D]')).astype(np.int64) / 1e9
+        lat = _degrees_minutes(data['latitude'])
+        lon = _degrees_minutes(data['longitude'])
+        quality = np.array([s[0] for s in _SEGMENTS])[data['segment']]
+        bodies = [
+            f"GNGGA,{int(t // 3600):02d}{int(t % 3600 // 60):02d}{t % 60:05.2f},{la:012.7f},N,{lo:013.7f},E,"
+            f"{q},{n:02d},0.7,{h:08.3f},M,39.000,M,{a:3.1f},0000"
+            for t, la, lo, q, n, h, a in zip(seconds, lat, lon, quality, data['satellites'],
+                                             data['altitude'], data['age'])
+        ]
+        raw = '\n'.join(bodies).encode()
+        width = len(bodies[0])
+        matrix = np.frombuffer(raw + b'\n', dtype=np.uint8).reshape(count, width + 1)[:, :width]
+        checksums = np.bitwise_xor.reduce(matrix, axis=1)
+        yield ''.join(f'${body}*{c:02X}\r\n' for body, c in zip(bodies, checksums)).encode()
+
+
+def xyz_blocks(epochs: int, rate: float = 5.0, seed: int = 0) -> Iterator[bytes]:
+    """RTKLIB ECEF solution lines in blocks of BLOCK_EPOCHS epochs"""
+    transformer = get_transformer(WGS84_3D, ECEF)
+    q_codes = np.array([s[1] for s in _SEGMENTS])
+    for start, count in _blocks(epochs):
+        data = solution_epochs(epochs, rate, seed, start, count)
+        x, y, z = transformer.transform(data['longitude'], data['latitude'], data['altitude'])
+        sigma = np.array([s[2] for s in _SEGMENTS])[data['segment']]
+        stamps = np.datetime_as_string(data['timestamp'], unit='ms')
+        q = q_codes[data['segment']]
+        ratio = np.where(q == 1, 5.0 + (np.arange(start, start + count) % 7), 0.0)
+        lines = [
+            f"{s[:4]}/{s[5:7]}/{s[8:10]} {s[11:]}  {xi:13.4f}  {yi:13.4f}  {zi:13.4f}  {qi:2d} {n:3d}  "
+            f"{sd * 0.6:7.4f}  {sd * 0.5:7.4f}  {sd:7.4f}  {0.0:7.4f}  {0.0:7.4f}  {0.0:7.4f}  {a:5.2f}  {r:5.1f}\n"
+            for s, xi, yi, zi, qi, n, sd, a, r in zip(stamps, x, y, z, q, data['satellites'], sigma,
+                                                      data['age'], ratio)
+        ]
+        yield ''.join(lines).encode()
+
+
+def _rinex_line(content: str, label: str) -> str:
+    return f'{content:<60}{label}\n'
+
+
+def _rinex_times(seconds: np.ndarray) -> np.ndarray:
+    return START + (seconds * 1e9).astype('timedelta64[ns]')
+
+
+def write_rinex(obs_path: str, nav_path: str, epochs: int, interval: float = 30.0, seed: int = 0) -> None:
+    """Write a RINEX 3.04 GPS observation file and its navigation file"""
+    from app.processors.rinex_spp import EPHEMERIS_FIELDS, GPS_EPOCH
+    from .bench_rinex_spp import make_ephemerides, simulate
+
+    x, y, z = get_transformer(WGS84_3D, ECEF).transform(SITE[1], SITE[0], SITE[2])
+    receiver = np.array([x, y, z])
+    ephemerides = make_ephemerides(START, epochs * interval / 3600)
+
+    with open(nav_path, 'w') as f:
+        f.write(_rinex_line('     3.04           N: GNSS NAV DATA    G: GPS', 'RINEX VERSION / TYPE'))
+        f.write(_rinex_line('benchmarks          gnss                20240315 000000 UTC', 'PGM / RUN BY / DATE'))
+        f.write(_rinex_line('', 'END OF HEADER'))
+        values = ephemerides.fields
+        for k in range(len(ephemerides)):
+            toc = (GPS_EPOCH + np.timedelta64(int(round(ephemerides.toc[k])), 's')).astype('datetime64[s]').astype(object)
+            record = {name: values[name][k] for name in EPHEMERIS_FIELDS}
+            orbits = [
+                (0.0, record['Crs'], record['DeltaN'], record['M0']),
+                (record['Cuc'], record['Eccentricity'], record['Cus'], record['sqrtA']),
+                (record['Toe'], record['Cic'], record['Omega0'], record['Cis']),
+                (record['Io'], record['Crc'], record['omega'], record['OmegaDot']),
+                (record['IDOT'], 1.0, record['GPSWeek'], 0.0),
+                (2.0, 0.0, record['TGD'], 0.0),
+                (record['Toe'] - 18.0, 4.0)
+            ]
+            sv = ephemerides.satellites[ephemerides.sv_index[k]]
+            f.write(f"{sv} {toc:%Y %m %d %H %M %S}" + ''.join(
+                f'{v:19.12E}' for v in (record['SVclockBias'], record['SVclockDrift'], record['SVclockDriftRate'])
+            ) + '\n')
+            for orbit in orbits:
+                f.write('    ' + ''.join(f'{v:19.12E}' for v in orbit) + '\n')
+
+    with open(obs_path, 'w') as f:
+        f.write(_rinex_line('     3.04           OBSERVATION DATA    G: GPS', 'RINEX VERSION / TYPE'))
+        f.write(_rinex_line('benchmarks          gnss                20240315 000000 UTC', 'PGM / RUN BY / DATE'))
+        f.write(_rinex_line('SYNTHETIC', 'MARKER NAME'))
+        f.write(_rinex_line(f'{x:14.4f}{y:14.4f}{z:14.4f}', 'APPROX POSITION XYZ'))
+        f.write(_rinex_line(f'{0.0:14.4f}{0.0:14.4f}{0.0:14.4f}', 'ANTENNA: DELTA H/E/N'))
+        f.write(_rinex_line('G    2 C1C C2W', 'SYS / # / OBS TYPES'))
+        f.write(_rinex_line(f'{interval:10.3f}', 'INTERVAL'))
+        f.write(_rinex_line('  2024     3    15     0     0    0.0000000     GPS', 'TIME OF FIRST OBS'))
+        f.write(_rinex_line('', 'END OF HEADER'))
+        # Simulated a few hours at a time to bound the (epochs, satellites) arrays
+        block = 480
+        for start in range(0, epochs, block):
+            times = _rinex_times(np.arange(start, min(start + block, epochs)) * interval)
+            satellites, ranges = simulate(ephemerides, times, receiver)
+            # Second frequency: the same ranges with the L2 ionosphere term and more noise
+            l2 = ranges + 1.65 * 3.0 + np.random.default_rng([seed, start]).normal(0, 0.5, ranges.shape)
+            lines = []
+            for t, row, row2 in zip(times.astype('datetime64[us]').astype(object), ranges, l2):
+                visible = np.flatnonzero(np.isfinite(row))
+                lines.append(f'> {t:%Y %m %d %H %M} {t.second + t.microsecond / 1e6:10.7f}  0{len(visible):3d}\n')
+                lines.extend(f'{satellites[i]}{row[i]:14.3f}  {row2[i]:14.3f}  \n' for i in visible)
+            f.write(''.join(lines))
+
+
+def write(kind: str, epochs: int, path: str, seed: int = 0) -> str:
+    """Write a synthetic file; RINEX also writes '<path>.nav'.
+
+    Returns:
+        The path written
+    """
+    if kind == 'rinex':
+        write_rinex(path, path + '.nav', epochs, seed=seed)
+        return path
+    blocks = {'nmea': nmea_blocks, 'xyz': xyz_blocks}[kind]
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        for data in blocks(epochs, seed=seed):
+            f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def cached(kind: str, epochs: int, data_dir: str, seed: int = 0) -> str:
+    """Path of a generated file in data_dir, written on first use"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'{kind}-{epochs}-{seed}.{EXTENSIONS[kind]}')
+    if not os.path.exists(path) or (kind == 'rinex' and not os.path.exists(path + '.nav')):
+        write(kind, epochs, path, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('kind', choices=sorted(EXTENSIONS))
+    parser.add_argument('epochs', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write(args.kind, args.epochs, args.path, args.seed)
+    print(f"Wrote {args.epochs} {args.kind} epochs to {args.path} ({os.path.getsize(args.path) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""Benchmark the processing paths on synthetic data of increasing size.
+
+Each case is timed on files from benchmarks.generators (written once into
+--data-dir and reused): the best of --repeat runs gives the throughput, and
+one further run under tracemalloc gives the peak Python/NumPy allocation.
+Cases that would take far too long at a size (the line-by-line parsers,
+RINEX through georinex, the HTTP path) are recorded as skipped
+with the reason rather than left out, so result files line up across
+commits.
+
+    xyz        XYZProcessor.process_xyz_file (line by line)
+    xyz_bulk   XYZProcessor.process_xyz_file_bulk
+    nmea       GNSSProcessor.process_file (streaming NMEA path)
+    nmea_text  GNSSProcessor.process_nmea on the whole file as text
+    metrics    GNSSProcessor._compute_accuracy_metrics on parsed XYZ epochs
+    rinex      GNSSProcessor.process_file on RINEX observation + navigation
+    http       POST /api/upload, POST /api/process/<id> and polling
+               /api/jobs/<id> through the Flask test client; needs the
+               database configured by DATABASE_URL. Processing runs in the
+               job queue's worker processes, so its allocations are not in
+               the peak memory reported for this case
+
+Usage:
+    python -m benchmarks.run [--sizes 1k,100k,10M] [--cases xyz,nmea] [--output results.json]
+                             [--compare previous.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import generators
+
+DEFAULT_SIZES = '1k,100k,10M'
+SUFFIXES = {'k': 1000, 'M': 1000000}
+
+# Largest size each case runs at; None means no limit
+MAX_EPOCHS = {
+    'xyz': 1000000,
+    'xyz_bulk': None,
+    'nmea': None,
+    'nmea_text': 1000000,
+    'metrics': None,
+    'rinex': 10000,
+    'http': 100000
+}
+CASES = list(MAX_EPOCHS)
+HTTP_TIMEOUT = 3600.0
+
+
+def parse_size(value: str) -> int:
+    """'100k' -> 100000, '10M' -> 10000000"""
+    value = value.strip()
+    if value[-1:] in SUFFIXES:
+        return int(float(value[:-1]) * SUFFIXES[value[-1]])
+    return int(value)
+
+
+def measure(run: Callable[[], object], repeat: int) -> Dict:
+    """Best wall time of repeat runs and the tracemalloc peak of one more"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'runs': timings, 'peak_memory_mb': peak / 1e6}
+
+
+def _processor():
+    from app.processors.gnss_processor import GNSSProcessor
+
+    return GNSSProcessor(base_station_coords=generators.SITE)
+
+
+def case_xyz(path: str) -> Callable:
+    from app.processors.xyz_processor import XYZProcessor
+
+    return lambda: XYZProcessor().process_xyz_file(path)
+
+
+def case_xyz_bulk(path: str) -> Callable:
+    from app.processors.xyz_processor import XYZProcessor
+
+    return lambda: XYZProcessor().process_xyz_file_bulk(path)
+
+
+def case_nmea(path: str) -> Callable:
+    return lambda: _processor().process_file(path, 'nmea')
+
+
+def case_nmea_text(path: str) -> Callable:
+    def run():
+        with open(path) as f:
+            return _processor().process_nmea(f.read())
+    return run
+
+
+def case_metrics(path: str) -> Callable:
+    from app.processors.xyz_processor import XYZProcessor
+
+    # Parsing is setup, only the metrics are timed
+    data = XYZProcessor().process_xyz_file_bulk(path)['data']
+    return lambda: _processor()._compute_accuracy_metrics(data)
+
+
+def case_rinex(path: str) -> Callable:
+    return lambda: _processor().process_file(path, 'rnx', path + '.nav')
+
+
+class HttpCase:
+    """Upload and process a file through the API with the Flask test client.
+
+    Every run appends a distinct comment line to the upload, so neither the
+    content-addressed upload store nor the result cache short-circuits it.
+    """
+
+    def __init__(self, path: str, work_dir: str):
+        from werkzeug.security import generate_password_hash
+        from app import create_app, db
+        from app.models import User
+
+        self.path = path
+        self.runs = 0
+        self.app = create_app()
+        self.app.config['UPLOAD_FOLDER'] = work_dir
+        for key, folder in (('EPOCH_STORE_FOLDER', 'epochs'), ('PARSED_CACHE_FOLDER', 'parsed'),
+                            ('RINEX_CACHE_FOLDER', 'rinex')):
+            self.app.config[key] = os.path.join(work_dir, folder)
+        self.app.config['JOB_POLL_INTERVAL'] = 0.1
+
+        with self.app.app_context():
+            db.create_all()
+            if User.query.filter_by(username='benchmark').first() is None:
+                db.session.add(User(username='benchmark', password_hash=generate_password_hash('benchmark')))
+                db.session.commit()
+        self.client = self.app.test_client()
+        self.client.post('/auth/login', data={'username': 'benchmark', 'password': 'benchmark'})
+
+    def __call__(self):
+        self.runs += 1
+        with open(self.path, 'rb') as f:
+            data = f.read() + f'# benchmark run {self.runs} {time.time_ns()}\n'.encode()
+        response = self.client.post('/api/upload', data={
+            'file': (io.BytesIO(data), os.path.basename(self.path))
+        }, content_type='multipart/form-data')
+        upload = response.get_json()
+        if not upload or not upload.get('success'):
+            raise RuntimeError(f"Upload failed: {upload}")
+
+        response = self.client.post(f"/api/process/{upload['dataset_id']}")
+        queued = response.get_json()
+        if not queued.get('success'):
+            raise RuntimeError(f"Processing failed: {queued}")
+        if 'job' not in queued:
+            return queued
+
+        deadline = time.monotonic() + HTTP_TIMEOUT
+        while time.monotonic() < deadline:
+            status = self.client.get(f"/api/jobs/{queued['job']['id']}").get_json()
+            if status['dataset_status'] == 'done':
+                return status
+            if status['dataset_status'] == 'failed':
+                raise RuntimeError(f"Job failed: {status['job'].get('error')}")
+            time.sleep(0.05)
+        raise RuntimeError('Job did not finish in time')
+
+
+FILE_KINDS = {'xyz': 'xyz', 'xyz_bulk': 'xyz', 'nmea': 'nmea', 'nmea_text': 'nmea', 'metrics': 'xyz',
+              'rinex': 'rinex', 'http': 'nmea'}
+SETUP = {'xyz': case_xyz, 'xyz_bulk': case_xyz_bulk, 'nmea': case_nmea, 'nmea_text': case_nmea_text,
+         'metrics': case_metrics, 'rinex': case_rinex}
+
+
+def run_case(case: str, epochs: int, data_dir: str, repeat: int, seed: int) -> Dict:
+    result = {'case': case, 'epochs': epochs}
+    limit = MAX_EPOCHS[case]
+    if limit is not None and epochs > limit:
+        result.update(status='skipped', reason=f'limited to {limit} epochs')
+        return result
+
+    kind = FILE_KINDS[case]
+    start = time.perf_counter()
+    path = generators.cached(kind, epochs, data_dir, seed)
+    result['generate_seconds'] = time.perf_counter() - start
+    result['file_mb'] = os.path.getsize(path) / 1e6
+
+    try:
+        if case == 'http':
+            with tempfile.TemporaryDirectory() as work_dir:
+                result.update(measure(HttpCase(path, work_dir), repeat))
+        else:
+            result.update(measure(SETUP[case](path), repeat))
+    except Exception as e:
+        result.update(status='error', reason=f'{type(e).__name__}: {e}')
+        return result
+
+    result['status'] = 'ok'
+    result['epochs_per_second'] = epochs / result['seconds']
+    result['mb_per_second'] = result['file_mb'] / result['seconds']
+    return result
+
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results: List[Dict], previous: Dict) -> None:
+    """Print the speed of each case relative to an earlier result file"""
+    before = {(r['case'], r['epochs']): r for r in previous.get('results', []) if r.get('status') == 'ok'}
+    print(f"\nCompared with {previous.get('meta', {}).get('commit') or 'previous run'}:")
+    for result in results:
+        old = before.get((result['case'], result['epochs']))
+        if result.get('status') != 'ok' or old is None:
+            continue
+        print(f"  {result['case']:<10} {result['epochs']:>10}  {old['seconds'] / result['seconds']:6.2f}x speed  "
+              f"{result['peak_memory_mb'] / max(old['peak_memory_mb'], 1e-9):6.2f}x memory")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma separated epoch counts (k and M suffixes)')
+    parser.add_argument('--cases', default=','.join(CASES), help=f"Comma separated subset of {', '.join(CASES)}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'gnss-benchmarks'),
+                        help='Folder where generated files are kept between runs')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier JSON output to compare against')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    cases = [case.strip() for case in args.cases.split(',')]
+    unknown = [case for case in cases if case not in MAX_EPOCHS]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+
+    results = []
+    for epochs in sizes:
+        for case in cases:
+            result = run_case(case, epochs, args.data_dir, args.repeat, args.seed)
+            results.append(result)
+            if result['status'] == 'ok':
+                print(f"{case:<10} {epochs:>10}  {result['seconds']:9.3f} s  {result['epochs_per_second']:>12,.0f} "
+                      f"epochs/s  {result['mb_per_second']:7.1f} MB/s  peak {result['peak_memory_mb']:8.1f} MB")
+            else:
+                print(f"{case:<10} {epochs:>10}  {result['status']}: {result['reason']}")
+
+    report = {
+        'meta': metadata(),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return report
+
+
+if __name__ == '__main__':
+    main()
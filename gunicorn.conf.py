@@ -0,0 +1,45 @@
+"""gunicorn settings.
+
+The application is loaded once in the master process (preload_app), which
+also imports the scientific modules and fills the read-only caches (see
+app/startup.py) before forking, so workers share them and start serving
+without warm-up.
+
+The defaults run a single worker process with the gthread worker class:
+live streams exist only in the process that started them (see app/live.py)
+and each dashboard Server-Sent Events connection holds a thread for as
+long as it is open, so sync workers would be used up by a few open
+dashboards. Parsing and metrics run in the job queue's process pool, not
+in the request threads. Raise GUNICORN_WORKERS only without live streams.
+
+Open Server-Sent Events connections are capped per process by
+LIVE_MAX_SUBSCRIBERS (half of GUNICORN_THREADS by default) and per user by
+LIVE_MAX_SUBSCRIBERS_PER_USER; further ones get a 503. When raising
+LIVE_MAX_SUBSCRIBERS, keep it safely below GUNICORN_THREADS, or raise both.
+Run with:
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# Each open dashboard SSE connection holds one of these threads (see LIVE_MAX_SUBSCRIBERS)
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    """Fill shared state in the master once the preloaded application exists"""
+    if server.cfg.preload_app:
+        from app.startup import preload
+
+        preload(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    from app.startup import after_fork
+
+    after_fork(worker.app.wsgi())
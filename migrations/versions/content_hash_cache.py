@@ -0,0 +1,27 @@
+"""Add content hashes and result cache keys
+
+Revision ID: content_hash_cache
+Revises: processing_jobs
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'content_hash_cache'
+down_revision = 'processing_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('dataset', sa.Column('content_hash', sa.String(64)))
+    op.add_column('dataset', sa.Column('file_size', sa.BigInteger))
+    op.create_index('ix_dataset_content_hash', 'dataset', ['content_hash'])
+    op.add_column('analysis_result', sa.Column('cache_key', sa.String(64)))
+    op.create_index('ix_analysis_result_cache_key', 'analysis_result', ['cache_key'])
+
+def downgrade():
+    op.drop_index('ix_analysis_result_cache_key', 'analysis_result')
+    op.drop_column('analysis_result', 'cache_key')
+    op.drop_index('ix_dataset_content_hash', 'dataset')
+    op.drop_column('dataset', 'file_size')
+    op.drop_column('dataset', 'content_hash')
@@ -0,0 +1,21 @@
+"""Add campaign tags to datasets
+
+Revision ID: dataset_campaign
+Revises: rinex_navigation
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'dataset_campaign'
+down_revision = 'rinex_navigation'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('dataset', sa.Column('campaign', sa.String(100)))
+    op.create_index('ix_dataset_campaign', 'dataset', ['campaign'])
+
+def downgrade():
+    op.drop_index('ix_dataset_campaign', 'dataset')
+    op.drop_column('dataset', 'campaign')
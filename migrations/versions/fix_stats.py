@@ -0,0 +1,19 @@
+"""Add per fix class statistics to analysis results
+
+Revision ID: fix_stats
+Revises: dataset_campaign
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'fix_stats'
+down_revision = 'dataset_campaign'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('analysis_result', sa.Column('fix_stats', sa.JSON()))
+
+def downgrade():
+    op.drop_column('analysis_result', 'fix_stats')
@@ -0,0 +1,65 @@
+"""Create the base schema
+
+Tables used to be created by db.create_all() on the first request; the
+schema now comes from the migrations alone. Later revisions add the
+remaining columns. Databases created by create_all are brought under
+migration control with `flask db stamp head`.
+
+Revision ID: initial_schema
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from geoalchemy2 import Geometry
+
+revision = 'initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('username', sa.String(80), nullable=False, unique=True),
+        sa.Column('password_hash', sa.String(120), nullable=False)
+    )
+    op.create_table(
+        'base_station',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('location', Geometry('POINT'), nullable=False),
+        sa.Column('altitude', sa.Float, nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('is_active', sa.Boolean)
+    )
+    op.create_table(
+        'dataset',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('format_type', sa.String(20), nullable=False),
+        sa.Column('upload_date', sa.DateTime),
+        sa.Column('processing_status', sa.String(20)),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('base_station_id', sa.Integer, sa.ForeignKey('base_station.id'))
+    )
+    op.create_table(
+        'analysis_result',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('dataset_id', sa.Integer, sa.ForeignKey('dataset.id'), nullable=False),
+        sa.Column('analysis_date', sa.DateTime),
+        sa.Column('reference_mode', sa.String(20), nullable=False),
+        *(sa.Column(name, sa.Float) for name in (
+            'horizontal_rmse', 'horizontal_std', 'horizontal_mean', 'horizontal_max', 'horizontal_min',
+            'vertical_rmse', 'vertical_std', 'vertical_mean', 'vertical_max', 'vertical_min',
+            'reference_latitude', 'reference_longitude', 'reference_altitude'
+        )),
+        sa.Column('num_points', sa.Integer),
+        sa.Column('processing_duration', sa.Float)
+    )
+
+def downgrade():
+    op.drop_table('analysis_result')
+    op.drop_table('dataset')
+    op.drop_table('base_station')
+    op.drop_table('user')
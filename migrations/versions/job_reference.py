@@ -0,0 +1,19 @@
+"""Add a per-job reference station to processing jobs
+
+Revision ID: job_reference
+Revises: results_listing
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'job_reference'
+down_revision = 'results_listing'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('processing_job', sa.Column('base_station_id', sa.Integer))
+
+def downgrade():
+    op.drop_column('processing_job', 'base_station_id')
@@ -0,0 +1,23 @@
+"""Add percentile accuracy metrics
+
+Revision ID: percentile_metrics
+Revises: content_hash_cache
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'percentile_metrics'
+down_revision = 'content_hash_cache'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('horizontal_cep50', 'horizontal_cep95', 'horizontal_2drms', 'vertical_le95', 'r95')
+
+def upgrade():
+    for name in COLUMNS:
+        op.add_column('analysis_result', sa.Column(name, sa.Float))
+
+def downgrade():
+    for name in reversed(COLUMNS):
+        op.drop_column('analysis_result', name)
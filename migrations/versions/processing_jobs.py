@@ -0,0 +1,34 @@
+"""Add background processing jobs
+
+Revision ID: processing_jobs
+Revises: xyz_support
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'processing_jobs'
+down_revision = 'xyz_support'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'processing_job',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('dataset_id', sa.Integer, sa.ForeignKey('dataset.id'), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('progress', sa.Float, nullable=False, server_default='0'),
+        sa.Column('error', sa.Text),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('started_at', sa.DateTime),
+        sa.Column('finished_at', sa.DateTime),
+        sa.Column('result_id', sa.Integer, sa.ForeignKey('analysis_result.id'))
+    )
+    op.create_index('ix_processing_job_dataset_id', 'processing_job', ['dataset_id'])
+    op.create_index('ix_processing_job_status', 'processing_job', ['status'])
+
+def downgrade():
+    op.drop_index('ix_processing_job_status', 'processing_job')
+    op.drop_index('ix_processing_job_dataset_id', 'processing_job')
+    op.drop_table('processing_job')
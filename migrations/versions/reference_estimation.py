@@ -0,0 +1,19 @@
+"""Add robust reference estimation details to analysis results
+
+Revision ID: reference_estimation
+Revises: fix_stats
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'reference_estimation'
+down_revision = 'fix_stats'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('analysis_result', sa.Column('reference_estimation', sa.JSON()))
+
+def downgrade():
+    op.drop_column('analysis_result', 'reference_estimation')
@@ -0,0 +1,19 @@
+"""Add processing stage timings to analysis results
+
+Revision ID: result_timings
+Revises: reference_estimation
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'result_timings'
+down_revision = 'reference_estimation'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('analysis_result', sa.Column('timings', sa.JSON()))
+
+def downgrade():
+    op.drop_column('analysis_result', 'timings')
@@ -0,0 +1,20 @@
+"""Add indexes for the paginated results listing
+
+Revision ID: results_listing
+Revises: result_timings
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = 'results_listing'
+down_revision = 'result_timings'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_dataset_user_upload_date_id', 'dataset', ['user_id', 'upload_date', 'id'])
+    op.create_index('ix_analysis_result_dataset_id_id', 'analysis_result', ['dataset_id', 'id'])
+
+def downgrade():
+    op.drop_index('ix_analysis_result_dataset_id_id', 'analysis_result')
+    op.drop_index('ix_dataset_user_upload_date_id', 'dataset')
@@ -0,0 +1,19 @@
+"""Add RINEX navigation file hash to datasets
+
+Revision ID: rinex_navigation
+Revises: percentile_metrics
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'rinex_navigation'
+down_revision = 'percentile_metrics'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('dataset', sa.Column('nav_hash', sa.String(64)))
+
+def downgrade():
+    op.drop_column('dataset', 'nav_hash')
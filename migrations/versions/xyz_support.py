@@ -1,12 +1,18 @@
 """Add XYZ support fields
 
 Revision ID: xyz_support
+Revises: initial_schema
 Create Date: 2024-03-15
 """
 from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects.postgresql import JSON
 
+revision = 'xyz_support'
+down_revision = 'initial_schema'
+branch_labels = None
+depends_on = None
+
 def upgrade():
     op.add_column('analysis_result', sa.Column('solution_quality', JSON))
     op.add_column('analysis_result', sa.Column('xyz_stats', JSON))
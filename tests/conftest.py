@@ -0,0 +1,19 @@
+import pytest
+
+from benchmarks import generators
+
+
+@pytest.fixture(scope='session')
+def data_dir(tmp_path_factory):
+    """Folder holding the synthetic logs shared by the whole session"""
+    return str(tmp_path_factory.mktemp('data'))
+
+
+@pytest.fixture(scope='session')
+def nmea_file(data_dir):
+    return generators.cached('nmea', 6000, data_dir)
+
+
+@pytest.fixture(scope='session')
+def xyz_file(data_dir):
+    return generators.cached('xyz', 6000, data_dir)
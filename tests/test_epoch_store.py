@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from app.epoch_store import EpochStore
+
+START = np.datetime64('2024-03-15T00:00:00', 'ns')
+
+
+def epochs(count, order=None):
+    index = np.arange(count) if order is None else np.asarray(order)
+    return {
+        'timestamp': START + (index * 1000000000).astype('timedelta64[ns]'),
+        'latitude': 60.8 + index * 1e-6,
+        'quality': (index % 3).astype(np.int8),
+    }
+
+
+def write(store, key, batches):
+    writer = store.writer(key)
+    for batch in batches:
+        writer.append(batch)
+    return writer.commit()
+
+
+def at(seconds):
+    return START + np.timedelta64(seconds, 's')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EpochStore(str(tmp_path))
+
+
+def test_round_trip(store):
+    data = epochs(1000)
+    reader = write(store, 'a', [{k: v[:400] for k, v in data.items()}, {k: v[400:] for k, v in data.items()}])
+
+    assert len(reader) == 1000
+    assert reader.sorted
+    assert set(reader.columns) == set(data)
+    read = store.open('a').read()
+    for name, values in data.items():
+        np.testing.assert_array_equal(read[name], values)
+        assert read[name].dtype == values.dtype
+
+
+def test_missing_entry(store):
+    assert store.open('missing') is None
+    assert store.copy('missing', 'b') is None
+
+
+@pytest.mark.parametrize('order', [None, np.random.default_rng(0).permutation(100)], ids=['sorted', 'unsorted'])
+def test_time_window(store, order):
+    reader = write(store, 'a', [epochs(100, order)])
+    assert reader.sorted == (order is None)
+
+    assert reader.window_count(at(10), at(19)) == 10
+    window = reader.read(['timestamp', 'latitude'], start=at(10), end=at(19))
+    assert sorted(window['timestamp']) == list(epochs(100)['timestamp'][10:20])
+
+    limited = reader.read(['timestamp'], start=at(10), end=at(19), limit=4)
+    assert len(limited['timestamp']) == 4
+    assert all(at(10) <= t <= at(19) for t in limited['timestamp'])
+    assert reader.window_count(at(200)) == 0
+
+
+def test_invalid_bounds_raise(store):
+    for order in (None, [1, 0, 2]):
+        reader = write(store, 'a', [epochs(3, order)])
+        with pytest.raises(ValueError):
+            reader.time_range('not a time')
+
+
+def test_iter_batches_filter(store):
+    reader = write(store, 'a', [epochs(1000)])
+    batches = list(reader.iter_batches(batch_size=128, columns=['latitude'],
+                                       where=(['quality'], lambda c: c['quality'] == 2)))
+
+    assert all(len(batch['latitude']) <= 128 for batch in batches)
+    latitudes = np.concatenate([batch['latitude'] for batch in batches])
+    np.testing.assert_array_equal(latitudes, epochs(1000)['latitude'][2::3])
+
+
+def test_add_column_and_copy(store):
+    write(store, 'a', [epochs(50)])
+    copy = store.copy('a', 'b')
+    store.add_column('a', 'level', np.arange(50, dtype=np.int16))
+
+    reader = store.open('a')
+    np.testing.assert_array_equal(reader.column('level'), np.arange(50))
+    assert 'level' not in copy.columns
+    assert 'level' not in store.open('b').columns
+    np.testing.assert_array_equal(store.open('b').column('latitude'), reader.column('latitude'))
+
+    with pytest.raises(ValueError):
+        store.add_column('a', 'short', np.zeros(10))
@@ -0,0 +1,55 @@
+import pytest
+
+from app.live import LiveIngestService, StreamTargetError, parse_allowed_hosts
+
+
+def service(allowed=()):
+    ingest = LiveIngestService()
+    ingest.allowed_names, ingest.allowed_networks = parse_allowed_hosts(allowed)
+    return ingest
+
+
+@pytest.mark.parametrize('host', ['127.0.0.1', '10.0.0.5', '192.168.1.10', '169.254.169.254',
+                                  '100.64.0.1', '0.0.0.0', '::1', 'fe80::1', '::ffff:10.0.0.5', '224.0.0.1'])
+def test_non_public_targets_are_refused(host):
+    with pytest.raises(StreamTargetError) as error:
+        service().resolve_target(host, 2101)
+    assert error.value.status == 403
+
+
+def test_public_targets_are_accepted():
+    assert service().resolve_target('8.8.8.8', 2101) == '8.8.8.8'
+
+
+def test_allowlist_restricts_targets():
+    ingest = service(['10.0.0.0/8', ' 127.0.0.1 '])
+
+    assert ingest.resolve_target('10.1.2.3', 2101) == '10.1.2.3'
+    assert ingest.resolve_target('127.0.0.1', 2101) == '127.0.0.1'
+    for host in ('192.168.1.10', '8.8.8.8'):
+        with pytest.raises(StreamTargetError):
+            ingest.resolve_target(host, 2101)
+
+
+def test_unresolvable_host():
+    with pytest.raises(StreamTargetError) as error:
+        service().resolve_target('no-such-host.invalid', 2101)
+    assert error.value.status == 400
+
+
+def test_subscribers_are_limited_per_process_and_user():
+    ingest = service()
+    ingest.max_subscribers, ingest.max_subscribers_per_user = 3, 2
+
+    ingest.add_subscriber(1)
+    ingest.add_subscriber(1)
+    with pytest.raises(ValueError):
+        ingest.add_subscriber(1)
+    ingest.add_subscriber(2)
+    with pytest.raises(ValueError):
+        ingest.add_subscriber(3)
+
+    ingest.remove_subscriber(1)
+    ingest.add_subscriber(3)
+    ingest.remove_subscriber(2)
+    ingest.add_subscriber(1)
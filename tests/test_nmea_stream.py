@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from app.processors.epochs import EpochBatch
+from app.processors.gnss_processor import GNSSProcessor
+from app.processors.nmea_stream import NmeaEpochParser, iter_lines
+from benchmarks.generators import SITE
+
+# Relative accuracy of the streaming quantile sketches
+SKETCH_ACCURACY = 0.005
+EXACT_KEYS = ('rmse', 'std', 'mean', 'max', 'min')
+
+
+def assert_same_metrics(exact, streamed):
+    assert streamed['num_points'] == exact['num_points']
+    assert streamed['reference_position'] == pytest.approx(exact['reference_position'], abs=1e-9)
+    for axis in ('horizontal', 'vertical'):
+        for key in EXACT_KEYS:
+            assert streamed[axis][key] == pytest.approx(exact[axis][key], rel=1e-9, abs=1e-12)
+    for key in ('cep50', 'cep95'):
+        assert streamed['horizontal'][key] == pytest.approx(exact['horizontal'][key], rel=2 * SKETCH_ACCURACY)
+    assert streamed['vertical']['le95'] == pytest.approx(exact['vertical']['le95'], rel=2 * SKETCH_ACCURACY)
+    assert set(streamed['fix_stats']['classes']) == set(exact['fix_stats']['classes'])
+    for name, stats in exact['fix_stats']['classes'].items():
+        assert streamed['fix_stats']['classes'][name]['epochs'] == stats['epochs']
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'base_station_coords': SITE},
+    {'outlier_sigma': 5.0},
+], ids=['floating', 'fixed', 'outliers'])
+def test_stream_matches_in_memory(nmea_file, options):
+    with open(nmea_file) as f:
+        exact = GNSSProcessor(**options).process_nmea(f.read())
+    streamed = GNSSProcessor(**options).process_nmea_stream(nmea_file, chunk_size=1 << 16, batch_size=1000)
+
+    assert exact['percentile_method'] == 'exact'
+    assert_same_metrics(exact, streamed)
+
+
+def test_stream_reads_chunk_iterables_once(nmea_file):
+    """A floating reference needs no second pass over the source"""
+    with open(nmea_file, 'rb') as f:
+        data = f.read()
+    chunks = iter([data[i:i + 4096] for i in range(0, len(data), 4096)])
+
+    streamed = GNSSProcessor().process_nmea_stream(chunks)
+    expected = GNSSProcessor().process_nmea_stream(nmea_file)
+
+    assert streamed['num_points'] == expected['num_points']
+    assert streamed['horizontal'] == pytest.approx(expected['horizontal'])
+
+
+def test_stream_reports_progress(nmea_file):
+    fractions = []
+    with open(nmea_file, 'rb') as f:
+        GNSSProcessor(progress=fractions.append).process_nmea_stream(f, chunk_size=1 << 14)
+
+    assert len(fractions) > 1
+    assert np.all(np.diff(fractions) >= 0)
+    assert fractions[-1] == pytest.approx(1.0)
+
+
+def gga(hhmmss):
+    return f'$GNGGA,{hhmmss},6048.0000,N,01107.2000,E,4,18,0.7,0200.000,M,39.000,M,0.2,0000'
+
+
+def rmc(hhmmss, ddmmyy):
+    return f'$GPRMC,{hhmmss},A,6048.0000,N,01107.2000,E,0.0,0.0,{ddmmyy},,,R'
+
+
+@pytest.mark.parametrize('rmc_first', [True, False], ids=['rmc-first', 'gga-first'])
+def test_fixes_are_dated_across_midnight(rmc_first):
+    epochs = [('235959.00', '150324'), ('000000.00', '160324'), ('000001.00', '160324')]
+    lines = []
+    for hhmmss, ddmmyy in epochs:
+        pair = [rmc(hhmmss, ddmmyy), gga(hhmmss)]
+        lines.extend(pair if rmc_first else pair[::-1])
+    results = GNSSProcessor().process_nmea_stream(iter(['\n'.join(lines) + '\n']))
+    batch = EpochBatch.concat(NmeaEpochParser().parse(iter_lines(['\n'.join(lines) + '\n'])))
+
+    assert results['num_points'] == 3
+    assert str(results['start_time']).startswith('2024-03-15 23:59:59')
+    assert str(results['end_time']).startswith('2024-03-16 00:00:01')
+    np.testing.assert_array_equal(batch['timestamp'], np.array(
+        ['2024-03-15T23:59:59', '2024-03-16T00:00:00', '2024-03-16T00:00:01'], dtype='datetime64[ns]'))
+
+
+def test_fixes_roll_over_midnight_without_date_sentences():
+    lines = [rmc('235959.00', '150324'), gga('235959.00'), gga('000000.10')]
+    results = GNSSProcessor().process_nmea_stream(iter(['\n'.join(lines) + '\n']))
+
+    assert results['num_points'] == 2
+    assert str(results['end_time']).startswith('2024-03-16 00:00:00.1')
@@ -0,0 +1,97 @@
+import io
+import os
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+pytest.importorskip('zstandard')
+from mongomock.gridfs import enable_gridfs_integration  # noqa: E402
+
+from app.raw_archive import RawArchive, open_upload  # noqa: E402
+
+enable_gridfs_integration()
+
+CONTENT_HASH = 'a' * 64
+
+
+def mock_archive():
+    archive = RawArchive(mongomock.MongoClient()['gnss'], 'raw')
+    # mongomock clients have no client-side operation timeout for pymongo's GridFSBucket
+    archive.bucket._timeout = None
+    return archive
+
+
+@pytest.fixture
+def archive():
+    return mock_archive()
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / f'{CONTENT_HASH}.nmea'
+    data = b''.join(f'$GNGGA,{i:06d}.00,6048.0,N,01107.2,E,4,18,0.7,200.0,M,39.0,M,0.2,0000\n'.encode()
+                    for i in range(20000))
+    path.write_bytes(data)
+    return str(path), data
+
+
+def test_store_and_read_back(archive, upload):
+    path, data = upload
+    assert archive.store(path, CONTENT_HASH)
+    assert not archive.store(path, CONTENT_HASH)
+    assert len(archive._file_ids(CONTENT_HASH)) == 1
+
+    with archive.open(CONTENT_HASH) as f:
+        assert f.size == len(data)
+        assert f.read(100) == data[:100]
+        f.seek(50000)
+        assert f.read(100) == data[50000:50100]
+        f.seek(10)
+        assert f.read() == data[10:]
+
+
+def test_archive_file_moves_upload(archive, upload):
+    path, data = upload
+    assert archive.archive_file(path, CONTENT_HASH)
+    assert not os.path.exists(path)
+
+    with open_upload(path, archive) as f:
+        assert f.read() == data
+
+
+def test_archive_later_runs_in_background(archive, upload):
+    path, data = upload
+    assert archive.archive_later(path, CONTENT_HASH).result(timeout=30)
+    assert not os.path.exists(path)
+    assert archive.exists(CONTENT_HASH)
+
+
+def test_failed_archiving_keeps_upload(upload):
+    path, data = upload
+    archive = mock_archive()
+    archive.store = lambda *args: (_ for _ in ()).throw(ConnectionError('unreachable'))
+
+    assert not archive.archive_later(path, CONTENT_HASH).result(timeout=30)
+    with open_upload(path, archive) as f:
+        assert f.read() == data
+
+
+def test_delete(archive, upload):
+    path, _ = upload
+    archive.store(path, CONTENT_HASH)
+    archive.delete(CONTENT_HASH)
+
+    assert not archive.exists(CONTENT_HASH)
+    with pytest.raises(FileNotFoundError):
+        archive.open(CONTENT_HASH)
+
+
+def test_disabled_archive_keeps_uploads(upload):
+    path, _ = upload
+    archive = RawArchive()
+
+    assert archive.archive_later(path, CONTENT_HASH) is None
+    assert not archive.archive_file(path, CONTENT_HASH)
+    assert os.path.exists(path)
+    with open_upload(path, archive) as f:
+        assert isinstance(f, io.BufferedReader)
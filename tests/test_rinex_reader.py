@@ -0,0 +1,82 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from app.processors.rinex_reader import evict_cache, iter_epoch_records, read_header, split_blocks
+from benchmarks import generators
+
+
+def header_line(content, label):
+    return f'{content:60s}{label}\n'
+
+
+def rinex2(records):
+    header = (header_line('     2.11           OBSERVATION DATA    G (GPS)', 'RINEX VERSION / TYPE')
+              + header_line('     7    C1    P2    L1    L2    D1    D2    S1', '# / TYPES OF OBSERV')
+              + header_line('', 'END OF HEADER'))
+    return io.BytesIO((header + ''.join(records)).encode())
+
+
+def epoch2(seconds, satellites, flag=0):
+    line = f' 24  3 15  0  0{seconds:11.7f}  {flag}{len(satellites):3d}' + ''.join(satellites[:12]) + '\n'
+    for start in range(12, len(satellites), 12):
+        line += ' ' * 32 + ''.join(satellites[start:start + 12]) + '\n'
+    observations = f'{"":14s}' * 5 + '\n' + f'{"":14s}' * 2 + '\n'
+    return line + observations * len(satellites)
+
+
+def test_rinex2_records():
+    satellites = [f'G{prn:02d}' for prn in range(1, 15)]
+    event = ' ' * 26 + '  4  1\n' + header_line('comment', 'COMMENT')
+    f = rinex2([epoch2(0.0, satellites), event, epoch2(30.0, satellites[:3])])
+
+    header, version, n_types = read_header(f)
+    records = list(iter_epoch_records(f, version, n_types))
+
+    assert (version, n_types) == (2.11, 7)
+    assert [len(lines) for _, lines in records] == [1 + 1 + 14 * 2, 2, 1 + 3 * 2]
+    assert records[0][0] == np.datetime64('2024-03-15T00:00:00', 'ns')
+    assert records[1][0] is None
+    assert records[2][0] == np.datetime64('2024-03-15T00:00:30', 'ns')
+
+
+def test_rejects_navigation_files():
+    f = io.BytesIO(header_line('     3.04           NAVIGATION DATA     G', 'RINEX VERSION / TYPE').encode())
+    with pytest.raises(ValueError):
+        read_header(f)
+
+
+def test_split_blocks_keeps_every_record(tmp_path):
+    path = generators.cached('rinex', 200, str(tmp_path))
+    with open(path, 'rb') as f:
+        header, version, n_types = read_header(f)
+        records = [lines for _, lines in iter_epoch_records(f, version, n_types)]
+
+    fractions = []
+    blocks = []
+    folder = tmp_path / 'blocks'
+    folder.mkdir()
+    for block in split_blocks(path, 600, str(folder), fractions.append):
+        with open(block, 'rb') as f:
+            assert read_header(f)[0] == header
+            blocks.append([lines for _, lines in iter_epoch_records(f, version, n_types)])
+        os.remove(block)
+
+    # 200 epochs at 30 s in blocks of 20 epochs
+    assert [len(block) for block in blocks] == [20] * 10
+    assert sum(blocks, []) == records
+    assert fractions[-1] == 1.0
+
+
+def test_evict_cache_removes_least_recently_used(tmp_path):
+    for age, name in enumerate(['new', 'old', 'oldest']):
+        folder = tmp_path / name
+        folder.mkdir()
+        (folder / 'block_00000.nc').write_bytes(b'x' * 100)
+        os.utime(folder, (1000 - age, 1000 - age))
+    (tmp_path / 'partial.tmp').mkdir()
+
+    evict_cache(str(tmp_path), 250, keep='oldest')
+    assert sorted(os.listdir(tmp_path)) == ['new', 'oldest', 'partial.tmp']
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from app.processors.projection import ECEF, WGS84_3D, get_transformer
+from app.processors.rinex_spp import EPHEMERIS_FIELDS, Ephemerides, solve_positions
+from benchmarks.bench_rinex_spp import RECEIVER_LLA, START, make_ephemerides, simulate
+
+
+def receiver_ecef():
+    latitude, longitude, height = RECEIVER_LLA
+    return np.array(get_transformer(WGS84_3D, ECEF).transform(longitude, latitude, height))
+
+
+def solve(noise):
+    ephemerides = make_ephemerides(START, 1)
+    times = START + np.arange(0, 600, 30).astype('timedelta64[s]')
+    receiver = receiver_ecef()
+    satellites, ranges = simulate(ephemerides, times, receiver, noise=noise)
+    solution = solve_positions(times, satellites, ranges, ephemerides)
+    errors = np.column_stack((solution['x'], solution['y'], solution['z'])) - receiver
+    return solution, np.linalg.norm(errors, axis=1)
+
+
+def test_recovers_known_position():
+    solution, errors = solve(noise=0.0)
+
+    assert solution['valid'].all()
+    assert (solution['num_satellites'] >= 4).all()
+    assert errors.max() < 0.1
+    np.testing.assert_allclose(solution['clock_bias'], 1e-4 * 299792458.0, atol=0.1)
+
+
+def test_noisy_ranges_stay_within_metres():
+    solution, errors = solve(noise=1.0)
+
+    assert solution['valid'].all()
+    assert np.median(errors) < 5.0
+
+
+@pytest.mark.parametrize('satellites, value', [(['E01', 'R02'], 1.0), (['G01', 'G02'], np.nan)])
+def test_navigation_without_gps_ephemerides_is_rejected(satellites, value):
+    times = np.array(['2024-01-01T00:00:00', '2024-01-01T02:00:00'], dtype='datetime64[ns]')
+    nav = xr.Dataset({name: (('time', 'sv'), np.full((2, 2), value)) for name in EPHEMERIS_FIELDS},
+                     coords={'time': times, 'sv': satellites})
+
+    with pytest.raises(ValueError, match='no GPS ephemerides'):
+        Ephemerides.from_dataset(nav)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from app.processors.ubx_processor import UBXProcessor
+from benchmarks.bench_ubx import make_log, pyubx2_positions
+
+EPOCHS = 2000
+
+
+@pytest.mark.parametrize('irregular', [False, True], ids=['constant', 'irregular'])
+def test_bulk_decode_matches_pyubx2(tmp_path, irregular):
+    path = str(tmp_path / 'log.ubx')
+    with open(path, 'wb') as f:
+        f.write(make_log(EPOCHS, irregular))
+
+    results = UBXProcessor().process_ubx_file_bulk(path)
+    data = results['data']
+    reference = pyubx2_positions(path, float('inf'))
+
+    assert len(data) == len(reference) == EPOCHS
+    assert results['statistics']['high_precision_epochs'] == EPOCHS
+    assert results['statistics']['checksum_errors'] == 0
+    decoded = np.column_stack((data['latitude'], data['longitude'], data['altitude']))
+    np.testing.assert_allclose(decoded, reference, rtol=0, atol=1e-9)
+
+
+def test_corrupted_frames_are_skipped(tmp_path):
+    data = bytearray(make_log(100, False))
+    frame = len(data) // 100
+    data[10 * frame + 20] ^= 0xFF
+    path = str(tmp_path / 'log.ubx')
+    with open(path, 'wb') as f:
+        f.write(bytes(data))
+
+    results = UBXProcessor().process_ubx_file_bulk(path)
+
+    assert results['statistics']['checksum_errors'] == 1
+    assert len(results['data']) == 99
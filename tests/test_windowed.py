@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from app.processors.windowed import accuracy_timeseries, rolling_rmse, window_starts
+
+START = np.datetime64('2024-03-15T00:00:00', 'ns')
+
+
+def test_rolling_rmse_matches_direct_computation():
+    values = np.random.default_rng(0).normal(size=50)
+    expected = [np.sqrt(np.mean(values[max(0, i - 9):i + 1] ** 2)) for i in range(50)]
+
+    np.testing.assert_allclose(rolling_rmse(values, 10), expected)
+
+
+@pytest.mark.parametrize('length', [0, -3])
+def test_rolling_rmse_rejects_non_positive_length(length):
+    with pytest.raises(ValueError):
+        rolling_rmse(np.ones(5), length)
+
+
+@pytest.mark.parametrize('options', [{'window_epochs': 0}, {'window_epochs': -5}, {'window_seconds': 0}])
+def test_window_starts_rejects_non_positive_windows(options):
+    with pytest.raises(ValueError):
+        window_starts(START + np.arange(10).astype('timedelta64[s]'), **options)
+
+
+def test_timeseries_windows():
+    columns = {
+        'timestamp': START + np.arange(100).astype('timedelta64[s]'),
+        'horizontal_error': np.full(100, 0.02),
+        'vertical_error': np.full(100, 0.03)
+    }
+    series = accuracy_timeseries(columns, window_seconds=30, rolling_epochs=10)
+
+    assert series['count'].tolist() == [30, 30, 30, 10]
+    np.testing.assert_allclose(series['horizontal']['rmse'], 0.02)
+    np.testing.assert_allclose(series['rolling_rmse']['vertical'], 0.03)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from app.epoch_store import ERROR_COLUMNS, EpochStore
+from app.processors.gnss_processor import GNSSProcessor
+from app.processors.xyz_processor import XYZProcessor
+
+
+def test_bulk_parse_matches_line_parser(xyz_file):
+    processor = XYZProcessor()
+    lines = processor.process_xyz_file(xyz_file)
+    bulk = processor.process_xyz_file_bulk(xyz_file)
+
+    assert bulk['invalid_lines'] == lines['invalid_lines']
+    assert len(bulk['data']) == len(lines['data'])
+    for name in lines['data']:
+        expected, actual = lines['data'][name], bulk['data'][name]
+        if np.issubdtype(np.asarray(expected).dtype, np.number):
+            np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-9)
+        else:
+            np.testing.assert_array_equal(actual, expected)
+
+
+def test_bulk_parse_skips_invalid_lines():
+    data = (b'2024/03/15 00:00:00.000 3106003.0 618706.0 5542010.0 1 18 0.01 0.01 0.02 0 0 0 0.2 10.0\n'
+            b'not an epoch\n'
+            b'2024/03/15 00:00:00.100 3106003.0 618706.0 5542010.0 1 18 0.01 0.01 0.02 0 0 0 0.2 10.0\n')
+    batch, invalid = XYZProcessor().parse_xyz_bytes(data)
+
+    assert len(batch) == 2
+    assert invalid == 1
+
+
+@pytest.mark.parametrize('kind', ['xyz', 'nmea'])
+def test_cached_results_match_fresh_run(tmp_path, kind, xyz_file, nmea_file):
+    path = {'xyz': xyz_file, 'nmea': nmea_file}[kind]
+    store = EpochStore(str(tmp_path))
+    writer = store.writer('parsed', exclude=ERROR_COLUMNS)
+    fresh = GNSSProcessor(epoch_sink=writer).process_file(path, kind)
+    writer.commit()
+    cached = GNSSProcessor().process_cached(store.open('parsed'), kind)
+
+    for results in (fresh, cached):
+        for key in ('timings', 'invalid_lines', 'skipped_sentences'):
+            results.pop(key, None)
+    assert cached == fresh